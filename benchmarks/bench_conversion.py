@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+形式・サイズごとの変換スループットとレイテンシのベンチマーク
+
+benchmarks/fixtures.py で決定的な入力ファイルを生成し、
+convert_file() (CLI) と ConversionWorker (GUI) の両方のコードパスで
+- コールドレイテンシ (新しいプロセスでのモジュール読み込み + 最初の変換)
+- ウォームレイテンシ (2回目以降の変換の中央値 / p95)
+- files/sec, MB/sec
+- ピークRSS
+を計測する。各ファイルは別のプロセスで計測するため、ピークRSSはそのファイルの変換によるもの。
+
+結果はJSONで出力し、--baseline で保存済みの結果と比較して、しきい値を超えて遅く (大きく)
+なった項目があれば終了コード1を返す。
+
+使い方:
+    python benchmarks/bench_conversion.py --sizes small medium -o results.json
+    python benchmarks/bench_conversion.py --baseline results.json --threshold 0.25
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+DEFAULT_FIXTURES_DIR = os.path.join(BENCH_DIR, '.fixtures')
+CODE_PATHS = ('convert_file', 'worker')
+# ベースラインと比較する項目 (いずれも小さいほど良い)
+COMPARED_METRICS = ('cold_s', 'warm_median_s', 'peak_rss_mb')
+
+
+def _peak_rss_mb():
+    """このプロセスのピークRSS (MB)。取得できない環境ではNone"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト単位、Linuxはキロバイト単位
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _make_convert_file_runner(output_path):
+    import contextlib
+    import convert_to_markdown
+
+    def run(path):
+        # convert_file() が表示するメッセージは計測に含めない
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            ok = convert_to_markdown.convert_file(path, output_path)
+        if not ok:
+            raise RuntimeError('convert_file() が失敗しました')
+
+    return run
+
+
+def _make_worker_runner():
+    from PySide6.QtCore import QCoreApplication
+    import markitdown_app
+
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+    def run(path):
+        results = []
+        errors = []
+        worker = markitdown_app.ConversionWorker(path, False)
+        worker.conversion_complete.connect(lambda text, source: results.append(text))
+        worker.conversion_error.connect(errors.append)
+        # スレッドを起動せずに同じスレッドで実行する (シグナルは直接呼び出される)
+        worker.run()
+        if errors or not results:
+            raise RuntimeError(errors[0].splitlines()[0] if errors else 'ConversionWorker が結果を返しませんでした')
+
+    run.app = app
+    return run
+
+
+def run_child(code_path, fixture_path, repeat):
+    """
+    子プロセスで1ファイル分を計測し、結果をJSONで標準出力に書く
+    """
+    import tempfile
+
+    start = time.perf_counter()
+    sys.path.insert(0, REPO_ROOT)
+    result = {'cold_s': None, 'warm_s': [], 'peak_rss_mb': None, 'error': None}
+    output_path = os.path.join(tempfile.gettempdir(), f'markitdown_bench_{os.getpid()}.md')
+    try:
+        if code_path == 'convert_file':
+            runner = _make_convert_file_runner(output_path)
+        else:
+            runner = _make_worker_runner()
+        runner(fixture_path)
+        result['cold_s'] = time.perf_counter() - start
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            runner(fixture_path)
+            result['warm_s'].append(time.perf_counter() - t0)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['peak_rss_mb'] = _peak_rss_mb()
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    print(json.dumps(result))
+    return 0
+
+
+def measure(fixture, code_path, repeat):
+    """
+    1ファイル・1コードパスを別プロセスで計測する
+
+    Returns:
+        dict: 計測結果
+    """
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', code_path, fixture['path'],
+         '--repeat', str(repeat)],
+        capture_output=True, text=True, cwd=REPO_ROOT
+    )
+    entry = {
+        'fixture': fixture['name'],
+        'format': fixture['format'],
+        'size': fixture['size'],
+        'bytes': fixture['bytes'],
+        'code_path': code_path,
+    }
+    try:
+        child = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        entry['error'] = (proc.stderr.strip().splitlines() or ['子プロセスが異常終了しました'])[-1]
+        return entry
+
+    if child['error']:
+        entry['error'] = child['error']
+        return entry
+
+    warm = child['warm_s'] or [child['cold_s']]
+    warm_sorted = sorted(warm)
+    mean = statistics.fmean(warm)
+    entry.update({
+        'cold_s': child['cold_s'],
+        'warm_median_s': statistics.median(warm),
+        'warm_p95_s': warm_sorted[min(len(warm_sorted) - 1, int(round(0.95 * (len(warm_sorted) - 1))))],
+        'files_per_s': 1.0 / mean if mean > 0 else None,
+        'mb_per_s': fixture['bytes'] / (1024 * 1024) / mean if mean > 0 else None,
+        'peak_rss_mb': child['peak_rss_mb'],
+        'error': None,
+    })
+    return entry
+
+
+def compare(results, baseline, threshold):
+    """
+    ベースラインと比較して、しきい値を超えて悪化した項目を返す
+
+    Returns:
+        list[str]: 悪化した項目の説明
+    """
+    base = {(r['fixture'], r['code_path']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = base.get((r['fixture'], r['code_path']))
+        if not b or r.get('error') or b.get('error'):
+            continue
+        for metric in COMPARED_METRICS:
+            if r.get(metric) is None or not b.get(metric):
+                continue
+            ratio = r[metric] / b[metric]
+            if ratio > 1 + threshold:
+                regressions.append(
+                    f"{r['fixture']} [{r['code_path']}] {metric}: {b[metric]:.4g} -> {r[metric]:.4g} (x{ratio:.2f})"
+                )
+    return regressions
+
+
+def _format_row(r):
+    if r.get('error'):
+        return f"{r['fixture']:<14} {r['code_path']:<13} エラー: {r['error']}"
+    rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else '-'
+    return (
+        f"{r['fixture']:<14} {r['code_path']:<13} "
+        f"{r['cold_s'] * 1000:>9.1f} {r['warm_median_s'] * 1000:>9.1f} {r['warm_p95_s'] * 1000:>9.1f} "
+        f"{r['files_per_s']:>9.2f} {r['mb_per_s']:>8.2f} {rss:>8}"
+    )
+
+
+def _markitdown_version():
+    sys.path.insert(0, REPO_ROOT)
+    from disk_cache import markitdown_version
+    return markitdown_version()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='変換スループットとレイテンシのベンチマーク')
+    parser.add_argument('--sizes', nargs='+', default=['small', 'medium'], choices=['small', 'medium', 'large'],
+                        help='計測するサイズ')
+    parser.add_argument('--formats', nargs='+', default=None, help='計測する形式 (デフォルト: すべて)')
+    parser.add_argument('--paths', nargs='+', default=list(CODE_PATHS), choices=CODE_PATHS,
+                        help='計測するコードパス')
+    parser.add_argument('--repeat', type=int, default=5, help='ウォームレイテンシの計測回数')
+    parser.add_argument('--fixtures-dir', default=DEFAULT_FIXTURES_DIR, help='入力ファイルを生成するディレクトリ')
+    parser.add_argument('-o', '--output', help='結果を書き込むJSONファイル')
+    parser.add_argument('--baseline', help='比較するベースラインの結果 (JSON)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='悪化とみなす割合 (0.25 = ベースラインより25%%以上遅い・大きい)')
+    parser.add_argument('--child', nargs=2, metavar=('CODE_PATH', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return run_child(args.child[0], args.child[1], args.repeat)
+
+    sys.path.insert(0, BENCH_DIR)
+    from fixtures import FORMATS, generate_fixtures
+
+    fixtures = generate_fixtures(args.fixtures_dir, args.sizes, args.formats or FORMATS)
+
+    paths = list(args.paths)
+    if 'worker' in paths and subprocess.run([sys.executable, '-c', 'import PySide6'], capture_output=True).returncode:
+        print("[SKIP] worker: PySide6がインストールされていません")
+        paths.remove('worker')
+
+    print(f"{'fixture':<14} {'code_path':<13} {'cold ms':>9} {'warm ms':>9} {'p95 ms':>9} "
+          f"{'files/s':>9} {'MB/s':>8} {'RSS MB':>8}")
+    results = []
+    for fixture in fixtures:
+        for code_path in paths:
+            entry = measure(fixture, code_path, args.repeat)
+            results.append(entry)
+            print(_format_row(entry), flush=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'markitdown': _markitdown_version(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に保存しました。")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"ベースラインより {args.threshold:.0%} 以上悪化した項目:")
+            for line in regressions:
+                print(f"- {line}")
+            return 1
+        print("ベースラインからの悪化はありません。")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
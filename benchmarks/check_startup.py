@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+CLI/GUIの起動時間の回帰チェック
+
+`python -X importtime` でCLIの軽量なコマンド (-l, --help, 引数エラー) と
+GUIモジュールのインポートを実行し、
+- 重い依存関係 (markitdown など) が読み込まれていないこと
+- インポート時間の合計が予算内に収まっていること
+を確認する。問題があれば終了コード1を返す。
+
+使い方:
+    python benchmarks/check_startup.py [--budget-ms 150] [--runs 5]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI_PATH = os.path.join(REPO_ROOT, 'convert_to_markdown.py')
+
+# 起動直後に読み込まれてはいけないモジュール (パッケージ名の先頭で判定)
+CLI_FORBIDDEN = ('markitdown', 'multiprocessing', 'concurrent.futures', 'requests', 'youtube_transcript_api')
+GUI_FORBIDDEN = ('markitdown', 'requests', 'youtube_transcript_api', 'urllib.request', 'multiprocessing',
+                 'concurrent.futures', 'conversion_tasks', 'converter_registry', 'worker_process')
+
+CLI_CASES = [
+    ('-l', [CLI_PATH, '-l']),
+    ('--help', [CLI_PATH, '--help']),
+    ('引数エラー', [CLI_PATH, '--no-such-option']),
+    ('存在しないファイル', [CLI_PATH, os.path.join(REPO_ROOT, 'no-such-file.pdf')]),
+]
+
+
+def parse_importtime(stderr):
+    """
+    -X importtime の出力を解析する
+
+    Returns:
+        tuple[set[str], float]: (読み込まれたモジュール名, トップレベルのインポートの累積時間 [ms])
+    """
+    modules = set()
+    total_us = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # 形式: "import time: <self [us]> | <cumulative [us]> | <インデント付きのモジュール名>"
+        _, cumulative, name = line.split('|', 2)
+        modules.add(name.strip())
+        # インデントされていない行がトップレベルのインポート
+        if not name[1:].startswith(' '):
+            total_us += int(cumulative)
+    return modules, total_us / 1000.0
+
+
+def run_case(args, runs):
+    """
+    コマンドを複数回実行し、最も速かった回のインポート時間と読み込まれたモジュールを返す
+    """
+    best_ms = None
+    modules = set()
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime'] + args,
+            capture_output=True, text=True, cwd=REPO_ROOT
+        )
+        run_modules, total_ms = parse_importtime(proc.stderr)
+        modules |= run_modules
+        if best_ms is None or total_ms < best_ms:
+            best_ms = total_ms
+    return modules, best_ms
+
+
+def forbidden_modules(modules, forbidden):
+    return sorted(m for m in modules if any(m == f or m.startswith(f + '.') for f in forbidden))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI/GUIの起動時間の回帰チェック')
+    parser.add_argument('--budget-ms', type=float, default=150.0,
+                        help='CLIのインポート時間の予算 (ミリ秒)')
+    parser.add_argument('--runs', type=int, default=5, help='各コマンドの実行回数 (最速の回で判定)')
+    parser.add_argument('--skip-gui', action='store_true', help='GUIモジュールのチェックを省略する')
+    args = parser.parse_args()
+
+    failed = False
+    for label, case_args in CLI_CASES:
+        modules, total_ms = run_case(case_args, args.runs)
+        bad = forbidden_modules(modules, CLI_FORBIDDEN)
+        ok = not bad and total_ms <= args.budget_ms
+        failed |= not ok
+        print(f"[{'OK' if ok else 'NG'}] CLI {label}: {total_ms:.1f} ms (予算 {args.budget_ms:.0f} ms)")
+        if bad:
+            print(f"    読み込まれてはいけないモジュール: {', '.join(bad)}")
+
+    if not args.skip_gui:
+        # PySide6自体の読み込み時間は環境差が大きいため、重い依存関係を読み込まないことのみ確認する
+        gui_args = ['-c', 'import markitdown_app']
+        proc = subprocess.run([sys.executable, '-c', 'import PySide6'], capture_output=True, cwd=REPO_ROOT)
+        if proc.returncode != 0:
+            print("[SKIP] GUI: PySide6がインストールされていません")
+        else:
+            modules, total_ms = run_case(gui_args, 1)
+            bad = forbidden_modules(modules, GUI_FORBIDDEN)
+            failed |= bool(bad)
+            print(f"[{'NG' if bad else 'OK'}] GUI モジュールのインポート: {total_ms:.1f} ms")
+            if bad:
+                print(f"    読み込まれてはいけないモジュール: {', '.join(bad)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ベンチマーク用の入力ファイルを生成する
+
+乱数のシードを固定しているため、同じサイズを指定すれば毎回同じ内容のファイルが生成される。
+XLSXとPPTXはopenpyxl / python-pptx (markitdown[all] の依存関係) で生成し、
+インストールされていない場合は生成しない。
+"""
+
+import os
+import io
+import csv
+import json
+import random
+import zipfile
+
+# サイズごとの規模 (段落数、表の行数、PDFのページ数、スライド数)
+SIZES = {
+    'small': {'paragraphs': 10, 'rows': 20, 'pages': 1, 'slides': 3},
+    'medium': {'paragraphs': 1000, 'rows': 2000, 'pages': 50, 'slides': 50},
+    'large': {'paragraphs': 20000, 'rows': 50000, 'pages': 500, 'slides': 300},
+}
+
+FORMATS = ('txt', 'csv', 'json', 'xml', 'html', 'docx', 'xlsx', 'pptx', 'pdf', 'zip')
+
+_WORDS = (
+    'markdown converter document table report summary value section chapter figure '
+    'analysis result data sample page slide sheet column row header footer note index '
+    'revenue quarter region product customer order total average metric growth'
+).split()
+
+# ZIPに書き込むファイルの日時 (固定してファイルの内容を決定的にする)
+_ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _paragraphs(rng, count):
+    return [_sentence(rng, rng.randint(8, 24)) for _ in range(count)]
+
+
+def _rows(rng, count):
+    header = ['id', 'region', 'product', 'quantity', 'price', 'note']
+    rows = [
+        [i, rng.choice(_WORDS), rng.choice(_WORDS), rng.randint(1, 1000),
+         round(rng.uniform(1, 10000), 2), _sentence(rng, 5)]
+        for i in range(count)
+    ]
+    return header, rows
+
+
+def _zip_bytes(members):
+    """(名前, 内容) のリストからZIPのバイト列を作る"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members:
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            zf.writestr(info, data)
+    return buffer.getvalue()
+
+
+def _escape_xml(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def make_txt(rng, scale):
+    return '\n\n'.join(_paragraphs(rng, scale['paragraphs'])).encode('utf-8')
+
+
+def make_csv(rng, scale):
+    header, rows = _rows(rng, scale['rows'])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def make_json(rng, scale):
+    header, rows = _rows(rng, scale['rows'])
+    return json.dumps([dict(zip(header, row)) for row in rows], indent=1).encode('utf-8')
+
+
+def make_xml(rng, scale):
+    header, rows = _rows(rng, scale['rows'])
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<orders>']
+    for row in rows:
+        fields = ''.join(f'<{h}>{_escape_xml(str(v))}</{h}>' for h, v in zip(header, row))
+        lines.append(f'  <order>{fields}</order>')
+    lines.append('</orders>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def make_html(rng, scale):
+    parts = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Benchmark</title></head><body>']
+    for i, paragraph in enumerate(_paragraphs(rng, scale['paragraphs'])):
+        if i % 20 == 0:
+            parts.append(f'<h2>Section {i // 20 + 1}</h2>')
+        parts.append(f'<p>{_escape_xml(paragraph)}</p>')
+    header, rows = _rows(rng, min(scale['rows'], 500))
+    parts.append('<table><tr>' + ''.join(f'<th>{h}</th>' for h in header) + '</tr>')
+    for row in rows:
+        parts.append('<tr>' + ''.join(f'<td>{_escape_xml(str(v))}</td>' for v in row) + '</tr>')
+    parts.append('</table></body></html>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def make_docx(rng, scale):
+    body = []
+    for i, paragraph in enumerate(_paragraphs(rng, scale['paragraphs'])):
+        if i % 20 == 0:
+            body.append(
+                '<w:p><w:pPr><w:pStyle w:val="Heading1"/></w:pPr>'
+                f'<w:r><w:t>Section {i // 20 + 1}</w:t></w:r></w:p>'
+            )
+        body.append(f'<w:p><w:r><w:t>{_escape_xml(paragraph)}</w:t></w:r></w:p>')
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        '<w:body>' + ''.join(body) + '</w:body></w:document>'
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        '</Types>'
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/>'
+        '</Relationships>'
+    )
+    return _zip_bytes([
+        ('[Content_Types].xml', content_types),
+        ('_rels/.rels', rels),
+        ('word/document.xml', document),
+    ])
+
+
+def make_xlsx(rng, scale):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return None
+    workbook = Workbook(write_only=True)
+    header, rows = _rows(rng, scale['rows'])
+    for sheet_index in range(2):
+        sheet = workbook.create_sheet(f'Sheet{sheet_index + 1}')
+        sheet.append(header)
+        for row in rows[sheet_index::2]:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return _normalize_zip(buffer.getvalue())
+
+
+def make_pptx(rng, scale):
+    try:
+        from pptx import Presentation
+    except ImportError:
+        return None
+    presentation = Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(scale['slides']):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f'Slide {i + 1}: {_sentence(rng, 4)}'
+        body = slide.placeholders[1].text_frame
+        body.text = _sentence(rng)
+        for _ in range(4):
+            body.add_paragraph().text = _sentence(rng)
+    buffer = io.BytesIO()
+    presentation.save(buffer)
+    return _normalize_zip(buffer.getvalue())
+
+
+def _normalize_zip(data):
+    """ライブラリが書き込む日時を固定値に置き換えてZIPの内容を決定的にする"""
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        members = [(info.filename, zf.read(info)) for info in zf.infolist()]
+    return _zip_bytes(members)
+
+
+def make_pdf(rng, scale):
+    """Helveticaのテキストだけを含むPDFを組み立てる"""
+    lines_per_page = 45
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(None)
+    pages_id = add(None)
+    font_id = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>')
+    page_ids = []
+    for page in range(scale['pages']):
+        text_lines = [f'Page {page + 1}'] + [_sentence(rng, 10) for _ in range(lines_per_page - 1)]
+        ops = ['BT', '/F1 10 Tf', '14 TL', '50 800 Td']
+        for line in text_lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            ops.append(f'({escaped}) Tj T*')
+        ops.append('ET')
+        stream = '\n'.join(ops).encode('latin-1')
+        content_id = add(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        page_ids.append(add(
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>' % (pages_id, font_id, content_id)
+        ))
+    objects[catalog_id - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id
+    kids = b' '.join(b'%d 0 R' % i for i in page_ids)
+    objects[pages_id - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1, catalog_id, xref))
+    return out.getvalue()
+
+
+def make_zip(rng, scale):
+    members = [
+        ('notes.txt', make_txt(rng, scale)),
+        ('data/orders.csv', make_csv(rng, scale)),
+        ('data/orders.json', make_json(rng, scale)),
+        ('pages/index.html', make_html(rng, scale)),
+        ('docs/report.docx', make_docx(rng, scale)),
+    ]
+    return _zip_bytes(members)
+
+
+_MAKERS = {
+    'txt': make_txt,
+    'csv': make_csv,
+    'json': make_json,
+    'xml': make_xml,
+    'html': make_html,
+    'docx': make_docx,
+    'xlsx': make_xlsx,
+    'pptx': make_pptx,
+    'pdf': make_pdf,
+    'zip': make_zip,
+}
+
+
+def generate_fixtures(out_dir, sizes=('small', 'medium', 'large'), formats=FORMATS):
+    """
+    ベンチマーク用のファイルを生成する (既に同じ内容のファイルがあれば書き込まない)
+
+    Args:
+        out_dir (str): 出力ディレクトリ
+        sizes (iterable[str], optional): 生成するサイズ (small / medium / large)
+        formats (iterable[str], optional): 生成する形式
+
+    Returns:
+        list[dict]: 生成したファイルの情報 (name, format, size, path, bytes)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    fixtures = []
+    for size in sizes:
+        scale = SIZES[size]
+        for fmt in formats:
+            # 形式とサイズごとにシードを固定する
+            rng = random.Random(f'{fmt}-{size}')
+            data = _MAKERS[fmt](rng, scale)
+            if data is None:
+                print(f"[SKIP] {fmt} ({size}): 生成に必要なライブラリがインストールされていません")
+                continue
+            name = f'{size}.{fmt}'
+            path = os.path.join(out_dir, name)
+            try:
+                with open(path, 'rb') as f:
+                    unchanged = f.read() == data
+            except OSError:
+                unchanged = False
+            if not unchanged:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            fixtures.append({'name': name, 'format': fmt, 'size': size, 'path': path, 'bytes': len(data)})
+    return fixtures
@@ -0,0 +1,420 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+常駐変換サーバーとそのクライアント
+
+MarkItDownを生成済みの状態で常駐させ、ローカルのHTTP (TCP) またはUnixドメインソケット経由で
+変換リクエストを受け付ける。クライアントはPythonの起動とmarkitdownの読み込みを待たずに
+変換結果を受け取れる。
+
+API:
+    GET  /health   サーバーの状態 (JSON)
+    POST /convert  変換してMarkdownを返す
+        - Content-Type: application/json の場合: {"path": "<サーバーから読めるファイルの絶対パス>",
+          "enable_plugins": false}
+        - それ以外の場合: リクエストボディをファイルの内容として変換する
+          (ファイル名はX-Filenameヘッダーで指定し、拡張子を形式の判定に使う。
+          プラグインはクエリ ?plugins=1 で有効にする)
+
+ワーカー数を超えたリクエストはキューで待たせ、キューも一杯の場合は503を返す (バックプレッシャー)。
+
+サーバーはサーバーから読めるファイルを変換して返すため、同じユーザーのクライアントだけが使えるようにする。
+起動するたびにランダムなトークンを生成して本人だけが読めるファイル (パーミッション0600) に書き、
+すべてのリクエストにX-MarkItDown-Tokenヘッダーでトークンを付けることを求める (一致しない場合は403)。
+ブラウザからのリクエスト (DNSリバインディング) は独自のヘッダーを付けられないため拒否される。
+Unixドメインソケットも本人だけが接続できるパーミッションで作る。
+パスを指定する変換は通常のファイルだけを受け付ける (デバイスやFIFOなどは拒否する)。
+"""
+
+import os
+import sys
+import hmac
+import json
+import socket
+import hashlib
+import secrets
+import threading
+import http.client
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+
+from disk_cache import default_cache_dir
+
+DEFAULT_ADDRESS = '127.0.0.1:8765'
+# 環境変数でサーバーのアドレスを指定できる
+ADDRESS_ENV = 'MARKITDOWN_SERVER'
+# サーバーからのレスポンスであることを確認するためのヘッダー
+SERVER_HEADER = 'X-MarkItDown-Converter'
+# クライアントがトークンを送るヘッダー
+TOKEN_HEADER = 'X-MarkItDown-Token'
+MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+
+
+def default_address():
+    """環境変数またはデフォルトのサーバーアドレスを返す"""
+    return os.environ.get(ADDRESS_ENV) or DEFAULT_ADDRESS
+
+
+def token_path(address):
+    """
+    サーバーのアドレスに対応するトークンファイルのパスを返す
+
+    トークンファイルはユーザーのキャッシュディレクトリに置く (他のユーザーからは読めない)。
+    """
+    name = hashlib.sha256(address.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(default_cache_dir('server'), f"token-{name}")
+
+
+def _write_token(path):
+    """新しいトークンを生成し、本人だけが読めるファイルに書き込む"""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    if os.path.exists(path):
+        os.remove(path)
+    # O_EXCLで作り、パーミッションを最初から0600にする (書き込み前に他のユーザーに読まれないように)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(token)
+    return token
+
+
+def read_token(address):
+    """サーバーのトークンを読み込む。トークンファイルがない (サーバーが動いていない) 場合はNone"""
+    try:
+        with open(token_path(address), 'r', encoding='ascii') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def parse_address(address):
+    """
+    サーバーのアドレスを解析する
+
+    Args:
+        address (str): "host:port" または "unix:/path/to/socket"
+
+    Returns:
+        tuple[str, object]: ('unix', ソケットのパス) または ('tcp', (host, port))
+    """
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"サーバーのアドレスが不正です: {address} (host:port または unix:/path の形式で指定してください)")
+    return 'tcp', (host, int(port))
+
+
+class ServerBusy(Exception):
+    """サーバーのキューが一杯でリクエストを受け付けられない"""
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server_version = 'MarkItDownConverter/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # Unixドメインソケットの場合はクライアントのアドレスがない
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return 'unix'
+
+    def log_message(self, format, *args):
+        if not self.server.app.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header(SERVER_HEADER, '1')
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False), 'application/json; charset=utf-8')
+
+    def _authorized(self):
+        """リクエストのトークンがサーバーのトークンと一致するか (一致しない場合は403を返す)"""
+        token = self.headers.get(TOKEN_HEADER, '')
+        if hmac.compare_digest(token.encode('utf-8'), self.server.app.token.encode('utf-8')):
+            return True
+        self._send_json(403, {'error': 'forbidden'})
+        return False
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if urlsplit(self.path).path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+        self._send_json(200, self.server.app.status())
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_UPLOAD_BYTES:
+            self._send_json(413, {'error': 'request body too large'})
+            return
+        body = self.rfile.read(length)
+
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('application/json'):
+            try:
+                request = json.loads(body.decode('utf-8'))
+                job = ('path', request['path'], bool(request.get('enable_plugins', False)))
+                if not isinstance(job[1], str):
+                    raise TypeError('path must be a string')
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': f"invalid request: {e}"})
+                return
+            # 絶対パスの通常のファイルだけを変換する (デバイスやFIFOを読んで止まらないように)
+            if not os.path.isabs(job[1]) or not os.path.isfile(job[1]):
+                self._send_json(400, {'error': f"not a regular file: {job[1]}"})
+                return
+        else:
+            query = parse_qs(url.query)
+            enable_plugins = query.get('plugins', ['0'])[0] in ('1', 'true')
+            filename = unquote(self.headers.get('X-Filename', ''))
+            job = ('bytes', (body, filename), enable_plugins)
+
+        try:
+            text_content = self.server.app.submit(job)
+        except ServerBusy:
+            self._send_json(503, {'error': 'server busy'})
+            return
+        except Exception as e:
+            self._send_json(422, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self._send(200, text_content, 'text/markdown; charset=utf-8')
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ConversionServer:
+    """変換リクエストを受け付ける常駐サーバー"""
+
+    def __init__(self, address, convert_path, convert_bytes, workers=4, queue_size=16, quiet=False):
+        """
+        Args:
+            address (str): 待ち受けるアドレス ("host:port" または "unix:/path/to/socket")
+            convert_path (callable): (ファイルパス, enable_plugins) を受け取りMarkdownを返す関数
+            convert_bytes (callable): (データ, ファイル名, enable_plugins) を受け取りMarkdownを返す関数
+            workers (int, optional): 同時に変換するワーカー数
+            queue_size (int, optional): ワーカーの空きを待てるリクエスト数
+            quiet (bool, optional): リクエストごとのログを表示しない
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.address = address
+        self.convert_path = convert_path
+        self.convert_bytes = convert_bytes
+        self.workers = workers
+        self.queue_size = queue_size
+        self.quiet = quiet
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='markitdown-server')
+        # 実行中と待機中を合わせたリクエスト数の上限
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+
+        kind, target = parse_address(address)
+        if kind == 'unix':
+            if os.path.exists(target):
+                os.remove(target)
+            # ソケットを本人だけが接続できるパーミッション (0600) で作る
+            umask = os.umask(0o177)
+            try:
+                self._httpd = _UnixServer(target, _RequestHandler)
+            finally:
+                os.umask(umask)
+        else:
+            self._httpd = _TCPServer(target, _RequestHandler)
+        self._httpd.app = self
+        self._unix_path = target if kind == 'unix' else None
+        # 待ち受けを始めてからトークンを書く (クライアントはトークンファイルがあればサーバーを使う)
+        self._token_path = token_path(address)
+        self.token = _write_token(self._token_path)
+
+    def status(self):
+        with self._lock:
+            return {
+                'status': 'ok',
+                'pid': os.getpid(),
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+            }
+
+    def submit(self, job):
+        """
+        変換ジョブを実行し、結果のMarkdownを返す (キューが一杯の場合はServerBusyを送出)
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServerBusy()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            kind, payload, enable_plugins = job
+            if kind == 'path':
+                future = self._executor.submit(self.convert_path, payload, enable_plugins)
+            else:
+                data, filename = payload
+                future = self._executor.submit(self.convert_bytes, data, filename, enable_plugins)
+            return future.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+            self._slots.release()
+
+    def serve_forever(self):
+        print(f"変換サーバーを起動しました: {self.address} (ワーカー {self.workers} / キュー {self.queue_size})",
+              file=sys.stderr)
+        print(f"トークンファイル: {self._token_path}", file=sys.stderr)
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self._httpd.server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._unix_path and os.path.exists(self._unix_path):
+            os.remove(self._unix_path)
+        if os.path.exists(self._token_path):
+            os.remove(self._token_path)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self._socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._socket_path)
+
+
+class ConversionClient:
+    """常駐変換サーバーのクライアント"""
+
+    def __init__(self, address=None, connect_timeout=0.2, timeout=None):
+        """
+        Args:
+            address (str, optional): サーバーのアドレス。省略時は環境変数またはデフォルト
+            connect_timeout (float, optional): 接続のタイムアウト (秒)。サーバーが動いていない場合はすぐに諦める
+            timeout (float, optional): 変換結果を待つタイムアウト (秒)
+        """
+        self.address = address or default_address()
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+
+    def _connection(self):
+        kind, target = parse_address(self.address)
+        if kind == 'unix':
+            if not os.path.exists(target):
+                raise ConnectionRefusedError(target)
+            conn = _UnixHTTPConnection(target, self.connect_timeout)
+        else:
+            conn = http.client.HTTPConnection(target[0], target[1], timeout=self.connect_timeout)
+        conn.connect()
+        # 接続できたら変換が終わるまで待つ
+        conn.sock.settimeout(self.timeout)
+        return conn
+
+    def _request(self, method, path, body=None, headers=None):
+        """
+        サーバーにリクエストを送る。サーバーが動いていない・混雑している場合はNoneを返す
+
+        Returns:
+            tuple[int, bytes] | None: (ステータスコード, レスポンスボディ)
+        """
+        # トークンファイルがなければサーバーは動いていない (または別のユーザーのサーバー)
+        token = read_token(self.address)
+        if token is None:
+            return None
+        headers = dict(headers or {}, **{TOKEN_HEADER: token})
+        try:
+            conn = self._connection()
+        except OSError:
+            return None
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            # 別のサービスが同じポートで動いている場合や、トークンが古い場合は使わない
+            if response.getheader(SERVER_HEADER) != '1' or response.status in (403, 503):
+                return None
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            return None
+        finally:
+            conn.close()
+
+    def health(self):
+        """サーバーの状態を返す。サーバーが動いていない場合はNone"""
+        result = self._request('GET', '/health')
+        if result is None or result[0] != 200:
+            return None
+        return json.loads(result[1].decode('utf-8'))
+
+    def _result(self, result):
+        if result is None:
+            return None
+        status, data = result
+        if status != 200:
+            try:
+                message = json.loads(data.decode('utf-8')).get('error', '')
+            except ValueError:
+                message = data.decode('utf-8', 'replace')
+            raise RuntimeError(message)
+        return data.decode('utf-8')
+
+    def convert_path(self, file_path, enable_plugins=False):
+        """
+        ファイルをサーバーで変換する
+
+        Returns:
+            str | None: Markdownテキスト。サーバーが使えない場合はNone (呼び出し元でローカルに変換する)
+        """
+        body = json.dumps({'path': os.path.abspath(file_path), 'enable_plugins': enable_plugins})
+        return self._result(self._request(
+            'POST', '/convert', body=body.encode('utf-8'),
+            headers={'Content-Type': 'application/json'}
+        ))
+
+    def convert_bytes(self, data, filename='', enable_plugins=False):
+        """
+        ファイルの内容をアップロードしてサーバーで変換する
+
+        Returns:
+            str | None: Markdownテキスト。サーバーが使えない場合はNone
+        """
+        path = '/convert?plugins=1' if enable_plugins else '/convert'
+        return self._result(self._request(
+            'POST', path, body=data,
+            headers={'Content-Type': 'application/octet-stream', 'X-Filename': quote(filename)}
+        ))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+GUIの変換処理 (Qtに依存しない部分)
+
+ConversionWorker、変換キューのジョブ、YouTubeの一括変換から使う。
+変換を子プロセス (worker_process) で実行するため、子プロセスで読み込めるように
+PySide6をインポートしないモジュールに分けている。
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+from contextlib import ExitStack
+
+import converter_registry
+import http_client
+import instrumentation
+import worker_process
+from disk_cache import ConversionCache, hash_file
+from youtube_helpers import fetch_transcript
+
+_transcript_patch_lock = threading.Lock()
+_transcript_patched = False
+
+# YouTubeTranscriptApi().fetch() が返すセグメントと同じ属性を持つ文字起こしの断片
+TranscriptSnippet = namedtuple('TranscriptSnippet', ('text', 'start', 'duration'))
+
+
+def _fetch_with_cache(self, video_id, languages=('en',), preserve_formatting=False):
+    """
+    YouTubeTranscriptApi().fetch() の代わりに使う (markitdown 0.1.x の YouTubeConverter から呼ばれる)
+
+    fetch_transcript を通してキャッシュ、共有のHTTPセッション、自動生成の文字起こしへの切り替えを使う。
+
+    Returns:
+        list[TranscriptSnippet]: 文字起こしのセグメント。文字起こしがない場合は空のリスト
+            (MarkItDownは空の結果を文字起こしなしとして扱い、再試行しない)
+    """
+    segments = fetch_transcript(video_id, list(languages))
+    if isinstance(segments, str):
+        return []
+    return [TranscriptSnippet(segment.get('text', ''), segment.get('start', 0.0), segment.get('duration', 0.0))
+            for segment in segments]
+
+
+def install_transcript_patch():
+    """
+    YouTubeTranscriptApi の文字起こしの取得を堅牢な fetch_transcript に置き換える
+    (youtube_transcript_api を読み込むため、最初の変換前またはバックグラウンドで呼ぶ)
+
+    youtube_transcript_api 1.x ではMarkItDownはインスタンスの fetch() を呼ぶため fetch を、
+    0.x ではクラスメソッドの get_transcript を置き換える。
+    """
+    global _transcript_patched
+    with _transcript_patch_lock:
+        if _transcript_patched:
+            return
+        from youtube_transcript_api import YouTubeTranscriptApi
+        if hasattr(YouTubeTranscriptApi, 'fetch'):
+            YouTubeTranscriptApi.fetch = _fetch_with_cache
+        # Override the default get_transcript method with our robust version
+        YouTubeTranscriptApi.get_transcript = fetch_transcript
+        _transcript_patched = True
+
+
+def _build_proxy_url(proxy_settings):
+    """
+    プロキシ設定からプロキシURLを組み立てる (プロキシを使用しない場合はNone)
+    """
+    if not proxy_settings or not proxy_settings.get('use_proxy', False):
+        return None
+    proxy_host = proxy_settings.get('proxy_host', '')
+    proxy_port = proxy_settings.get('proxy_port', '')
+    if not (proxy_host and proxy_port):
+        return None
+
+    # 認証情報の追加
+    proxy_user = proxy_settings.get('proxy_user', '')
+    proxy_pass = proxy_settings.get('proxy_pass', '')
+    if proxy_user and proxy_pass:
+        return f"http://{proxy_user}:{proxy_pass}@{proxy_host}:{proxy_port}"
+    return f"http://{proxy_host}:{proxy_port}"
+
+
+def build_network_config(proxy_settings):
+    """
+    設定ダイアログのプロキシ設定から変換ごとのネットワーク設定を作る
+
+    Returns:
+        http_client.NetworkConfig | None: プロキシを使わない場合はNone (環境変数のプロキシ設定に従う)
+    """
+    proxy_url = _build_proxy_url(proxy_settings)
+    if not proxy_url:
+        return None
+    # SSL検証スキップの設定
+    return http_client.NetworkConfig(proxy=proxy_url, verify=not proxy_settings.get('skip_ssl_verify', False))
+
+
+def build_markitdown_options(enable_plugins, network=None, transcript_language=None):
+    """
+    MarkItDownに渡すオプションを作る
+    (同じオプションのインスタンスはconverter_registryで使い回される)
+
+    Args:
+        network (http_client.NetworkConfig, optional): MarkItDownのHTTPセッションに適用するネットワーク設定
+    """
+    options = {
+        'enable_plugins': enable_plugins
+    }
+    # YouTube文字起こしを有効にするためのオプション
+    options['youtube'] = {
+        'include_transcript': True,
+        'transcript_languages': [transcript_language or 'ja']
+    }
+
+    if network is not None:
+        options['network'] = network
+
+    return options
+
+
+def convert_source(file_path, enable_plugins, network=None, transcript_language=None, cache=None):
+    """
+    ファイルまたはURLをMarkdownに変換する
+
+    Args:
+        file_path (str): 変換するファイルのパスまたはURL
+        enable_plugins (bool): プラグインを有効にするかどうか
+        network (http_client.NetworkConfig, optional): プロキシとSSL証明書の検証の設定
+            (環境変数は変更せず、この変換のHTTPセッションと文字起こしの取得だけに適用する)
+        transcript_language (str, optional): YouTube文字起こしの言語
+        cache (ConversionCache, optional): 変換結果のキャッシュ (Noneの場合はキャッシュしない)
+
+    Returns:
+        str: Markdownテキスト
+    """
+    # YouTube文字起こしの取得処理を差し替える (起動時の読み込みが未完了の場合に備えて)
+    install_transcript_patch()
+    
+    # markitdownに渡すオプションを準備
+    options = build_markitdown_options(enable_plugins, network, transcript_language)
+    
+    # キャッシュにあれば変換せずに結果を返す (URLは内容が変わりうるためキャッシュしない)
+    cache_key = None
+    digest = None
+    if cache is not None and os.path.isfile(file_path):
+        with instrumentation.span('cache_lookup') as extra:
+            digest = hash_file(file_path)
+            cache_key = cache.key_for_source(digest, file_path, {
+                'enable_plugins': enable_plugins,
+                'transcript_language': transcript_language or 'ja',
+            })
+            cached = cache.get(cache_key)
+            extra['hit'] = cached is not None
+        if cached is not None:
+            return cached
+    
+    # ファイルは先頭のマジックバイトから形式を判定し、MarkItDownに変換器を直接選ばせる
+    stream_info = None
+    with instrumentation.span('detect') as extra:
+        extra['kind'] = 'url' if re.match(r'https?://', file_path) else 'file'
+        extra['extension'] = os.path.splitext(file_path)[1].lower()
+        if extra['kind'] == 'file' and os.path.isfile(file_path):
+            import format_sniffer
+            decision = format_sniffer.sniff(file_path, digest)
+            extra['format'], extra['method'] = decision['format'], decision['method']
+            stream_info = format_sniffer.stream_info(decision)
+    
+    # 同じオプションで生成済みのMarkItDownインスタンスを使い回す
+    # (オプションにはプロキシの認証情報が含まれるため、記録する前に取り除く)
+    with ExitStack() as stack:
+        with instrumentation.span('converter', options=instrumentation.redact_options(options)):
+            md = stack.enter_context(converter_registry.acquire_converter(options))
+        
+        # MarkItDownの内部から呼ばれる文字起こしの取得も同じネットワーク設定で行う
+        with instrumentation.span('convert'), http_client.use_network(network):
+            result = md.convert(file_path, stream_info=stream_info,
+                                youtube_transcript_languages=options['youtube']['transcript_languages'])
+    
+    if cache_key is not None:
+        with instrumentation.span('cache_store'):
+            cache.put(cache_key, result.text_content)
+    return result.text_content
+
+
+def init_worker():
+    """
+    変換用の子プロセスの初期化 (計測の設定を引き継ぎ、重い依存関係を先に読み込んでおく)
+    """
+    instrumentation.configure_from_env()
+    try:
+        install_transcript_patch()
+    except ImportError:
+        pass
+    # 最初の変換で読み込みを待たないように、起動時に読み込んでおく
+    import markitdown
+
+
+_pool_lock = threading.Lock()
+_default_pool = None
+
+
+def default_worker_pool():
+    """プロセスで共有する変換用の子プロセスのプール"""
+    global _default_pool
+    with _pool_lock:
+        if _default_pool is None:
+            _default_pool = worker_process.WorkerPool(init_worker, max_idle=max(4, os.cpu_count() or 1))
+        return _default_pool
+
+
+# 子プロセスで開いたキャッシュ (キャッシュディレクトリ -> ConversionCache)
+_caches = {}
+
+
+def convert_in_worker(conversion_id, file_path, enable_plugins, network=None, transcript_language=None,
+                      cache_dir=None):
+    """
+    子プロセスで convert_source を実行する (WorkerProcess.call から呼ばれる)
+
+    Args:
+        conversion_id (str): 親プロセスで付けた変換ID (計測イベントを関連付けるため)
+        cache_dir (str, optional): 変換結果のキャッシュディレクトリ (Noneの場合はキャッシュしない)
+    """
+    cache = None
+    if cache_dir:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = ConversionCache(cache_dir)
+    with instrumentation.context(conversion_id=conversion_id, source=file_path):
+        return convert_source(file_path, enable_plugins, network, transcript_language, cache)
@@ -7,51 +7,1003 @@ markitdownを使用してファイルをMarkdownに変換する簡単なプロ
 
 import os
 import sys
+import time
+import fnmatch
 import argparse
-from pathlib import Path
-from markitdown import MarkItDown
+from contextlib import ExitStack, contextmanager
 
+# markitdownや並列処理のモジュールは実際に変換するときまでインポートしない
+# (-l, --help, 引数エラーでは読み込まずに終了し、起動を速くするため)
+import converter_registry
+import instrumentation
+from disk_cache import ConversionCache, DEFAULT_MAX_BYTES, default_cache_dir, format_stats, hash_file, markitdown_version
 
-def convert_file(file_path, output_path=None, enable_plugins=False):
+# 入力ファイル・出力ファイルの代わりに標準入力・標準出力を使う指定
+STDIO = '-'
+# 出力ファイルの書き込みバッファのサイズ
+WRITE_BUFFER_BYTES = 1024 * 1024
+# 変換結果を書き込む単位 (文字数)。一度に書くとエンコードした結果の分だけメモリを使うため
+WRITE_CHUNK_CHARS = 256 * 1024
+
+
+def convert_file(file_path, output_path=None, enable_plugins=False, cache=None, client=None, profile_dir=None,
+                 timeout=None, memory_limit=None, chunks=None, pages=None, jobs=1, tables=None, input_format=None,
+                 options=None):
     """
     指定されたファイルをMarkdownに変換する
     
     Args:
-        file_path (str): 変換するファイルのパス
-        output_path (str, optional): 出力ファイルのパス。指定しない場合は標準出力に表示
+        file_path (str): 変換するファイルのパス ('-' の場合は標準入力)
+        output_path (str, optional): 出力ファイルのパス。指定しない場合と '-' の場合は標準出力に書き込む
         enable_plugins (bool, optional): プラグインを有効にするかどうか
+        cache (ConversionCache, optional): 変換結果のキャッシュ。指定しない場合は常に変換する
+        client (ConversionClient, optional): 常駐変換サーバーのクライアント。
+            サーバーが動いていればサーバーで変換し、動いていなければこのプロセスで変換する
+        profile_dir (str, optional): 指定した場合は変換のcProfileの結果をこのディレクトリに保存する
+        timeout (float, optional): 変換の制限時間 (秒)。指定した場合は子プロセスで変換し、
+            時間内に終わらなければ子プロセスを終了させて失敗とする
+        memory_limit (int, optional): 変換に使えるメモリの上限 (MB)。指定した場合は子プロセスで変換し、
+            上限を超えたら失敗とする (このプロセスは巻き込まない)
+        chunks (dict, optional): 指定した場合はMarkdownを見出し単位のチャンクに分割してJSONLで出力する
+            (chunk_options() で作る)
+        pages (str, optional): PDFの変換するページ ("1-10,15,20-")。PDF以外では無視する
+        jobs (int, optional): PDFのページ、XLSXのシートを並列に変換するプロセス数
+        tables (dict, optional): 表 (XLSX, CSV, TSV) の出力する行の制限 (table_options())
+        input_format (str, optional): 標準入力の形式 (拡張子。"pdf" や ".docx")。
+            指定しない場合はMarkItDownが内容から判定する
+        options (dict, optional): batch_options()で作ったオプション。子プロセスで変換する場合に
+            子プロセスの初期化 (プラグイン、計測イベントの書き出し) に使う。省略時は引数から作る
     
     Returns:
         bool: 変換が成功したかどうか
     """
+    if output_path == STDIO:
+        output_path = None
+    # 標準入力は一時ファイルを作らず、読み込んだ内容をメモリ上のストリームとして変換する
+    data = None
+    if file_path == STDIO:
+        file_path = '<stdin>' + _format_extension(input_format)
+        data = sys.stdin.buffer.read()
+    isolated = timeout is not None or memory_limit is not None
     try:
-        # MarkItDownインスタンスを作成
-        md = MarkItDown(enable_plugins=enable_plugins)
-        
-        # ファイルを変換
-        result = md.convert(file_path)
-        
-        # 結果を出力
-        if output_path:
-            # 出力ディレクトリが存在しない場合は作成
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-                
-            # ファイルに書き込み
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(result.text_content)
-            print(f"変換結果を {output_path} に保存しました。")
-        else:
-            # 標準出力に表示
-            print(result.text_content)
+        # 子プロセスで変換する場合は子プロセスで変換をプロファイルする
+        with _traced_conversion(file_path, None if isolated else profile_dir):
+            # 表のファイルは全体を文字列にせず、1行ずつ変換して出力に書き込む
+            if (data is None and chunks is None and timeout is None and memory_limit is None
+                    and _streams_table(file_path)):
+                if output_path:
+                    with _atomic_output(output_path) as f:
+                        _write_table(file_path, f, tables, jobs)
+                    print(f"変換結果を {output_path} に保存しました。")
+                else:
+                    with instrumentation.span('write', target='stdout'):
+                        _write_table(file_path, sys.stdout, tables, jobs)
+                return True
+            
+            # ファイルを変換
+            text_content = None
+            # ページの指定、制限時間、メモリの上限は常駐変換サーバーに渡せないため、このプロセスで変換する
+            if client is not None and not isolated and pages is None and jobs <= 1:
+                with instrumentation.span('remote_convert') as extra:
+                    if data is None:
+                        text_content = client.convert_path(file_path, enable_plugins)
+                    else:
+                        text_content = client.convert_bytes(data, file_path, enable_plugins)
+                    extra['served'] = text_content is not None
+            if text_content is None and isolated:
+                cache_dir, cache_max_bytes = (cache.cache_dir, cache.max_bytes) if cache is not None else (None, None)
+                if data is None:
+                    task, args = _isolated_convert, (file_path, enable_plugins, cache_dir, cache_max_bytes, pages,
+                                                     profile_dir)
+                else:
+                    task, args = _isolated_convert_bytes, (data, file_path, enable_plugins, cache_dir, cache_max_bytes,
+                                                           profile_dir)
+                if options is None:
+                    options = batch_options(enable_plugins, profile_dir=profile_dir, timeout=timeout,
+                                            memory_limit=memory_limit)
+                text_content = _worker_pool(options).run(task, (instrumentation.current_context(),) + args, timeout)
+            if text_content is None:
+                if data is None:
+                    text_content, _ = _convert_to_text(file_path, enable_plugins, cache, pages, jobs)
+                else:
+                    text_content, _ = _convert_bytes_to_text(data, file_path, enable_plugins, cache)
+            # 入力の内容はもう使わないので、出力を書き込む前に手放す
+            data = None
+            
+            # 結果を出力
+            if output_path:
+                _write_output(output_path, text_content, file_path, chunks)
+                print(f"変換結果を {output_path} に保存しました。")
+            elif chunks is not None:
+                import markdown_chunker
+                with instrumentation.span('write', target='stdout'):
+                    markdown_chunker.write_jsonl(sys.stdout, file_path, text_content, **chunks)
+            else:
+                # 標準出力に少しずつ書き込む (末尾の改行は従来の print と同じ)
+                with instrumentation.span('write', target='stdout'):
+                    _write_text(sys.stdout, text_content)
+                    sys.stdout.write('\n')
+                    sys.stdout.flush()
             
         return True
+    except BrokenPipeError:
+        raise
     except Exception as e:
         print(f"エラー: {e}", file=sys.stderr)
         return False
 
 
+def _traced_conversion(source, profile_dir=None):
+    """
+    1ファイル分の変換全体を計測する (変換ごとのIDを付け、必要ならcProfileも取る)
+    """
+    stack = ExitStack()
+    stack.enter_context(instrumentation.context(
+        conversion_id=instrumentation.new_conversion_id(), source=source))
+    stack.enter_context(instrumentation.span('conversion'))
+    stack.enter_context(instrumentation.profile(profile_dir, source))
+    return stack
+
+
+_pool = None
+
+
+def _worker_pool(options=None, max_idle=1):
+    """
+    --timeout または --memory-limit を指定した場合に変換を実行する子プロセスのプール
+    
+    Args:
+        options (dict, optional): batch_options()で作ったオプション (子プロセスの初期化に使う)
+        max_idle (int, optional): 待機させておく子プロセスの数
+    """
+    global _pool
+    import worker_process
+    if _pool is None:
+        options = options or batch_options()
+        _pool = worker_process.WorkerPool(_init_batch_process, (options,), max_idle,
+                                          memory_limit_mb=options.get('memory_limit'))
+    return _pool
+
+
+def _close_worker_pool():
+    """子プロセスのプールを閉じる (次に _worker_pool() を呼んだ場合は新しいプールを作る)"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+def _isolated_convert(context, file_path, enable_plugins, cache_dir, cache_max_bytes, pages=None, profile_dir=None):
+    """
+    子プロセスで1ファイルを変換する (計測イベントには親プロセスの変換IDを付ける)
+    (子プロセスはさらに子プロセスを起動できないため、PDFのページは並列に変換しない)
+    """
+    cache = open_cache(cache_dir, cache_max_bytes) if cache_dir else None
+    with instrumentation.context(**context), instrumentation.profile(profile_dir, file_path):
+        return _convert_to_text(file_path, enable_plugins, cache, pages)[0]
+
+
+def _isolated_convert_bytes(context, data, filename, enable_plugins, cache_dir, cache_max_bytes, profile_dir=None):
+    """子プロセスでメモリ上のファイルの内容 (標準入力) を変換する"""
+    cache = open_cache(cache_dir, cache_max_bytes) if cache_dir else None
+    with instrumentation.context(**context), instrumentation.profile(profile_dir, filename):
+        return _convert_bytes_to_text(data, filename, enable_plugins, cache)[0]
+
+
+def _format_extension(input_format):
+    """--format の指定 ("pdf", ".PDF") を拡張子 (".pdf") にする。指定がなければ空文字列"""
+    if not input_format:
+        return ''
+    return '.' + input_format.lower().lstrip('.')
+
+
+def _record_detection(extra, decision):
+    """形式の判定結果を計測のイベントに記録する"""
+    extra['extension'] = decision['extension']
+    extra['format'] = decision['format']
+    extra['mimetype'] = decision['mimetype']
+    extra['method'] = decision['method']
+
+
+def _output_options(enable_plugins, pages=None, tables=None, chunks=None):
+    """
+    変換結果に影響するオプションの辞書を作る (キャッシュのキーと同期モードのマニフェストで共有する)
+    
+    指定していないオプション (None、またはすべての値がNoneの辞書) は含めない
+    (オプションを追加しても既存のキャッシュのキーが変わらないようにする)。
+    """
+    output_options = {'enable_plugins': enable_plugins}
+    for name, value in (('pages', pages), ('tables', tables), ('chunks', chunks)):
+        if value is None or (isinstance(value, dict) and all(v is None for v in value.values())):
+            continue
+        output_options[name] = value
+    return output_options
+
+
+def _convert_to_text(file_path, enable_plugins=False, cache=None, pages=None, page_jobs=1):
+    """
+    ファイルを変換してMarkdownテキストを返す (エラーは呼び出し元に送出する)
+    
+    Args:
+        pages (str, optional): PDFの変換するページ (pdf_pages.parse_page_spec)。PDF以外では無視する
+        page_jobs (int, optional): PDFのページを並列に変換するプロセス数
+    
+    Returns:
+        tuple[str, bool | None]: (Markdownテキスト, キャッシュにヒットしたか。キャッシュ無効時はNone)
+    """
+    # ページを指定したPDFとページ単位で並列に変換するPDFはMarkItDownを通さずに変換する
+    page_mode = (pages is not None or page_jobs > 1) and file_path.lower().endswith('.pdf')
+    
+    import format_sniffer
+    
+    cache_key = None
+    digest = None
+    if cache is not None:
+        with instrumentation.span('cache_lookup') as extra:
+            key_options = _output_options(enable_plugins, pages if page_mode else None)
+            digest = hash_file(file_path)
+            cache_key = cache.key_for_source(digest, file_path, key_options)
+            text_content = cache.get(cache_key)
+            extra['hit'] = text_content is not None
+        if text_content is not None:
+            return text_content, True
+    
+    # 先頭のマジックバイトから形式を判定し、MarkItDownに変換器を直接選ばせる
+    with instrumentation.span('detect') as extra:
+        decision = format_sniffer.sniff(file_path, digest)
+        _record_detection(extra, decision)
+    
+    if page_mode:
+        import pdf_pages
+        with instrumentation.span('convert', pages=pages, page_jobs=page_jobs):
+            text_content = pdf_pages.convert_pdf(file_path, pages, page_jobs)
+    else:
+        # 生成済みのMarkItDownインスタンスを使い回す
+        options = _converter_options(enable_plugins)
+        with ExitStack() as stack:
+            with instrumentation.span('converter', options=options):
+                md = stack.enter_context(converter_registry.acquire_converter(options))
+            with instrumentation.span('convert'):
+                text_content = md.convert(file_path, stream_info=format_sniffer.stream_info(decision)).text_content
+    
+    if cache is not None:
+        with instrumentation.span('cache_store'):
+            cache.put(cache_key, text_content)
+        return text_content, False
+    return text_content, None
+
+
+def _convert_bytes_to_text(data, filename='', enable_plugins=False, cache=None):
+    """
+    メモリ上のファイルの内容を変換してMarkdownテキストを返す (エラーは呼び出し元に送出する)
+    
+    Args:
+        data (bytes): ファイルの内容
+        filename (str, optional): 元のファイル名 (拡張子を形式の判定に使う)
+    
+    Returns:
+        tuple[str, bool | None]: (Markdownテキスト, キャッシュにヒットしたか。キャッシュ無効時はNone)
+    """
+    import io
+    import hashlib
+    import format_sniffer
+    
+    cache_key = None
+    digest = None
+    if cache is not None:
+        with instrumentation.span('cache_lookup') as extra:
+            digest = hashlib.sha256(data).hexdigest()
+            cache_key = cache.key_for_source(digest, filename, _output_options(enable_plugins))
+            text_content = cache.get(cache_key)
+            extra['hit'] = text_content is not None
+        if text_content is not None:
+            return text_content, True
+    
+    with instrumentation.span('detect') as extra:
+        decision = format_sniffer.sniff_bytes(data, filename, digest)
+        _record_detection(extra, decision)
+        stream_info = format_sniffer.stream_info(decision, filename)
+    
+    options = _converter_options(enable_plugins)
+    with ExitStack() as stack:
+        with instrumentation.span('converter', options=options):
+            md = stack.enter_context(converter_registry.acquire_converter(options))
+        with instrumentation.span('convert', bytes=len(data)):
+            result = md.convert_stream(io.BytesIO(data), stream_info=stream_info)
+    
+    if cache is not None:
+        with instrumentation.span('cache_store'):
+            cache.put(cache_key, result.text_content)
+        return result.text_content, False
+    return result.text_content, None
+
+
+def serve(address, options, workers, queue_size=16, quiet=False):
+    """
+    常駐変換サーバーを起動する (終了するまで戻らない)
+    
+    Args:
+        address (str): 待ち受けるアドレス ("host:port" または "unix:/path/to/socket")
+        options (dict): batch_options()で作ったオプション (キャッシュの設定に使う)
+        workers (int): 同時に変換するワーカー数
+        queue_size (int, optional): ワーカーの空きを待てるリクエスト数
+    """
+    from conversion_server import ConversionServer
+    
+    cache = open_cache(options['cache_dir'], options['cache_max_bytes']) if options['cache_dir'] else None
+    
+    def convert_path(file_path, enable_plugins):
+        with _traced_conversion(file_path, options['profile_dir']):
+            return _convert_to_text(file_path, enable_plugins, cache)[0]
+    
+    def convert_bytes(data, filename, enable_plugins):
+        with _traced_conversion(filename or '<upload>', options['profile_dir']):
+            return _convert_bytes_to_text(data, filename, enable_plugins, cache)[0]
+    
+    server = ConversionServer(address, convert_path, convert_bytes, workers, queue_size, quiet)
+    # リクエストを待たせないように、よく使うオプションのMarkItDownを先に生成しておく
+    converter_registry.warm_up([_converter_options(options['enable_plugins'])], background=False)
+    server.serve_forever()
+
+
+def _converter_options(enable_plugins):
+    """MarkItDownに渡すオプションを作る"""
+    return {'enable_plugins': enable_plugins}
+
+
+def _init_batch_process(options):
+    """プロセスプールのワーカー初期化時にMarkItDownインスタンスを生成しておく"""
+    instrumentation.enable_trace(options['trace'])
+    converter_registry.warm_up([_converter_options(options['enable_plugins'])], background=False)
+
+
+# プロセスごとに開いたキャッシュ (キャッシュディレクトリ -> ConversionCache)
+_caches = {}
+
+
+def open_cache(cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    キャッシュディレクトリに対応するConversionCacheを返す (プロセス内で使い回す)
+    """
+    if cache_dir not in _caches:
+        _caches[cache_dir] = ConversionCache(cache_dir, max_bytes)
+    return _caches[cache_dir]
+
+
+@contextmanager
+def _atomic_output(output_path):
+    """
+    出力ファイルを開く (一時ファイルに書き、書き終えたら置き換える)
+    
+    途中で失敗しても書きかけのファイルを残さず、--dedup link でハードリンクした他の出力も書き換えない。
+    """
+    with instrumentation.span('write', target=output_path):
+        # 出力ディレクトリが存在しない場合は作成
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        tmp_path = output_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as f:
+                yield f
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def _write_output(output_path, text_content, source=None, chunks=None):
+    """
+    変換結果をファイルに書き込む
+    
+    Args:
+        source (str, optional): 元のファイルのパス (チャンクのレコードに記録する)
+        chunks (dict, optional): 指定した場合はチャンクに分割してJSONLで書き込む (chunk_options())
+    """
+    with _atomic_output(output_path) as f:
+        if chunks is None:
+            _write_text(f, text_content)
+        else:
+            import markdown_chunker
+            markdown_chunker.write_jsonl(f, source, text_content, **chunks)
+
+
+def _write_text(f, text_content):
+    """
+    テキストを WRITE_CHUNK_CHARS 文字ずつ書き込む
+    (一度に書くと、エンコードしたバイト列が変換結果と同じ大きさでもう1つメモリに作られるため)
+    """
+    for i in range(0, len(text_content), WRITE_CHUNK_CHARS):
+        f.write(text_content[i:i + WRITE_CHUNK_CHARS])
+
+
+def _streams_table(file_path):
+    """表のファイルとして1行ずつ変換するかどうか (tabular_stream)"""
+    import tabular_stream
+    return tabular_stream.can_stream(file_path)
+
+
+def _write_table(file_path, f, tables=None, jobs=1):
+    """表のファイルを1行ずつMarkdownの表に変換して f に書き込む"""
+    import tabular_stream
+    tables = tables or {}
+    with instrumentation.span('convert', streaming=True):
+        tabular_stream.write_markdown(file_path, f, tables.get('max_rows'), tables.get('sample'), jobs)
+
+
+def _matches_any(rel_path, patterns):
+    """相対パスまたはファイル名がいずれかのglobパターンに一致するか"""
+    name = os.path.basename(rel_path)
+    return any(fnmatch.fnmatch(rel_path, pat) or fnmatch.fnmatch(name, pat) for pat in patterns)
+
+
+def collect_input_files(paths, include=None, exclude=None):
+    """
+    変換対象のファイルを収集する。ディレクトリは再帰的に探索する
+    
+    Args:
+        paths (list[str]): ファイルまたはディレクトリのパス
+        include (list[str], optional): 対象とするglobパターン (ディレクトリ内のファイルに適用)
+        exclude (list[str], optional): 除外するglobパターン
+    
+    Returns:
+        list[tuple[str, str]]: (入力ファイルのパス, 出力ツリー上の相対パス) のリスト
+    """
+    include = include or []
+    exclude = exclude or []
+    # 複数の入力がある場合は、入力ごとの名前を出力ツリーの先頭に付けて衝突を避ける
+    prefix_root = len(paths) > 1
+    files = []
+
+    for path in paths:
+        root_name = os.path.basename(os.path.normpath(path))
+        if os.path.isdir(path):
+            for dir_path, dir_names, file_names in os.walk(path):
+                dir_names.sort()
+                for file_name in sorted(file_names):
+                    source = os.path.join(dir_path, file_name)
+                    rel_path = os.path.relpath(source, path).replace(os.sep, '/')
+                    if include and not _matches_any(rel_path, include):
+                        continue
+                    if exclude and _matches_any(rel_path, exclude):
+                        continue
+                    if prefix_root:
+                        rel_path = f"{root_name}/{rel_path}"
+                    files.append((source, rel_path))
+        else:
+            # 明示的に指定されたファイルは除外パターンのみ適用する
+            if exclude and _matches_any(root_name, exclude):
+                continue
+            files.append((path, root_name))
+
+    return files
+
+
+def plan_output_paths(files, output_dir):
+    """
+    入力ツリーを出力ディレクトリにミラーした出力パスを決める
+    
+    拡張子を .md に置き換え、同名の出力 (a.pdf と a.docx など) が衝突する場合は
+    元の拡張子を残したファイル名 (a.pdf.md) にする
+    
+    Returns:
+        list[tuple[str, str]]: (入力ファイルのパス, 出力ファイルのパス) のリスト
+    """
+    stems = {}
+    for _, rel_path in files:
+        stem = os.path.splitext(rel_path)[0]
+        stems[stem] = stems.get(stem, 0) + 1
+
+    plan = []
+    for source, rel_path in files:
+        stem = os.path.splitext(rel_path)[0]
+        out_rel = f"{stem}.md" if stems[stem] == 1 else f"{rel_path}.md"
+        plan.append((source, os.path.join(output_dir, *out_rel.split('/'))))
+    return plan
+
+
+def batch_options(enable_plugins=False, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                  trace=None, profile_dir=None, timeout=None, memory_limit=None, dedup=None, chunks=None,
+                  pages=None, tables=None, sink=None):
+    """
+    バッチ変換のオプションを作る (ワーカープロセスに渡せるように辞書にまとめる)
+    
+    Args:
+        enable_plugins (bool, optional): プラグインを有効にするかどうか
+        cache_dir (str, optional): 変換結果のキャッシュディレクトリ。Noneの場合はキャッシュしない
+        cache_max_bytes (int, optional): キャッシュの最大サイズ (バイト)
+        trace (str, optional): 計測イベントを書き出すJSON Linesファイル ('-' は標準エラー出力)
+        profile_dir (str, optional): 変換ごとのcProfileの結果を保存するディレクトリ
+        timeout (float, optional): 1ファイルの変換の制限時間 (秒)。Noneの場合は制限しない
+        memory_limit (int, optional): 変換する子プロセスのメモリの上限 (MB)。Noneの場合は制限しない
+        dedup (str, optional): 内容が同じ入力を1回だけ変換し、結果を配る方法 (input_dedup.MODES)。
+            Noneの場合は重複を調べない
+        chunks (dict, optional): 出力をチャンクに分割したJSONLにする場合のオプション (chunk_options())
+        pages (str, optional): PDFの変換するページ ("1-10,15,20-")。すべてのPDFに適用する
+        tables (dict, optional): 表 (XLSX, CSV, TSV) の出力する行の制限 (table_options())
+        sink (str, optional): 変換結果をまとめて書き込むシンクの種類 (output_sinks.SINKS)。
+            Noneの場合はワーカーが入力ごとに .md ファイルを書く
+    """
+    return {
+        'enable_plugins': enable_plugins,
+        'cache_dir': cache_dir,
+        'cache_max_bytes': cache_max_bytes,
+        'trace': trace,
+        'profile_dir': profile_dir,
+        'timeout': timeout,
+        'memory_limit': memory_limit,
+        'dedup': dedup,
+        'chunks': chunks,
+        'pages': pages,
+        'tables': tables,
+        'sink': sink,
+    }
+
+
+def chunk_options(size, overlap, unit='chars'):
+    """
+    チャンク出力のオプションを作る (markdown_chunker.write_jsonl のキーワード引数)
+    
+    Args:
+        size (int): チャンクの最大サイズ
+        overlap (int): 前のチャンクと重ねるサイズの上限
+        unit (str, optional): サイズの単位 ('chars' または 'tokens')
+    """
+    return {'size': size, 'overlap': overlap, 'unit': unit}
+
+
+def table_options(max_rows=None, sample=None):
+    """
+    表 (XLSX, CSV, TSV) の出力する行の制限を作る (プレビュー用)
+    
+    Args:
+        max_rows (int, optional): シートごとに出力するデータ行の上限 (先頭から)
+        sample (int, optional): シートごとに全体から無作為に選んで出力するデータ行の数
+    """
+    return {'max_rows': max_rows, 'sample': sample}
+
+
+def _batch_worker(source, output_path, options, isolated=False):
+    """
+    バッチ変換の1ファイル分の処理 (プロセスプールから呼ばれる)
+    
+    Args:
+        isolated (bool, optional): worker_process の子プロセスで実行する場合はTrue
+            (メモリ不足の場合は子プロセスごと入れ替えるため、結果にせずに送出する)
+    
+    Returns:
+        dict: 変換結果 (source, output, success, error, elapsed, cache_hit)。
+            シンクに書き込む場合は書き込まずに text に変換結果を入れる
+    """
+    start = time.perf_counter()
+    cache = None
+    if options['cache_dir']:
+        cache = open_cache(options['cache_dir'], options['cache_max_bytes'])
+    cache_hit = None
+    text_content = None
+    try:
+        with _traced_conversion(source, options['profile_dir']):
+            if options.get('sink'):
+                # 親プロセスがシンクに書き込む
+                if _streams_table(source):
+                    import io
+                    buffer = io.StringIO()
+                    _write_table(source, buffer, options.get('tables'))
+                    text_content = buffer.getvalue()
+                else:
+                    text_content, cache_hit = _convert_to_text(source, options['enable_plugins'], cache,
+                                                               options.get('pages'))
+            elif options.get('chunks') is None and _streams_table(source):
+                # 表は変換結果をキャッシュせず、1行ずつ出力に書き込む
+                with _atomic_output(output_path) as f:
+                    _write_table(source, f, options.get('tables'))
+            else:
+                text_content, cache_hit = _convert_to_text(source, options['enable_plugins'], cache,
+                                                           options.get('pages'))
+                _write_output(output_path, text_content, source, options.get('chunks'))
+        error = None
+    except MemoryError as e:
+        if isolated:
+            raise
+        error = f"{type(e).__name__}: {e}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    result = {
+        'source': source,
+        'output': output_path,
+        'success': error is None,
+        'error': error,
+        'elapsed': time.perf_counter() - start,
+        'cache_hit': cache_hit,
+    }
+    if options.get('sink'):
+        result['text'] = text_content if error is None else None
+    return result
+
+
+def convert_batch(plan, options, jobs=1, sink=None):
+    """
+    複数ファイルを変換する。jobsが2以上の場合はプロセスプールで並列に変換する
+    
+    オプションで制限時間 (timeout) またはメモリの上限 (memory_limit) を指定した場合は、
+    ファイルごとに終了させられる子プロセスで変換し、時間内に終わらなかったファイルや
+    上限を超えたファイル、子プロセスが異常終了したファイルは失敗として記録して次のファイルに進む。
+    
+    オプションで重複の扱い (dedup) を指定した場合は、先に入力のハッシュを計算して内容ごとに1回だけ変換し、
+    同じ内容のファイルの出力パスには変換結果を配る (結果の duplicate_of に変換したファイルのパス)。
+    
+    シンク (sink) を指定した場合は、ワーカーから受け取った変換結果をこのプロセスでシンクに書き込む。
+    
+    Args:
+        plan (list[tuple[str, str]]): (入力ファイルのパス, 出力ファイルのパス) のリスト
+            (シンクに書き込む場合は出力ファイルのパスの代わりにシンク内の文書の名前)
+        options (dict): batch_options()で作ったオプション
+        jobs (int, optional): 並列に実行するプロセス数
+        sink (output_sinks.OutputSink, optional): 変換結果を書き込むシンク (options['sink'] の種類で開いたもの)
+    
+    Returns:
+        list[dict]: ファイルごとの変換結果 (入力順)
+    """
+    total = len(plan)
+    results = []
+    # シンクに書き込む場合、重複したファイルに配るために変換結果を残しておく入力
+    held = {}
+
+    def report(result):
+        text_content = result.pop('text', None)
+        if sink is not None and text_content is not None:
+            import output_sinks
+            sink.write(output_sinks.document_record(result['output'], result['source'], text_content,
+                                                    result['elapsed'], result.get('duplicate_of')))
+            if result['source'] in duplicates:
+                held[result['source']] = text_content
+        results.append(result)
+        status = "変換成功" if result['success'] else "変換失敗"
+        print(f"[{len(results)}/{total}] {status}: {result['source']}", file=sys.stderr)
+
+    # 内容が同じ入力は最初の1件だけを変換する
+    pending, duplicates = plan, {}
+    if options.get('dedup') and total > 1:
+        import input_dedup
+        pending, duplicates = input_dedup.group_duplicates(plan, jobs)
+
+    if options.get('timeout') is not None or options.get('memory_limit') is not None:
+        _convert_batch_isolated(pending, options, jobs, report)
+    elif jobs <= 1 or len(pending) <= 1:
+        for source, output_path in pending:
+            report(_batch_worker(source, output_path, options))
+    else:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending)),
+                                 initializer=_init_batch_process,
+                                 initargs=(options,)) as executor:
+            futures = {
+                executor.submit(_batch_worker, source, output_path, options): (source, output_path)
+                for source, output_path in pending
+            }
+            for future in as_completed(futures):
+                source, output_path = futures[future]
+                try:
+                    report(future.result())
+                except Exception as e:
+                    # ワーカープロセス自体が異常終了した場合など
+                    report(_failed_result(source, output_path, e))
+
+    if duplicates and sink is not None:
+        # シンクには同じ変換結果を重複したファイルの名前でも書き込む
+        errors = {result['source']: result['error'] for result in results}
+        for primary_source, copies in duplicates.items():
+            text_content = held.pop(primary_source, None)
+            for source, name in copies:
+                report({
+                    'source': source,
+                    'output': name,
+                    'success': text_content is not None,
+                    'error': None if text_content is not None else errors.get(primary_source) or "変換されませんでした",
+                    'elapsed': 0.0,
+                    'cache_hit': None,
+                    'duplicate_of': primary_source,
+                    'text': text_content,
+                })
+    elif duplicates:
+        for result in input_dedup.fan_out(list(results), duplicates, options['dedup'],
+                                             options.get('chunks') is not None):
+            report(result)
+
+    order = {source: i for i, (source, _) in enumerate(plan)}
+    results.sort(key=lambda r: order[r['source']])
+    return results
+
+
+def _failed_result(source, output_path, error, elapsed=0.0):
+    return {
+        'source': source,
+        'output': output_path,
+        'success': False,
+        'error': f"{type(error).__name__}: {error}",
+        'elapsed': elapsed,
+        'cache_hit': None,
+    }
+
+
+def _convert_batch_isolated(plan, options, jobs, report):
+    """
+    ファイルごとに子プロセスで変換し、制限時間を過ぎたファイルは子プロセスを終了させて失敗とする
+    (ProcessPoolExecutorのワーカーは途中で終了させたり異常終了したりするとプール全体が使えなくなるため、
+    WorkerPoolを使う)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    pool = _worker_pool(options, max_idle=jobs)
+    
+    def run(source, output_path):
+        start = time.perf_counter()
+        try:
+            return pool.run(_batch_worker, (source, output_path, options, True), options['timeout'])
+        except Exception as e:
+            # 制限時間を過ぎた場合、メモリの上限を超えた場合、子プロセスが異常終了した場合
+            return _failed_result(source, output_path, e, time.perf_counter() - start)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(plan)))) as executor:
+            futures = [executor.submit(run, source, output_path) for source, output_path in plan]
+            for future in as_completed(futures):
+                report(future.result())
+    finally:
+        _close_worker_pool()
+
+
+def sync_batch(plan, options, output_dir, jobs=1):
+    """
+    出力ディレクトリのマニフェストと比較し、新規・変更されたファイルだけを変換する
+    
+    変更のないファイルはstatだけでスキップし、入力が削除されたファイルの出力は削除する。
+    
+    Args:
+        plan (list[tuple[str, str]]): (入力ファイルのパス, 出力ファイルのパス) のリスト
+        options (dict): batch_options()で作ったオプション
+        output_dir (str): 出力ディレクトリ (マニフェストの保存先)
+        jobs (int, optional): 並列に実行するプロセス数
+    
+    Returns:
+        tuple[list[dict], int, list[str]]: (変換結果, スキップした件数, 削除した出力ファイル)
+    """
+    from sync_manifest import SyncManifest
+    
+    # 出力に影響するオプションが変わった場合はすべて再変換する
+    manifest_options = _output_options(options['enable_plugins'], options.get('pages'),
+                                       options.get('tables'), options.get('chunks'))
+    manifest_options['markitdown'] = markitdown_version()
+    manifest = SyncManifest(output_dir, manifest_options)
+    removed = manifest.remove_stale(source for source, _ in plan)
+    
+    pending = []
+    digests = {}
+    for source, output_path in plan:
+        needs_conversion, digest = manifest.check(source, output_path)
+        if needs_conversion:
+            pending.append((source, output_path))
+            digests[source] = digest
+    
+    results = convert_batch(pending, options, jobs) if pending else []
+    for result in results:
+        if result['success']:
+            manifest.record(result['source'], result['output'], digests[result['source']])
+        else:
+            manifest.forget(result['source'])
+    manifest.save()
+    
+    return results, len(plan) - len(pending), removed
+
+
+def _archive_member_worker(zip_path, name, options):
+    """
+    ZIPのメンバー1つを読み出して変換する (プロセスプールから呼ばれるためモジュールレベルに置く)
+    
+    Returns:
+        dict: 変換結果 (source, text, success, error, elapsed, cache_hit)
+    """
+    import zip_archive
+    
+    start = time.perf_counter()
+    cache = open_cache(options['cache_dir'], options['cache_max_bytes']) if options['cache_dir'] else None
+    text_content = None
+    cache_hit = None
+    try:
+        with _traced_conversion(f"{zip_path}!{name}", options['profile_dir']):
+            data = zip_archive.read_member(zip_path, name)
+            text_content, cache_hit = _convert_bytes_to_text(data, name, options['enable_plugins'], cache)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'source': name,
+        'text': text_content,
+        'success': error is None,
+        'error': error,
+        'elapsed': time.perf_counter() - start,
+        'cache_hit': cache_hit,
+    }
+
+
+def _iter_archive_results(zip_path, names, options, jobs=1):
+    """
+    ZIPのメンバーを変換し、結果をメンバーの格納順に返す
+    
+    jobsが2以上の場合はプロセスプールで並列に変換する。先行して投入するメンバーを
+    jobs * 2 個までに抑え、変換済みの結果を順番が来るまで溜め込みすぎないようにする。
+    """
+    total = len(names)
+    
+    def report(index, result):
+        status = "変換成功" if result['success'] else "変換失敗"
+        print(f"[{index + 1}/{total}] {status}: {zip_path}!{result['source']}", file=sys.stderr)
+        return result
+    
+    if jobs <= 1 or total <= 1:
+        for index, name in enumerate(names):
+            yield report(index, _archive_member_worker(zip_path, name, options))
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, total),
+                             initializer=_init_batch_process,
+                             initargs=(options,)) as executor:
+        futures = {}
+        submitted = 0
+        for index, name in enumerate(names):
+            while submitted < total and submitted < index + jobs * 2:
+                futures[submitted] = executor.submit(_archive_member_worker, zip_path, names[submitted], options)
+                submitted += 1
+            try:
+                result = futures.pop(index).result()
+            except Exception as e:
+                # ワーカープロセス自体が異常終了した場合など
+                result = {
+                    'source': name,
+                    'text': None,
+                    'success': False,
+                    'error': f"{type(e).__name__}: {e}",
+                    'elapsed': 0.0,
+                    'cache_hit': None,
+                }
+            yield report(index, result)
+
+
+def convert_archive(zip_path, output, options, jobs=1, split=False, include=None, exclude=None):
+    """
+    ZIPアーカイブをディスクに展開せずにメンバーごとに変換する
+    
+    変換に失敗したメンバーがあっても処理を続け、結合モードではエラーをコメントとして埋め込む。
+    
+    Args:
+        zip_path (str): ZIPファイルのパス
+        output (str | None): 結合モードでは出力ファイル (Noneの場合は標準出力)、
+            分割モードではメンバーごとのMarkdownを書き込む出力ディレクトリ
+        options (dict): batch_options()で作ったオプション
+        jobs (int, optional): 並列に変換するプロセス数
+        split (bool, optional): メンバーごとに別のファイルに書き込む
+        include (list[str], optional): 対象とするメンバーのglobパターン
+        exclude (list[str], optional): 除外するメンバーのglobパターン
+    
+    Returns:
+        list[dict]: メンバーごとの変換結果 (格納順)
+    """
+    import zip_archive
+    
+    names = zip_archive.list_members(zip_path, include, exclude)
+    # メンバーの読み出しはワーカーがそれぞれ行うため、親プロセスでは閉じておく
+    zip_archive.close_all()
+    results = []
+    
+    if split:
+        plan = plan_output_paths([(name, zip_archive.safe_member_path(name)) for name in names], output)
+        output_paths = dict(plan)
+        for result in _iter_archive_results(zip_path, names, options, jobs):
+            result['output'] = output_paths[result['source']]
+            if result['success']:
+                _write_output(result['output'], result.pop('text'))
+            results.append(result)
+        return results
+    
+    with ExitStack() as stack:
+        # 出力ファイルは一時ファイルに書き、失敗した場合は書きかけの一時ファイルを削除する
+        stream = stack.enter_context(_atomic_output(output)) if output else sys.stdout
+        # 順番が来たメンバーから書き込み、結合したMarkdown全体をメモリに保持しない
+        stream.write(zip_archive.archive_header(zip_path))
+        for result in _iter_archive_results(zip_path, names, options, jobs):
+            stream.write(zip_archive.format_member(result['source'], result.pop('text'), result['error']))
+            result['output'] = output
+            results.append(result)
+    if output:
+        print(f"変換結果を {output} に保存しました。", file=sys.stderr)
+    return results
+
+
+def print_batch_summary(results, elapsed):
+    """
+    バッチ変換の結果サマリーを表示する
+    """
+    failures = [r for r in results if not r['success']]
+    succeeded = len(results) - len(failures)
+    print(
+        f"変換完了: 成功 {succeeded} 件 / 失敗 {len(failures)} 件 ({elapsed:.1f} 秒)",
+        file=sys.stderr
+    )
+    if failures:
+        print("失敗したファイル:", file=sys.stderr)
+        for r in failures:
+            print(f"- {r['source']}: {r['error']}", file=sys.stderr)
+    
+    duplicates = [r for r in results if r.get('duplicate_of')]
+    if duplicates:
+        print(f"重複: 同じ内容のファイル {len(duplicates)} 件は変換せずに結果を配りました "
+              f"(変換 {len(results) - len(duplicates)} 件)", file=sys.stderr)
+    
+    cache_results = [r['cache_hit'] for r in results if r['cache_hit'] is not None]
+    if cache_results:
+        hits = sum(1 for hit in cache_results if hit)
+        print(format_stats({'hits': hits, 'misses': len(cache_results) - hits}), file=sys.stderr)
+
+
+def detect_formats(files, jobs=1):
+    """
+    ファイルの形式を判定するだけで変換はしない (--detect-only)
+    
+    判定の結果を1ファイル1行 (形式、MIMEタイプ、判定方法、拡張子との一致、パス) で標準出力に書き、
+    形式ごとの件数を標準エラー出力に表示する。
+    
+    Args:
+        files (list[str]): ファイルのパス ('-' は標準入力)
+        jobs (int, optional): 並列に判定するスレッド数
+    
+    Returns:
+        list[dict]: ファイルごとの判定結果 (読めなかったファイルは format がNoneで error にエラー)
+    """
+    import format_sniffer
+    
+    def run(path):
+        try:
+            if path == STDIO:
+                decision = format_sniffer.sniff_bytes(sys.stdin.buffer.read())
+            else:
+                decision = format_sniffer.sniff(path)
+            decision['error'] = None
+        except OSError as e:
+            decision = {'format': None, 'mimetype': None, 'method': 'error', 'mismatch': False,
+                        'error': f"{type(e).__name__}: {e}"}
+        decision['source'] = path
+        return decision
+    
+    decisions = []
+    counts = {}
+    with ExitStack() as stack:
+        if jobs <= 1 or len(files) <= 1:
+            results = map(run, files)
+        else:
+            # 先頭を読むだけなのでスレッドで並列に読み込む (結果は入力の順)
+            from concurrent.futures import ThreadPoolExecutor
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=jobs))
+            results = executor.map(run, files)
+        for decision in results:
+            decisions.append(decision)
+            name = format_sniffer.describe(decision)
+            counts[name] = counts.get(name, 0) + 1
+            match = '不一致' if decision['mismatch'] else '一致'
+            print(f"{name}\t{decision['mimetype'] or '-'}\t{decision['method']}\t{match}\t{decision['source']}")
+            if decision['error']:
+                print(f"エラー: {decision['source']}: {decision['error']}", file=sys.stderr)
+    
+    breakdown = ' / '.join(f"{name} {count} 件" for name, count in sorted(counts.items(), key=lambda item: -item[1]))
+    print(f"形式: {breakdown or 'なし'}", file=sys.stderr)
+    mismatches = sum(1 for decision in decisions if decision['mismatch'])
+    if mismatches:
+        print(f"拡張子と内容が一致しないファイル: {mismatches} 件", file=sys.stderr)
+    return decisions
+
+
 def list_supported_formats():
     """
     サポートされているファイル形式を表示する
@@ -78,13 +1030,161 @@ def list_supported_formats():
         print(f"- {fmt}")
 
 
+def convert_archives(args, options, jobs):
+    """
+    --archive で指定されたZIPファイルを順に変換する
+    
+    ZIPファイルが複数の場合は -o を出力ディレクトリとし、結合モードでは <ZIP名>.md、
+    分割モードでは <ZIP名>/ の下に保存する
+    """
+    from zipfile import BadZipFile
+    import zip_archive
+    
+    for path in args.files:
+        if not zip_archive.is_archive(path):
+            print(f"エラー: '{path}' はZIPファイルではありません。", file=sys.stderr)
+            return 1
+    split = args.archive == 'split'
+    multiple = len(args.files) > 1
+    if (split or multiple) and not args.output:
+        print("エラー: ZIPのメンバーごとに保存する場合や複数のZIPを変換する場合は -o で出力ディレクトリを指定してください。",
+              file=sys.stderr)
+        return 1
+    
+    start = time.perf_counter()
+    results = []
+    for path in args.files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if not multiple:
+            output = args.output
+        elif split:
+            output = os.path.join(args.output, stem)
+        else:
+            output = os.path.join(args.output, f"{stem}.md")
+        try:
+            results.extend(convert_archive(path, output, options, jobs, split, args.include, args.exclude))
+        except (OSError, BadZipFile) as e:
+            print(f"エラー: {path}: {e}", file=sys.stderr)
+            return 1
+    print_batch_summary(results, time.perf_counter() - start)
+    return 0 if all(r['success'] for r in results) else 1
+
+
+def convert_youtube(args):
+    """
+    --youtube で指定されたプレイリスト・チャンネル・動画を動画ごとに -o のディレクトリに保存する
+    
+    中断した場合は同じコマンドを再実行すると、保存済みの動画を飛ばして続きから処理する
+    """
+    import youtube_bulk
+    
+    if not args.output:
+        print("エラー: YouTubeの一括変換では -o で出力ディレクトリを指定してください。", file=sys.stderr)
+        return 1
+    concurrency = youtube_bulk.DEFAULT_CONCURRENCY if args.jobs is None else args.jobs
+    if concurrency <= 0:
+        concurrency = os.cpu_count() or 1
+    bucket = youtube_bulk.TokenBucket(args.rate)
+    try:
+        video_ids = youtube_bulk.collect_video_ids(args.files, bucket=bucket)
+    except Exception as e:
+        print(f"エラー: 動画の一覧を取得できません: {e}", file=sys.stderr)
+        return 1
+    if not video_ids:
+        print("エラー: 変換対象の動画が見つかりません。", file=sys.stderr)
+        return 1
+    
+    def report(result, done, total):
+        status = "変換成功" if result['success'] else "変換失敗"
+        print(f"[{done}/{total}] {status}: {result['source']}", file=sys.stderr)
+    
+    start = time.perf_counter()
+    results, skipped = youtube_bulk.ingest(video_ids, args.output, concurrency=concurrency, rate=args.rate,
+                                           progress=report)
+    print_batch_summary(results, time.perf_counter() - start)
+    if skipped:
+        print(f"保存済みのため {skipped} 件の動画を飛ばしました。", file=sys.stderr)
+    return 0 if all(r['success'] for r in results) else 1
+
+
 def main():
     # コマンドライン引数の解析
     parser = argparse.ArgumentParser(description='ファイルをMarkdownに変換するツール')
-    parser.add_argument('file', nargs='?', help='変換するファイルのパス')
-    parser.add_argument('-o', '--output', help='出力ファイルのパス')
+    parser.add_argument('files', nargs='*', metavar='file',
+                        help='変換するファイルまたはディレクトリのパス (複数指定可。- は標準入力)')
+    parser.add_argument('-o', '--output',
+                        help='出力ファイルのパス (- は標準出力。複数ファイル・ディレクトリの場合は出力ディレクトリ)')
+    parser.add_argument('-f', '--format', default=None, metavar='EXT',
+                        help='標準入力 (-) の形式を拡張子で指定する (例: pdf, docx)。省略時は内容から判定する')
     parser.add_argument('-p', '--plugins', action='store_true', help='プラグインを有効にする')
     parser.add_argument('-l', '--list-formats', action='store_true', help='サポートされているファイル形式を表示')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='並列に変換するプロセス数 (0でCPUコア数、デフォルト1。--serveではワーカー数でデフォルトはCPUコア数)')
+    parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                        help='ディレクトリ内で変換対象とするファイルのglobパターン (複数指定可)')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help='変換対象から除外するファイルのglobパターン (複数指定可)')
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"変換結果のキャッシュディレクトリ (デフォルト: {default_cache_dir('conversions')})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), metavar='MB',
+                        help='キャッシュの最大サイズ (MB)')
+    parser.add_argument('--no-cache', action='store_true', help='変換結果のキャッシュを使用しない')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='キャッシュのヒット/ミス件数を標準エラー出力に表示')
+    parser.add_argument('--serve', action='store_true',
+                        help='常駐変換サーバーを起動する (--server のアドレスで待ち受ける)')
+    parser.add_argument('--server', default=None, metavar='ADDR',
+                        help='常駐変換サーバーのアドレス host:port または unix:/path/to/socket '
+                             '(デフォルト: 環境変数 MARKITDOWN_SERVER または 127.0.0.1:8765)')
+    parser.add_argument('--queue-size', type=int, default=16,
+                        help='--serve でワーカーの空きを待てるリクエスト数 (超えた場合は503を返す)')
+    parser.add_argument('--no-server', action='store_true',
+                        help='常駐変換サーバーが動いていても使わずにこのプロセスで変換する')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='変換の段階ごとの所要時間をJSON Lines形式で書き出す (- は標準エラー出力。'
+                             '環境変数 MARKITDOWN_TRACE でも指定可)')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help='変換ごとのcProfileの結果 (pstats) をこのディレクトリに保存する')
+    parser.add_argument('--timeout', type=float, default=None, metavar='SEC',
+                        help='1ファイルの変換の制限時間 (秒)。超えたファイルは変換を中止して失敗とし、次のファイルに進む')
+    parser.add_argument('--memory-limit', type=int, default=None, metavar='MB',
+                        help='変換する子プロセスのメモリ (アドレス空間) の上限。超えたファイルは失敗とし、次のファイルに進む '
+                             '(子プロセスは一定件数の変換またはメモリの増加で入れ替える)')
+    parser.add_argument('--archive', choices=['combined', 'split'], default=None,
+                        help='ZIPファイルを展開せずにメンバーごとに並列に変換する '
+                             '(combined: 格納順に1つのMarkdownに結合、split: メンバーごとに -o のディレクトリに保存)')
+    parser.add_argument('--chunks', action='store_true',
+                        help='Markdownを見出し単位のチャンクに分割し、JSONL (1行1チャンク) で出力する '
+                             '(複数ファイルの場合は入力ごとに .jsonl を -o のディレクトリに保存)')
+    parser.add_argument('--chunk-size', type=int, default=2000, metavar='N',
+                        help='--chunks のチャンクの最大サイズ (--chunk-unit の単位)')
+    parser.add_argument('--chunk-overlap', type=int, default=200, metavar='N',
+                        help='--chunks で前のチャンクと重ねるサイズの上限 (段落・行の単位で重ねる)')
+    parser.add_argument('--chunk-unit', choices=['chars', 'tokens'], default='chars',
+                        help='--chunk-size と --chunk-overlap の単位 (chars: 文字数、tokens: 近似トークン数)')
+    parser.add_argument('--pages', default=None, metavar='SPEC',
+                        help='PDFの変換するページ (例: 1-10,15,20-)。単一のPDFでは -j のプロセス数でページを並列に変換する')
+    parser.add_argument('--max-rows', type=int, default=None, metavar='N',
+                        help='XLSX/CSV/TSVの表をシートごとに先頭のN行だけ出力する (プレビュー用)')
+    parser.add_argument('--sample-rows', type=int, default=None, metavar='N',
+                        help='XLSX/CSV/TSVの表をシートごとに全体から無作為に選んだN行だけ出力する (元の行の順)')
+    parser.add_argument('--detect-only', action='store_true',
+                        help='変換せずにファイルの形式 (マジックバイト、ZIPのメンバー構成から判定) を1行ずつ表示する')
+    parser.add_argument('--youtube', action='store_true',
+                        help='引数をYouTubeのプレイリスト・チャンネル・動画のURL (またはURL/IDを1行ずつ書いたファイル) とし、'
+                             '動画ごとに -o のディレクトリに保存する (-j で同時に処理する動画の数、デフォルト4)')
+    parser.add_argument('--rate', type=float, default=2.0, metavar='N',
+                        help='--youtube で1秒あたりに送るリクエスト数の上限 (0で制限しない)')
+    parser.add_argument('--dedup', nargs='?', const='link', default=None, choices=['link', 'copy', 'reference'],
+                        help='内容が同じ入力ファイルは1回だけ変換し、結果を他の出力パスに配る '
+                             '(link: ハードリンク (できなければコピー)、copy: コピー、reference: 変換結果へのリンクを書く。'
+                             '省略時は link)')
+    parser.add_argument('--sink', choices=['files', 'jsonl', 'sqlite', 'tar', 'zip'], default='files',
+                        help='複数ファイルの変換結果の書き込み先 (files: 入力ごとに .md を -o のディレクトリに保存 (デフォルト)、'
+                             'jsonl / sqlite / tar / zip: -o の1つのファイルにまとめて書き込む)')
+    parser.add_argument('--sync', action='store_true',
+                        help='出力ディレクトリのマニフェストと比較し、新規・変更されたファイルだけを変換する '
+                             '(入力が削除されたファイルの出力も削除する)')
     
     args = parser.parse_args()
     
@@ -93,21 +1193,169 @@ def main():
         list_supported_formats()
         return 0
     
+    cache_dir = None if args.no_cache else (args.cache_dir or default_cache_dir('conversions'))
+    cache_max_bytes = args.cache_size * 1024 * 1024
+    
+    # チャンクに分割したJSONLで出力
+    chunks = None
+    if args.chunks:
+        if args.chunk_size <= 0 or args.chunk_overlap < 0:
+            print("エラー: --chunk-size は1以上、--chunk-overlap は0以上を指定してください。", file=sys.stderr)
+            return 1
+        if args.archive or args.youtube:
+            print("エラー: --chunks は --archive、--youtube と同時に指定できません。", file=sys.stderr)
+            return 1
+        chunks = chunk_options(args.chunk_size, args.chunk_overlap, args.chunk_unit)
+    
+    # 変換結果をまとめて書き込むシンク
+    sink = None if args.sink == 'files' else args.sink
+    if sink is not None and (args.chunks or args.sync or args.archive or args.youtube):
+        print("エラー: --sink は --chunks、--sync、--archive、--youtube と同時に指定できません。", file=sys.stderr)
+        return 1
+    
+    # 表の行の制限
+    if args.max_rows is not None and args.sample_rows is not None:
+        print("エラー: --max-rows と --sample-rows は同時に指定できません。", file=sys.stderr)
+        return 1
+    if (args.max_rows is not None and args.max_rows < 0) or (args.sample_rows is not None and args.sample_rows < 0):
+        print("エラー: --max-rows と --sample-rows は0以上を指定してください。", file=sys.stderr)
+        return 1
+    tables = table_options(args.max_rows, args.sample_rows)
+    
+    # メモリの上限を設定できない環境では、子プロセスで変換して入れ替えるだけになる
+    if args.memory_limit is not None:
+        import worker_process
+        if not worker_process.memory_limit_supported():
+            print("警告: この環境では変換プロセスのメモリの上限を設定できません。"
+                  "--memory-limit は子プロセスでの変換と入れ替えにだけ使います。", file=sys.stderr)
+    
+    # 計測イベントの書き出し
+    trace = args.trace or os.environ.get(instrumentation.TRACE_ENV)
+    instrumentation.enable_trace(trace)
+    options = batch_options(args.plugins, cache_dir, cache_max_bytes, trace, args.profile, args.timeout,
+                            args.memory_limit, args.dedup, chunks, args.pages, tables, sink)
+    
+    # 常駐変換サーバーを起動
+    if args.serve:
+        from conversion_server import default_address
+        workers = args.jobs if args.jobs and args.jobs > 0 else (os.cpu_count() or 1)
+        try:
+            serve(args.server or default_address(), options, workers, args.queue_size)
+        except (OSError, ValueError) as e:
+            print(f"エラー: 変換サーバーを起動できません: {e}", file=sys.stderr)
+            return 1
+        return 0
+    
     # ファイルが指定されていない場合はヘルプを表示
-    if not args.file:
+    if not args.files:
         parser.print_help()
         return 1
     
+    # YouTubeのプレイリスト・チャンネルの一括変換 (引数はURLのためファイルの確認をしない)
+    if args.youtube:
+        return convert_youtube(args)
+    
+    # 標準入力は単独でのみ指定できる
+    if STDIO in args.files and len(args.files) > 1:
+        print("エラー: 標準入力 (-) は他のファイルと同時に指定できません。", file=sys.stderr)
+        return 1
+    if STDIO in args.files and (args.archive or args.sync or sink is not None):
+        print("エラー: 標準入力 (-) は --archive、--sync、--sink と同時に指定できません。", file=sys.stderr)
+        return 1
+    
     # ファイルが存在するか確認
-    if not os.path.exists(args.file):
-        print(f"エラー: ファイル '{args.file}' が見つかりません。", file=sys.stderr)
+    for path in args.files:
+        if path != STDIO and not os.path.exists(path):
+            print(f"エラー: ファイル '{path}' が見つかりません。", file=sys.stderr)
+            return 1
+    
+    if args.jobs is None:
+        jobs = 1
+    else:
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    
+    # 形式を判定するだけで変換しない
+    if args.detect_only:
+        files = [args.files[0]] if args.files == [STDIO] else [
+            source for source, _ in collect_input_files(args.files, args.include, args.exclude)]
+        decisions = detect_formats(files, jobs)
+        return 0 if all(decision['error'] is None for decision in decisions) else 1
+    
+    # ZIPアーカイブをメンバーごとに変換
+    if args.archive:
+        return convert_archives(args, options, jobs)
+    
+    # MarkItDownの生成を入力ファイルの収集と並行してバックグラウンドで済ませておく
+    # (同期モードでは変更がなければ変換しないため生成しない)
+    single_file = len(args.files) == 1 and not os.path.isdir(args.files[0]) and not args.sync and sink is None
+    # (ページを指定したPDFはMarkItDownを使わずに変換するため生成しない)
+    pdf_pages_only = single_file and args.pages is not None and args.files[0].lower().endswith('.pdf')
+    # (表は1行ずつ変換するため生成しない)
+    table_only = single_file and chunks is None and _streams_table(args.files[0])
+    # 常駐変換サーバーを使うか (キャッシュを使わない・計測する・制限時間やメモリの上限を指定した場合は
+    # サーバーの設定では変換できないため使わない)
+    use_server = (single_file and not args.no_server and cache_dir is not None and not trace and not args.profile
+                  and args.timeout is None and args.memory_limit is None)
+    if (args.jobs in (None, 1) and not args.sync and not use_server
+            and not pdf_pages_only and not table_only):
+        converter_registry.warm_up([_converter_options(args.plugins)])
+    
+    # 単一ファイルの場合は従来どおり変換 (常駐変換サーバーが動いていればサーバーで変換)
+    if single_file:
+        client = None
+        if use_server:
+            from conversion_server import ConversionClient
+            client = ConversionClient(args.server)
+        cache = open_cache(cache_dir, cache_max_bytes) if cache_dir else None
+        success = convert_file(args.files[0], args.output, args.plugins, cache, client, args.profile, args.timeout,
+                               args.memory_limit, chunks, args.pages, jobs, tables, args.format, options)
+        _close_worker_pool()
+        if cache is not None and args.cache_stats:
+            print(format_stats(cache.stats), file=sys.stderr)
+        return 0 if success else 1
+    
+    # 複数ファイル・ディレクトリの場合はバッチ変換
+    if not args.output:
+        if sink is not None:
+            print(f"エラー: --sink {sink} の場合は -o で書き込むファイルを指定してください。", file=sys.stderr)
+        else:
+            print("エラー: 複数ファイルまたはディレクトリを変換する場合は -o で出力ディレクトリを指定してください。",
+                  file=sys.stderr)
+        return 1
+    
+    files = collect_input_files(args.files, args.include, args.exclude)
+    if not files and not args.sync:
+        print("エラー: 変換対象のファイルが見つかりません。", file=sys.stderr)
         return 1
     
-    # ファイルを変換
-    success = convert_file(args.file, args.output, args.plugins)
+    plan = plan_output_paths(files, args.output)
+    if chunks is not None:
+        plan = [(source, os.path.splitext(output_path)[0] + '.jsonl') for source, output_path in plan]
+    start = time.perf_counter()
+    if sink is not None:
+        # シンク内の文書の名前は出力ディレクトリにミラーした場合の相対パス
+        import output_sinks
+        plan = [(source, output_path.replace(os.sep, '/')) for source, output_path in plan_output_paths(files, '')]
+        with output_sinks.open_sink(sink, args.output) as opened:
+            results = convert_batch(plan, options, jobs, opened)
+        print_batch_summary(results, time.perf_counter() - start)
+        print(f"変換結果を {args.output} にまとめて保存しました ({opened.count} 件)。", file=sys.stderr)
+    elif args.sync:
+        results, skipped, removed = sync_batch(plan, options, args.output, jobs)
+        print_batch_summary(results, time.perf_counter() - start)
+        print(f"同期: 変換 {len(results)} 件 / 変更なし {skipped} 件 / 削除 {len(removed)} 件", file=sys.stderr)
+    else:
+        results = convert_batch(plan, options, jobs)
+        print_batch_summary(results, time.perf_counter() - start)
     
-    return 0 if success else 1
+    return 0 if all(r['success'] for r in results) else 1
 
 
 if __name__ == '__main__':
-    sys.exit(main())
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # パイプの読み手 (head など) が先に終了した場合は、残りの出力を捨てて静かに終える
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+MarkItDownインスタンスを使い回すためのレジストリ
+
+MarkItDownの生成 (コンバーター登録、プラグイン探索) は
+変換のたびに行うとコストが大きいため、オプションの組み合わせごとに生成済みの
+インスタンスをプールしておき、変換ごとに貸し出す。
+同じインスタンスが同時に複数のスレッドで使われることはない。
+"""
+
+import json
+import threading
+import dataclasses
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+# オプションのキー -> 貸し出し可能なMarkItDownインスタンスのリスト
+_idle = {}
+# オプションのキー -> ウォームアップ中のインスタンス生成完了イベント
+_pending = {}
+
+
+def options_key(options):
+    """
+    オプション辞書からレジストリのキーを作る
+
+    Args:
+        options (dict): MarkItDownに渡すオプション (enable_plugins, youtube, network など)
+
+    Returns:
+        str: キー文字列
+    """
+    return json.dumps(options or {}, sort_keys=True, default=_key_default)
+
+
+def _key_default(value):
+    # NetworkConfig のreprは認証情報を伏せているため、すべての値をキーに含める
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return repr(value)
+
+
+def _create_converter(options):
+    """
+    MarkItDownインスタンスを生成する
+
+    オプションの 'network' (プロキシ、SSL証明書の検証) に対応する共有のHTTPセッションを渡し、
+    URLの取得でも接続プール、タイムアウト、リトライが使われるようにする。
+    """
+    from markitdown import MarkItDown
+    import http_client
+    options = dict(options or {})
+    network = options.pop('network', None)
+    return MarkItDown(requests_session=http_client.get_session(network), **options)
+
+
+def _release(key, md):
+    with _lock:
+        _idle.setdefault(key, []).append(md)
+
+
+@contextmanager
+def acquire_converter(options=None):
+    """
+    オプションに対応するMarkItDownインスタンスを借りる
+
+    空きインスタンスがなければ新しく生成し、使用後はプールに戻す。
+
+    Args:
+        options (dict, optional): MarkItDownに渡すオプション
+
+    Yields:
+        MarkItDown: 変換に使用するインスタンス
+    """
+    key = options_key(options)
+    md = None
+    while md is None:
+        with _lock:
+            idle = _idle.get(key)
+            if idle:
+                md = idle.pop()
+                break
+            pending = _pending.get(key)
+        if pending is None:
+            md = _create_converter(options)
+        else:
+            # ウォームアップ中のインスタンスの完成を待つ
+            pending.wait()
+
+    try:
+        yield md
+    finally:
+        _release(key, md)
+
+
+def warm_up(options_list=None, background=True):
+    """
+    指定されたオプションのMarkItDownインスタンスを事前に生成しておく
+
+    Args:
+        options_list (list[dict], optional): 生成するオプションのリスト。省略時はデフォルトのオプションのみ
+        background (bool, optional): バックグラウンドスレッドで生成するかどうか
+
+    Returns:
+        threading.Thread | None: バックグラウンドで生成する場合はそのスレッド
+    """
+    options_list = options_list if options_list is not None else [{}]
+    events = []
+    with _lock:
+        for options in options_list:
+            key = options_key(options)
+            if _idle.get(key) or key in _pending:
+                continue
+            event = threading.Event()
+            _pending[key] = event
+            events.append((key, options, event))
+
+    def build():
+        for key, options, event in events:
+            try:
+                _release(key, _create_converter(options))
+            except Exception:
+                # 生成に失敗した場合は実際の変換時に改めてエラーを報告させる
+                pass
+            finally:
+                with _lock:
+                    _pending.pop(key, None)
+                event.set()
+
+    if not background:
+        build()
+        return None
+
+    thread = threading.Thread(target=build, name="markitdown-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def clear():
+    """プールされているインスタンスをすべて破棄する"""
+    with _lock:
+        _idle.clear()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ディスク上のキャッシュ
+
+DiskCacheはキー文字列に対応するテキストをファイルとして保存し、
+合計サイズが上限を超えたら最も長く使われていないエントリから削除する (LRU)。
+ConversionCacheは入力ファイルの内容と変換オプションのハッシュをキーにして
+変換結果のMarkdownを保存する。
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+
+# ハッシュ計算時に一度に読み込むサイズ
+HASH_CHUNK_SIZE = 1024 * 1024
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def default_cache_dir(name=None):
+    """
+    キャッシュを保存するデフォルトのディレクトリを返す
+
+    Args:
+        name (str, optional): サブディレクトリ名
+
+    Returns:
+        str: ディレクトリのパス
+    """
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    path = os.path.join(base, 'markitdown-converter')
+    return os.path.join(path, name) if name else path
+
+
+def hash_file(file_path, algorithm='sha256'):
+    """
+    ファイルの内容のハッシュをチャンク単位で読み込みながら計算する
+
+    Returns:
+        str: 16進数のハッシュ値
+    """
+    digest = hashlib.new(algorithm)
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """サイズ上限付きのLRUディスクキャッシュ"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, suffix='.md'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        # 合計サイズは最初の書き込み時にディレクトリを走査して求める
+        self._total_bytes = None
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + self.suffix)
+
+    def get(self, key):
+        """
+        キーに対応するテキストを返す。存在しない場合はNone
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        # 最終使用時刻として更新時刻を更新する (LRU)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.stats['hits'] += 1
+        return text
+
+    def put(self, key, text):
+        """
+        キーに対応するテキストを保存する
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = text.encode('utf-8')
+        # 書き込み途中のファイルが読まれないように一時ファイル経由で置き換える
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.stats['writes'] += 1
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(更新時刻, サイズ, パス) のリストを返す"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """上限の9割に収まるまで古いエントリから削除する"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats['evictions'] += 1
+        self._total_bytes = total
+
+
+class ConversionCache(DiskCache):
+    """入力ファイルの内容と変換オプションをキーにした変換結果のキャッシュ"""
+
+    def make_key(self, file_path, options):
+        """
+        キャッシュのキーを作る
+
+        Args:
+            file_path (str): 入力ファイルのパス
+            options (dict): 変換結果に影響するオプション (プラグインの有無、文字起こしの言語など)
+
+        Returns:
+            str: キー (SHA-256の16進数)
+        """
+        return self.key_for_source(hash_file(file_path), file_path, options)
+
+    def key_for_source(self, content_digest, filename, options):
+        """
+        入力内容のハッシュ値・ファイル名・変換オプションからキャッシュのキーを作る (CLIとGUIで共通)
+
+        同じ内容でも拡張子によって判定する形式 (format_sniffer) と変換結果が変わるため、
+        正規化した拡張子をオプションに加える。
+
+        Args:
+            content_digest (str): 入力内容のハッシュ値
+            filename (str): 入力のファイル名またはパス (拡張子だけを使う)
+            options (dict): 変換結果に影響するオプション
+        """
+        from format_sniffer import normalize_extension
+        options = dict(options or {}, extension=normalize_extension(os.path.splitext(filename or '')[1]))
+        return self.key_for_digest(content_digest, options)
+
+    def key_for_digest(self, content_digest, options):
+        """入力内容のハッシュ値と変換オプションからキャッシュのキーを作る"""
+        meta = json.dumps(
+            {'options': options or {}, 'markitdown': markitdown_version()},
+            sort_keys=True, default=repr
+        )
+        return hashlib.sha256(f"{content_digest}\n{meta}".encode('utf-8')).hexdigest()
+
+
+_markitdown_version = None
+
+
+def markitdown_version():
+    """
+    インストールされているmarkitdownのバージョンを返す
+    (markitdown自体はインポートせずにパッケージのメタデータから取得する)
+    """
+    global _markitdown_version
+    if _markitdown_version is None:
+        try:
+            from importlib.metadata import version
+            _markitdown_version = version('markitdown')
+        except Exception:
+            _markitdown_version = 'unknown'
+    return _markitdown_version
+
+
+def format_stats(stats):
+    """キャッシュの統計情報を表示用の文字列にする"""
+    return f"キャッシュ: ヒット {stats['hits']} 件 / ミス {stats['misses']} 件"
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ファイルの形式の判定 (変換前の振り分け)
+
+MarkItDownは拡張子などの手がかりを元に変換器を順に試すため、拡張子が間違っている、
+または拡張子がないファイルは変換に時間がかかったり失敗したりする。
+先頭の数KBのマジックバイトと、ZIPの場合は中央ディレクトリ (メンバー名の一覧) だけを読んで形式を判定し、
+MarkItDownに StreamInfo として渡して変換器を直接選ばせる。
+判定の結果は内容のハッシュ (分かっている場合) またはパス・サイズ・更新時刻をキーにプロセス内で記憶する。
+"""
+
+import io
+import os
+import zipfile
+import threading
+from collections import OrderedDict
+
+# 判定のために読み込む先頭のサイズ
+SNIFF_BYTES = 8 * 1024
+# 記憶しておく判定の数
+MAX_DECISIONS = 4096
+
+# 形式 (拡張子) -> MIMEタイプ
+MIMETYPES = {
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    '.epub': 'application/epub+zip',
+    '.zip': 'application/zip',
+    '.doc': 'application/msword',
+    '.xls': 'application/vnd.ms-excel',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.msg': 'application/vnd.ms-outlook',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.bmp': 'image/bmp',
+    '.tiff': 'image/tiff',
+    '.webp': 'image/webp',
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/x-wav',
+    '.m4a': 'audio/mp4',
+    '.mp4': 'video/mp4',
+    '.html': 'text/html',
+    '.xml': 'application/xml',
+    '.rss': 'application/rss+xml',
+    '.atom': 'application/atom+xml',
+    '.json': 'application/json',
+    '.ipynb': 'application/x-ipynb+json',
+    '.csv': 'text/csv',
+    '.tsv': 'text/tab-separated-values',
+    '.md': 'text/markdown',
+    '.txt': 'text/plain',
+}
+# 同じ形式の別の拡張子
+ALIASES = {
+    '.jpeg': '.jpg',
+    '.htm': '.html',
+    '.xhtml': '.html',
+    '.tif': '.tiff',
+    '.xlsm': '.xlsx',
+    '.markdown': '.md',
+}
+# 内容がテキストの場合に拡張子を信用する形式 (CSVとテキストなどは内容から区別できないため)
+TEXT_FORMATS = ('.txt', '.md', '.csv', '.tsv', '.json', '.ipynb', '.html', '.xml', '.rss', '.atom')
+# OLE2 (旧形式のOffice、Outlook) は中を解析しないため拡張子を信用する
+OLE_FORMATS = ('.doc', '.xls', '.ppt', '.msg')
+
+# 取り違えることのないマジックバイト (テキストより先に判定する)
+_MAGIC = (
+    (b'%PDF-', '.pdf'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'II*\x00', '.tiff'),
+    (b'MM\x00*', '.tiff'),
+)
+# テキストのBOM -> 文字コード (UTF-32 LE のBOMは UTF-16 LE のBOMで始まるため先に調べる)
+_BOMS = (
+    (b'\xff\xfe\x00\x00', 'utf-32'),
+    (b'\x00\x00\xfe\xff', 'utf-32'),
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+)
+# BMPの情報ヘッダーのサイズ (BITMAPCOREHEADER 〜 BITMAPV5HEADER)
+_BMP_INFO_SIZES = (12, 40, 52, 56, 64, 108, 124)
+_OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')
+
+_decisions = OrderedDict()
+_decisions_lock = threading.Lock()
+
+
+def normalize_extension(extension):
+    """拡張子を小文字にし、別名を代表の拡張子にする ('.JPEG' -> '.jpg')"""
+    extension = extension.lower()
+    return ALIASES.get(extension, extension)
+
+
+def _sniff_zip(archive):
+    """ZIPの中央ディレクトリのメンバー名から形式を判定する (メンバーの内容は読まない)"""
+    names = archive.namelist()
+    if '[Content_Types].xml' in names:
+        for prefix, extension in (('word/', '.docx'), ('xl/', '.xlsx'), ('ppt/', '.pptx')):
+            if any(name.startswith(prefix) for name in names):
+                return extension
+    if 'mimetype' in names and 'META-INF/container.xml' in names:
+        return '.epub'
+    return '.zip'
+
+
+def _bom_encoding(head):
+    """先頭のBOMから文字コードを返す (BOMがない場合はNone)"""
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def _sniff_text(head, extension):
+    """テキストの先頭から形式を判定する (バイナリの場合はNone)"""
+    encoding = _bom_encoding(head)
+    # BOMのない場合はUTF-8またはShift_JIS (NULを含む場合はバイナリとみなす)
+    encodings = (encoding,) if encoding else ('utf-8', 'cp932')
+    if encoding is None and b'\x00' in head:
+        return None
+    text = None
+    for encoding in encodings:
+        try:
+            # 読み込んだ範囲の最後で文字が途切れている場合があるため、末尾の数バイトは判定に使わない
+            text = head[:-4 if len(head) >= SNIFF_BYTES else None].decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+    if text is None:
+        return None
+    if extension in TEXT_FORMATS:
+        return extension
+    start = text.lstrip()[:512].lower()
+    if start.startswith(('<!doctype html', '<html')) or '<html' in start:
+        return '.html'
+    if start.startswith('<?xml') or start.startswith('<'):
+        if '<rss' in start:
+            return '.rss'
+        if '<feed' in start:
+            return '.atom'
+        return '.xml'
+    if start.startswith(('{', '[')):
+        return '.json'
+    return '.txt'
+
+
+def _is_bmp(head):
+    """BMPのファイルヘッダーと情報ヘッダーが揃っているか ("BM" で始まるテキストと区別する)"""
+    if len(head) < 18 or not head.startswith(b'BM'):
+        return False
+    size = int.from_bytes(head[2:6], 'little')
+    offset = int.from_bytes(head[10:14], 'little')
+    info_size = int.from_bytes(head[14:18], 'little')
+    return (head[6:10] == b'\x00\x00\x00\x00' and info_size in _BMP_INFO_SIZES
+            and 14 + info_size <= offset <= size)
+
+
+def _is_id3(head):
+    """MP3のID3v2タグのヘッダー (バージョン 2〜4、サイズは各バイトの最上位ビットが0)"""
+    return (len(head) >= 10 and head.startswith(b'ID3') and head[3] in (2, 3, 4) and head[4] != 0xff
+            and all(byte < 0x80 for byte in head[6:10]))
+
+
+def _is_mpeg_frame(head):
+    """ID3タグのないMP3のフレームヘッダー (同期ビットに加えて、バージョン・レイヤー・ビットレート・サンプリング周波数が有効)"""
+    if len(head) < 4 or head[0] != 0xff or head[1] & 0xe0 != 0xe0:
+        return False
+    version = (head[1] >> 3) & 0x03
+    layer = (head[1] >> 1) & 0x03
+    bitrate = head[2] >> 4
+    sample_rate = (head[2] >> 2) & 0x03
+    return version != 0b01 and layer != 0b00 and bitrate not in (0, 0x0f) and sample_rate != 0b11
+
+
+def _sniff_weak_magic(head):
+    """短いマジックバイトで判定する形式 (テキストの先頭と一致しうるため、ヘッダー全体を確かめる)"""
+    if _is_bmp(head):
+        return '.bmp'
+    if _is_id3(head) or _is_mpeg_frame(head):
+        return '.mp3'
+    return None
+
+
+def _sniff_head(head, extension):
+    """
+    先頭のバイト列から形式を判定する (ZIPは呼び出し元で中央ディレクトリを読む)
+
+    取り違えることのないマジックバイト、BOMのあるテキスト、拡張子がテキストの形式のテキスト、
+    短いマジックバイト (BMP、MP3)、その他のテキストの順に判定する。
+    拡張子がテキストの形式の場合は短いマジックバイトで判定しない。
+
+    Returns:
+        tuple[str | None, str]: (形式, 判定方法 'magic' / 'text' / 'extension' / 'unknown')
+    """
+    for magic, detected in _MAGIC:
+        if head.startswith(magic):
+            return detected, 'magic'
+    if head[:4] == b'RIFF' and head[8:12] in (b'WAVE', b'WEBP'):
+        return ('.wav' if head[8:12] == b'WAVE' else '.webp'), 'magic'
+    if head[4:8] == b'ftyp':
+        return ('.m4a' if head[8:11] == b'M4A' else '.mp4'), 'magic'
+    if head.startswith(_OLE_MAGIC):
+        return (extension, 'extension') if extension in OLE_FORMATS else (None, 'unknown')
+    text_first = extension in TEXT_FORMATS or _bom_encoding(head) is not None
+    detected = _sniff_text(head, extension) if text_first else None
+    if detected is None and extension not in TEXT_FORMATS:
+        weak = _sniff_weak_magic(head)
+        if weak is not None:
+            return weak, 'magic'
+        if not text_first:
+            detected = _sniff_text(head, extension)
+    if detected is not None:
+        return detected, ('extension' if detected == extension else 'text')
+    return None, 'unknown'
+
+
+def _decide(head, extension, open_zip):
+    """判定結果の辞書を作る (open_zip はZIPの場合に zipfile.ZipFile を返す関数)"""
+    if head.startswith(_ZIP_MAGIC):
+        try:
+            with open_zip() as archive:
+                detected, method = _sniff_zip(archive), 'zip'
+        except (zipfile.BadZipFile, OSError):
+            detected, method = None, 'unknown'
+    else:
+        detected, method = _sniff_head(head, extension)
+    return {
+        'format': detected,
+        'mimetype': MIMETYPES.get(detected) if detected else None,
+        'method': method,
+        'extension': extension,
+        # 拡張子と内容が食い違う (拡張子がない場合も含む。知らない拡張子のテキストファイルは除く)
+        'mismatch': (detected is not None and detected != extension
+                     and not (detected == '.txt' and extension and extension not in MIMETYPES)),
+    }
+
+
+def _remember(key, compute):
+    with _decisions_lock:
+        decision = _decisions.get(key)
+        if decision is not None:
+            _decisions.move_to_end(key)
+            return dict(decision)
+    decision = compute()
+    with _decisions_lock:
+        _decisions[key] = decision
+        while len(_decisions) > MAX_DECISIONS:
+            _decisions.popitem(last=False)
+    return dict(decision)
+
+
+def sniff(file_path, digest=None):
+    """
+    ファイルの形式を判定する (先頭の SNIFF_BYTES と、ZIPの場合は中央ディレクトリだけを読む)
+
+    Args:
+        file_path (str): ファイルのパス
+        digest (str, optional): ファイルの内容のハッシュ (キャッシュのために計算済みの場合)。
+            指定した場合は判定の結果をハッシュをキーに記憶し、指定しない場合はパス・サイズ・更新時刻をキーにする
+
+    Returns:
+        dict: format (判定した形式の拡張子。判定できない場合はNone), mimetype, method (判定方法),
+            extension (パスの拡張子), mismatch (拡張子と内容が食い違うか)
+
+    Raises:
+        OSError: ファイルを読めない場合
+    """
+    extension = normalize_extension(os.path.splitext(file_path)[1])
+    if digest is not None:
+        key = ('sha256', digest, extension)
+    else:
+        stat = os.stat(file_path)
+        key = ('stat', os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def compute():
+        with open(file_path, 'rb') as f:
+            head = f.read(SNIFF_BYTES)
+        return _decide(head, extension, lambda: zipfile.ZipFile(file_path))
+    return _remember(key, compute)
+
+
+def sniff_bytes(data, filename='', digest=None):
+    """
+    メモリ上のファイルの内容 (標準入力、アップロード、ZIPのメンバー) の形式を判定する
+
+    Args:
+        data (bytes): ファイルの内容
+        filename (str, optional): 元のファイル名 (拡張子をテキストの形式の判定に使う)
+        digest (str, optional): 内容のハッシュ (指定した場合は判定の結果を記憶する)
+    """
+    extension = normalize_extension(os.path.splitext(filename)[1])
+
+    def compute():
+        decision = _decide(data[:SNIFF_BYTES], extension, lambda: zipfile.ZipFile(io.BytesIO(data)))
+        # ファイル名がなければ拡張子との食い違いは問わない
+        decision['mismatch'] = decision['mismatch'] and bool(filename)
+        return decision
+    if digest is None:
+        return compute()
+    return _remember(('sha256', digest, extension), compute)
+
+
+def stream_info(decision, filename=None):
+    """
+    判定の結果をMarkItDownの StreamInfo にする (判定できなかった場合はNone)
+
+    拡張子とMIMEタイプを渡すと、MarkItDownはファイル名の拡張子の代わりにそれを使って変換器を選ぶ。
+    """
+    if decision is None or decision['format'] is None:
+        return None
+    from markitdown import StreamInfo
+    return StreamInfo(extension=decision['format'], mimetype=decision['mimetype'], filename=filename or None)
+
+
+def describe(decision):
+    """判定の結果の形式名 (判定できない場合は '不明')"""
+    return decision['format'] or '不明'
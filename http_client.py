@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共有のHTTPセッション
+
+MarkItDown (URLの取得)、YouTubeのoEmbed APIへの問い合わせ、文字起こしの取得で
+同じ requests.Session を使い、接続を使い回す (keep-alive)。
+セッションはネットワーク設定 (プロキシ、SSL証明書の検証) ごとに1つ作り、
+ホストごとの同時接続数の上限、デフォルトのタイムアウト、バックオフ付きのリトライを設定する。
+
+ネットワーク設定は変換ごとに NetworkConfig (変更できないオブジェクト) で明示的に渡し、
+環境変数 (HTTP_PROXY など) は変更しない。同時に実行中の変換が別々の設定を使っても互いに影響しない。
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from contextlib import contextmanager
+
+# (接続, 読み込み) のタイムアウト (秒)
+DEFAULT_TIMEOUT = (10, 60)
+# 接続プールを保持するホストの数
+POOL_CONNECTIONS = 16
+# ホストごとの同時接続数の上限 (超えた場合は空くまで待つ)
+POOL_MAXSIZE = 8
+# リトライの回数と間隔 (0.5秒, 1秒, 2秒...)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+# NetworkConfig -> requests.Session
+_sessions = {}
+_local = threading.local()
+
+
+@dataclass(frozen=True)
+class NetworkConfig:
+    """
+    1件の変換で使うネットワーク設定 (変更できない。子プロセスにも渡せる)
+
+    Attributes:
+        proxy (str | None): プロキシURL (認証情報を含めてよい)。Noneの場合は環境変数のプロキシ設定に従う
+        verify (bool): SSL証明書を検証するかどうか
+    """
+    proxy: str = None
+    verify: bool = True
+
+    def __repr__(self):
+        # ログやエラーメッセージにプロキシのパスワードを出さない
+        proxy = re.sub(r'://[^@/]*@', '://***@', self.proxy) if self.proxy else None
+        return f"NetworkConfig(proxy={proxy!r}, verify={self.verify!r})"
+
+
+DEFAULT_NETWORK = NetworkConfig()
+
+
+def create_session(network=None, timeout=DEFAULT_TIMEOUT, pool_maxsize=POOL_MAXSIZE, retries=RETRY_TOTAL):
+    """
+    接続プール、タイムアウト、リトライを設定した requests.Session を作る
+
+    Args:
+        network (NetworkConfig, optional): ネットワーク設定
+        timeout (float | tuple, optional): リクエストでタイムアウトを指定しなかった場合のタイムアウト
+        pool_maxsize (int, optional): ホストごとの同時接続数の上限
+        retries (int, optional): 接続エラーや 429/5xx の場合のリトライ回数
+    """
+    # requests は起動時に読み込まないように、最初にセッションを作るときに読み込む
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    network = network or DEFAULT_NETWORK
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=('GET', 'HEAD', 'OPTIONS'),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=pool_maxsize,
+                          max_retries=retry, pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    if network.proxy:
+        session.proxies = {'http': network.proxy, 'https': network.proxy}
+        # 環境変数のプロキシ設定がアプリの設定より優先されないようにする
+        session.trust_env = False
+    if not network.verify:
+        session.verify = False
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    # タイムアウトを指定しないリクエストにもデフォルトのタイムアウトを適用する
+    request = session.request
+
+    def request_with_timeout(method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = timeout
+        return request(method, url, **kwargs)
+
+    session.request = request_with_timeout
+    return session
+
+
+def get_session(network=None):
+    """
+    ネットワーク設定に対応する共有のセッションを返す (同じ設定では同じセッションを使い回す)
+    """
+    key = network or DEFAULT_NETWORK
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = create_session(network)
+            _sessions[key] = session
+        return session
+
+
+@contextmanager
+def use_network(network):
+    """
+    このスレッドで行う通信のネットワーク設定を指定する
+    (MarkItDownの内部から呼ばれる文字起こしの取得など、設定を引数で渡せない処理のため)
+    """
+    previous = getattr(_local, 'network', None)
+    _local.network = network
+    try:
+        yield
+    finally:
+        _local.network = previous
+
+
+def active_session():
+    """このスレッドのネットワーク設定 (use_network) に対応する共有のセッション"""
+    return get_session(getattr(_local, 'network', None))
+
+
+def close_all():
+    """すべてのセッションを閉じる"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
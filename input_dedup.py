@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+バッチ変換での重複した入力の検出
+
+名前が違うだけで内容が同じファイル (同じ添付ファイルのコピーなど) を変換前にまとめ、
+内容ごとに1回だけ変換して、結果を重複したファイルの出力パスにも配る。
+ハッシュはサイズが同じファイルがある場合だけチャンク単位で読み込んで計算する
+(サイズが一意のファイルは内容を読まない)。
+"""
+
+import os
+import json
+import time
+import shutil
+
+import instrumentation
+from disk_cache import hash_file
+
+# 変換結果を重複したファイルの出力パスに配る方法
+MODES = ('link', 'copy', 'reference')
+DEFAULT_MODE = 'link'
+
+
+def _hash_all(paths, jobs=1):
+    """ファイルのハッシュを計算する (jobsが2以上の場合はスレッドで並列に読み込む)"""
+    if jobs <= 1 or len(paths) <= 1:
+        return [hash_file(path) for path in paths]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+        return list(executor.map(hash_file, paths))
+
+
+def group_duplicates(plan, jobs=1):
+    """
+    内容が同じ入力ファイルをまとめる
+
+    Args:
+        plan (list[tuple[str, str]]): (入力ファイルのパス, 出力ファイルのパス) のリスト
+        jobs (int, optional): ハッシュを並列に計算するスレッド数
+
+    Returns:
+        tuple[list[tuple[str, str]], dict]: (変換する入力 (内容ごとに最初の1件、元の順序),
+            変換する入力のパス -> 同じ内容の (入力ファイルのパス, 出力ファイルのパス) のリスト)
+    """
+    by_size = {}
+    for source, output_path in plan:
+        try:
+            size = os.path.getsize(source)
+        except OSError:
+            # 読めないファイルはまとめずに変換させ、変換のエラーとして記録する
+            size = None
+        by_size.setdefault(size, []).append(source)
+    candidates = [source for size, sources in by_size.items() if size is not None and len(sources) > 1
+                  for source in sources]
+
+    digests = {}
+    with instrumentation.span('dedup_hash', files=len(candidates)):
+        for source, digest in zip(candidates, _hash_all(candidates, jobs)):
+            digests[source] = digest
+
+    unique = []
+    duplicates = {}
+    primary_for = {}
+    for source, output_path in plan:
+        digest = digests.get(source)
+        primary = primary_for.get(digest) if digest is not None else None
+        if primary is None:
+            if digest is not None:
+                primary_for[digest] = source
+            unique.append((source, output_path))
+        else:
+            duplicates.setdefault(primary, []).append((source, output_path))
+    return unique, duplicates
+
+
+def _reference_text(primary_source, primary_output, output_path):
+    rel_path = os.path.relpath(primary_output, os.path.dirname(output_path) or '.').replace(os.sep, '/')
+    return (f"<!-- Duplicate of: {primary_source} -->\n\n"
+            f"同じ内容のファイルの変換結果: [{os.path.basename(primary_output)}]({rel_path})\n")
+
+
+def _relabel_jsonl(primary_output, tmp_path, source):
+    """チャンクのJSONL (markdown_chunker) を1行ずつ読み、source を書き換えてコピーする"""
+    with open(primary_output, 'r', encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for line in src:
+            record = json.loads(line)
+            record['source'] = source
+            dst.write(json.dumps(record, ensure_ascii=False))
+            dst.write('\n')
+
+
+def _place(primary_source, primary_output, source, output_path, mode, jsonl=False):
+    """変換結果を1つの出力パスに配る (途中で中断しても書きかけのファイルが残らないように置き換える)"""
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if jsonl:
+        # レコードに元のファイルのパスを含むため、リンクやそのままのコピーにはしない
+        _relabel_jsonl(primary_output, tmp_path, source)
+    elif mode == 'reference':
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(_reference_text(primary_source, primary_output, output_path))
+    elif mode == 'link':
+        try:
+            os.link(primary_output, tmp_path)
+        except OSError:
+            # 別のドライブやハードリンクに対応しないファイルシステムではコピーする
+            shutil.copyfile(primary_output, tmp_path)
+    else:
+        shutil.copyfile(primary_output, tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def fan_out(results, duplicates, mode=DEFAULT_MODE, jsonl=False):
+    """
+    変換結果を同じ内容のファイルの出力パスに配る
+
+    Args:
+        results (list[dict]): 変換した入力の結果 (convert_batch の戻り値)
+        duplicates (dict): group_duplicates() で作った重複の一覧
+        mode (str, optional): 'link' (ハードリンク、できなければコピー)、'copy'、
+            'reference' (変換結果へのリンクだけを書いたMarkdown)
+        jsonl (bool, optional): 出力がチャンクのJSONLの場合はTrue (レコードの source を書き換えてコピーする)
+
+    Returns:
+        list[dict]: 重複したファイルごとの結果 (duplicate_of に変換した入力のパス)
+    """
+    by_source = {result['source']: result for result in results}
+    fanned = []
+    for primary_source, copies in duplicates.items():
+        primary = by_source.get(primary_source)
+        for source, output_path in copies:
+            start = time.perf_counter()
+            error = None
+            if primary is None or not primary['success']:
+                error = primary['error'] if primary is not None else "変換されませんでした"
+            else:
+                try:
+                    with instrumentation.span('write', target=output_path, dedup=mode):
+                        _place(primary_source, primary['output'], source, output_path, mode, jsonl)
+                except (OSError, ValueError) as e:
+                    error = f"{type(e).__name__}: {e}"
+            fanned.append({
+                'source': source,
+                'output': output_path,
+                'success': error is None,
+                'error': error,
+                'elapsed': time.perf_counter() - start,
+                'cache_hit': None,
+                'duplicate_of': primary_source,
+            })
+    return fanned
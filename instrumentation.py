@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+変換処理の計測
+
+変換の各段階 (プロキシ設定、MarkItDownの取得、形式の判定、変換、後処理、書き込み) を
+span() で囲み、所要時間などを構造化イベント (辞書) としてフックに送る。
+フックが登録されていなければ何もしないので、計測を有効にしない限りオーバーヘッドはほぼない。
+
+イベントの例:
+    {"event": "span", "name": "convert", "duration_ms": 812.4, "ok": true,
+     "conversion_id": "1234-5", "source": "report.pdf", "ts": 1700000000.0, "pid": 1234, "thread": "MainThread"}
+
+環境変数 MARKITDOWN_TRACE にファイルパス (- は標準エラー出力) を指定すると
+JSON Lines 形式で書き出す。MARKITDOWN_PROFILE_DIR を指定すると変換ごとの cProfile の結果を保存する。
+"""
+
+import os
+import sys
+import json
+import dataclasses
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+TRACE_ENV = 'MARKITDOWN_TRACE'
+PROFILE_DIR_ENV = 'MARKITDOWN_PROFILE_DIR'
+
+_hooks = []
+_hooks_lock = threading.Lock()
+_local = threading.local()
+_counter = itertools.count(1)
+
+
+def add_hook(hook):
+    """
+    イベントを受け取るフックを登録する
+
+    Args:
+        hook (callable): イベントの辞書を1つ受け取る関数
+    """
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def enabled():
+    """フックが登録されているか"""
+    return bool(_hooks)
+
+
+def emit(event, **fields):
+    """
+    イベントをすべてのフックに送る (フックの例外は変換処理に影響させない)
+    """
+    if not _hooks:
+        return
+    record = {'event': event}
+    record.update(getattr(_local, 'context', {}))
+    record.update(fields)
+    record.setdefault('ts', time.time())
+    record['pid'] = os.getpid()
+    record['thread'] = threading.current_thread().name
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception:
+            pass
+
+
+def new_conversion_id():
+    """変換ごとのID (同じ変換のイベントを関連付けるために使う)"""
+    return f"{os.getpid()}-{next(_counter)}"
+
+
+@contextmanager
+def context(**fields):
+    """
+    このスレッドで発行されるイベントに共通のフィールド (conversion_id, source など) を付ける
+    """
+    previous = getattr(_local, 'context', {})
+    _local.context = dict(previous, **fields)
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def current_context():
+    """このスレッドの共通フィールド (子プロセスに引き継ぐため)"""
+    return dict(getattr(_local, 'context', {}))
+
+
+@contextmanager
+def span(name, **fields):
+    """
+    処理の所要時間を計測してイベントとして送る
+
+    ブロック内で発生した例外はそのまま送出し、イベントには ok=false とエラー内容を記録する。
+    ブロック内で yield された辞書に追加したフィールドもイベントに含まれる。
+    """
+    extra = {}
+    if not _hooks:
+        yield extra
+        return
+    start = time.perf_counter()
+    ts = time.time()
+    try:
+        yield extra
+    except BaseException as e:
+        _emit_span(name, start, ts, fields, extra, ok=False, error=f"{type(e).__name__}: {e}")
+        raise
+    _emit_span(name, start, ts, fields, extra, ok=True)
+
+
+def _emit_span(name, start, ts, fields, extra, **status):
+    record = dict(fields)
+    record.update(extra)
+    record.update(status)
+    emit('span', name=name, duration_ms=(time.perf_counter() - start) * 1000, ts=ts, **record)
+
+
+@contextmanager
+def profile(profile_dir, label):
+    """
+    ブロック内の処理を cProfile で計測し、profile_dir に pstats 形式で保存する
+
+    Args:
+        profile_dir (str | None): 保存先のディレクトリ。Noneの場合は計測しない
+        label (str): ファイル名に使うラベル (入力ファイル名など)
+    """
+    if not profile_dir:
+        yield None
+        return
+    import cProfile
+    import re
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(profile_dir, exist_ok=True)
+        safe_label = re.sub(r'[^A-Za-z0-9._-]+', '_', os.path.basename(label))[:100] or 'conversion'
+        path = os.path.join(profile_dir, f"{safe_label}.{new_conversion_id()}.pstats")
+        profiler.dump_stats(path)
+        emit('profile', path=path)
+
+
+class JsonLinesSink:
+    """イベントをJSON Lines形式で書き出すフック"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): 書き込むファイルのパス。'-' の場合は標準エラー出力
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if path == '-':
+            self._stream = sys.stderr
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 複数のプロセスから追記しても行が混ざらないように、1行ずつ1回の書き込みで追記する
+            self._stream = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def __call__(self, record):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._stream.write(line)
+
+    def close(self):
+        if self._stream is not sys.stderr:
+            self._stream.close()
+
+
+_sinks = {}
+
+
+def enable_trace(path):
+    """
+    JSON Lines へのイベントの書き出しを有効にする (同じパスに対しては1つだけ登録する)
+    """
+    if path and path not in _sinks:
+        _sinks[path] = JsonLinesSink(path)
+        add_hook(_sinks[path])
+
+
+def configure_from_env():
+    """
+    環境変数 MARKITDOWN_TRACE の設定に従って書き出しを有効にする
+
+    Returns:
+        str | None: MARKITDOWN_PROFILE_DIR の値 (cProfile の保存先)
+    """
+    enable_trace(os.environ.get(TRACE_ENV))
+    return os.environ.get(PROFILE_DIR_ENV) or None
+
+
+def redact_options(options):
+    """
+    イベントに記録するオプションからプロキシの認証情報を取り除く
+    """
+    def redact(value):
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            value = dataclasses.asdict(value)
+        if isinstance(value, dict):
+            return {k: redact(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [redact(v) for v in value]
+        if isinstance(value, str) and '@' in value and '://' in value:
+            scheme, rest = value.split('://', 1)
+            return f"{scheme}://***@{rest.rsplit('@', 1)[1]}"
+        return value
+    return redact(options)
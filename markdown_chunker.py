@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+変換したMarkdownを見出し単位のチャンクに分割する (埋め込み・RAG用のJSONL出力)
+
+見出し (# 〜 ######) ごとの節に分け、節が長い場合は段落、行、文字の順に細かく分けてから
+上限のサイズまで詰める。チャンクは見出しをまたがない。
+サイズは文字数、または近似トークン数 (英数字の連続を1、それ以外の文字を1文字ずつ数える) で指定する。
+重なり (overlap) は段落・行の単位で、前のチャンクの末尾を次のチャンクの先頭に含める。
+"""
+
+import re
+import json
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_OVERLAP = 200
+UNITS = ('chars', 'tokens')
+
+_HEADING = re.compile(r'^(#{1,6})[ \t]+(.+?)[ \t#]*$')
+_FENCE = re.compile(r'^[ \t]*(```|~~~)')
+# 近似トークン: 英数字の連続は1トークン、それ以外 (日本語の文字、記号) は1文字1トークン
+_TOKEN = re.compile(r'[A-Za-z0-9_]+|\S')
+
+
+def measure(text, unit='chars'):
+    """テキストのサイズ (文字数または近似トークン数)"""
+    if unit == 'tokens':
+        return sum(1 for _ in _TOKEN.finditer(text))
+    return len(text)
+
+
+def _split_sections(text):
+    """
+    見出しごとの節に分ける (コードブロック内の # は見出しとみなさない)
+
+    Yields:
+        tuple[list[str], int, int]: (見出しのパス, 開始位置, 終了位置)
+    """
+    path = []
+    start = 0
+    position = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        m = None if in_fence else _HEADING.match(line.rstrip('\r\n'))
+        if m:
+            if position > start:
+                yield list(path), start, position
+            level = len(m.group(1))
+            path = path[:level - 1] + [''] * (level - 1 - len(path)) + [m.group(2).strip()]
+            start = position
+        position += len(line)
+    if position > start:
+        yield list(path), start, position
+
+
+def _hard_split(text, offset, size, unit):
+    """上限を超える1行を、できるだけ空白の位置で上限のサイズごとに切る"""
+    pieces = []
+    start = 0
+    while start < len(text):
+        if unit == 'tokens':
+            end = len(text)
+            for i, m in enumerate(_TOKEN.finditer(text, start)):
+                if i == size:
+                    end = m.start()
+                    break
+        else:
+            end = min(len(text), start + size)
+        if end < len(text):
+            space = text.rfind(' ', start + 1, end)
+            if space > start:
+                end = space + 1
+        pieces.append((offset + start, offset + end))
+        start = end
+    return pieces
+
+
+def _segments(text, start, end, size, unit):
+    """節を上限以下の断片 (段落、行、文字の順) に分ける"""
+    segments = []
+    for m in re.finditer(r'.*?(?:\n[ \t]*\n+|\Z)', text[start:end], re.S):
+        if not m.group():
+            continue
+        p_start, p_end = start + m.start(), start + m.end()
+        if measure(text[p_start:p_end], unit) <= size:
+            segments.append((p_start, p_end))
+            continue
+        position = p_start
+        for line in text[p_start:p_end].splitlines(keepends=True):
+            if measure(line, unit) <= size:
+                segments.append((position, position + len(line)))
+            else:
+                segments.extend(_hard_split(line, position, size, unit))
+            position += len(line)
+    return segments
+
+
+def iter_chunks(text, size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_OVERLAP, unit='chars'):
+    """
+    Markdownを見出し単位のチャンクに分割する
+
+    Args:
+        text (str): Markdownテキスト
+        size (int, optional): チャンクの最大サイズ
+        overlap (int, optional): 前のチャンクと重ねるサイズの上限 (段落・行の単位)
+        unit (str, optional): サイズの単位 ('chars' または 'tokens')
+
+    Yields:
+        dict: index (チャンクの番号), heading_path (見出しのパス), start, end (テキスト内の文字位置), text
+    """
+    if unit not in UNITS:
+        raise ValueError(f"サイズの単位は {', '.join(UNITS)} のいずれかです: {unit}")
+    if size <= 0 or overlap < 0:
+        raise ValueError("チャンクのサイズは1以上、重なりは0以上にしてください")
+    index = 0
+    for heading_path, sec_start, sec_end in _split_sections(text):
+        segments = _segments(text, sec_start, sec_end, size, unit)
+        # 断片は連続しているので、チャンクのサイズは断片のサイズの合計で求める
+        sizes = [measure(text[s:e], unit) for s, e in segments]
+        i = 0
+        while i < len(segments):
+            # 上限まで断片を詰める (1つ目は必ず含める)
+            j, total = i + 1, sizes[i]
+            while j < len(segments) and total + sizes[j] <= size:
+                total += sizes[j]
+                j += 1
+            start, end = segments[i][0], segments[j - 1][1]
+            if text[start:end].strip():
+                yield {
+                    'index': index,
+                    'heading_path': [h for h in heading_path if h],
+                    'start': start,
+                    'end': end,
+                    'text': text[start:end],
+                }
+                index += 1
+            if j >= len(segments):
+                break
+            # 次のチャンクの先頭に、このチャンクの末尾の断片を重なりの範囲で含める
+            # (次の断片が入りきらなくなる場合は重ねない)
+            k, shared = j, 0
+            while k - 1 > i and shared + sizes[k - 1] <= min(overlap, size - sizes[j]):
+                shared += sizes[k - 1]
+                k -= 1
+            i = k
+
+
+def write_jsonl(f, source, text, size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_OVERLAP, unit='chars'):
+    """
+    チャンクを1行1レコードのJSONとして書き出す (チャンクを1つずつ生成しながら書く)
+
+    Args:
+        f: 書き込み先のテキストファイル
+        source (str): 元のファイルのパス (レコードの source)
+
+    Returns:
+        int: 書き出したチャンクの数
+    """
+    count = 0
+    for chunk in iter_chunks(text, size, overlap, unit):
+        record = {'source': source, 'chunk': chunk['index'], 'heading_path': chunk['heading_path'],
+                  'start': chunk['start'], 'end': chunk['end'], 'text': chunk['text']}
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write('\n')
+        count += 1
+    return count
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大きな変換結果でも固まらないMarkdownプレビュー
+
+変換結果をまとめて setPlainText() すると、数百MBの結果ではUIスレッドが長時間止まり、
+連結した文字列の分だけメモリも倍になる。ChunkedPreview は表示する部分だけを少しずつ読み込み、
+スクロールが末尾に近づいたら次の塊を追加する。読み込んだ量が上限に達したら
+それ以上は読み込まず「先頭の N MB のみ表示」と通知する。
+"""
+
+import os
+
+from PySide6.QtCore import Signal, QTimer
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
+
+# 1回に読み込む文字数
+CHUNK_CHARS = 256 * 1024
+# プレビューに読み込む最大文字数 (これを超える部分は表示しない)
+LIMIT_CHARS = 8 * 1024 * 1024
+# 末尾からこのページ数以内までスクロールしたら次の塊を読み込む
+PREFETCH_PAGES = 2
+
+
+def _format_mb(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+class _TextSource:
+    """メモリ上の文字列 (複数) を連結せずに順に切り出す"""
+
+    def __init__(self, parts):
+        self.parts = [part for part in parts if part]
+        self._index = 0
+        self._offset = 0
+
+    def read(self, size):
+        """最大size文字を行の途中で切らないように返す。終わりに達したら空文字列"""
+        while self._index < len(self.parts):
+            text = self.parts[self._index]
+            if self._offset >= len(text):
+                self._index += 1
+                self._offset = 0
+                continue
+            end = min(self._offset + size, len(text))
+            if end < len(text):
+                newline = text.rfind('\n', self._offset, end)
+                if newline >= self._offset:
+                    end = newline + 1
+            chunk = text[self._offset:end]
+            self._offset = end
+            return chunk
+        return ''
+
+    def total_bytes(self):
+        # 大きな文字列を一度にエンコードしないように塊ごとに数える
+        total = 0
+        for text in self.parts:
+            for start in range(0, len(text), CHUNK_CHARS):
+                total += len(text[start:start + CHUNK_CHARS].encode('utf-8', 'replace'))
+        return total
+
+    def close(self):
+        self.parts = []
+
+
+class _FileSource:
+    """保存済みのファイルを必要な分だけ読み込む"""
+
+    def __init__(self, path):
+        self._file = open(path, 'r', encoding='utf-8', errors='replace')
+        self._size = os.path.getsize(path)
+
+    def read(self, size):
+        chunk = self._file.read(size)
+        if chunk and not chunk.endswith('\n'):
+            # 行の途中で切らないように行末まで読む
+            chunk += self._file.readline(size)
+        return chunk
+
+    def total_bytes(self):
+        return self._size
+
+    def close(self):
+        self._file.close()
+
+
+class ChunkedPreview(QPlainTextEdit):
+    """表示する部分だけを少しずつ読み込む読み取り専用のプレビュー"""
+
+    # プレビューの状態 (読み込み済みの量、省略しているかどうか) の説明。空文字列は全体を表示済み
+    status_changed = Signal(str)
+
+    def __init__(self, parent=None, chunk_chars=CHUNK_CHARS, limit_chars=LIMIT_CHARS):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self.chunk_chars = chunk_chars
+        self.limit_chars = limit_chars
+        self._source = None
+        self._loaded_chars = 0
+        self._loading = False
+        self.verticalScrollBar().valueChanged.connect(self._on_scroll)
+
+    def set_texts(self, *parts):
+        """
+        文字列を順に表示する (元ファイルパスのコメントと変換結果のように、連結せずに渡せる)
+        """
+        self._start(_TextSource(parts))
+
+    def load_file(self, path):
+        """
+        ファイルの内容を表示する (表示する部分だけを読み込む)
+
+        Raises:
+            OSError: ファイルを開けない場合
+        """
+        self._start(_FileSource(path))
+
+    def clear(self):
+        self._close_source()
+        self._loaded_chars = 0
+        super().clear()
+        self.status_changed.emit("")
+
+    def _start(self, source):
+        self.clear()
+        self._source = source
+        self._load_more()
+        # 最初の塊で画面が埋まらなかった場合に備えて、レイアウト後にもう一度確認する
+        QTimer.singleShot(0, self._fill_viewport)
+
+    def _close_source(self):
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+
+    def _fill_viewport(self):
+        bar = self.verticalScrollBar()
+        if self._source is not None and bar.maximum() <= bar.pageStep() * PREFETCH_PAGES:
+            self._load_more()
+
+    def _on_scroll(self, value):
+        bar = self.verticalScrollBar()
+        if self._source is not None and value >= bar.maximum() - bar.pageStep() * PREFETCH_PAGES:
+            # 読み込み中の追加でスクロール位置が変わっても再帰しないようにする
+            QTimer.singleShot(0, self._load_more)
+
+    def _load_more(self):
+        if self._source is None or self._loading:
+            return
+        self._loading = True
+        try:
+            chunk = self._source.read(min(self.chunk_chars, self.limit_chars - self._loaded_chars))
+            if chunk:
+                cursor = QTextCursor(self.document())
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText(chunk)
+                self._loaded_chars += len(chunk)
+            if not chunk:
+                # すべて読み込んだ
+                self._close_source()
+                self.status_changed.emit("")
+            elif self._loaded_chars >= self.limit_chars:
+                total = self._source.total_bytes()
+                self._close_source()
+                self.status_changed.emit(
+                    f"プレビューは先頭 {_format_mb(self._loaded_chars)} のみ表示しています (全体 {_format_mb(total)})"
+                )
+            else:
+                self.status_changed.emit(
+                    f"プレビュー: {_format_mb(self._loaded_chars)} を表示中 (スクロールすると続きを読み込みます)"
+                )
+        finally:
+            self._loading = False
@@ -11,100 +11,37 @@ import os
 import re
 import datetime
 import json
-import urllib.request
+import time
+import threading
+import importlib.util
+from contextlib import ExitStack
 from pathlib import Path
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QFileDialog, QLineEdit, QTextEdit, QLabel, QComboBox,
     QCheckBox, QMessageBox, QStatusBar, QSizePolicy, QDialog,
-    QFormLayout, QDialogButtonBox, QMenuBar, QGroupBox, QInputDialog
+    QFormLayout, QDialogButtonBox, QMenuBar, QGroupBox, QInputDialog,
+    QSpinBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
 )
-from PySide6.QtCore import Qt, QThread, Signal, QMimeData, QSettings
+from PySide6.QtCore import Qt, QThread, Signal, QMimeData, QSettings, QTimer, QObject, QRunnable, QThreadPool
 from PySide6.QtGui import QFont, QPalette, QColor, QAction
-from youtube_transcript_api import YouTubeTranscriptApi
-import re
-
-def fetch_transcript(video_id, languages):
-    if 'youtu' in video_id:
-        m = re.search(r'(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})', video_id)
-        if m:
-            video_id = m.group(1)
-    try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        try:
-            return transcript_list.find_transcript(languages).fetch()
-        except:
-            return transcript_list.find_generated_transcript(languages).fetch()
-    except Exception as e:
-        return f"<!-- Transcript unavailable: {e} -->"
-
-
-def get_youtube_info(video_id):
-    """
-    YouTubeのビデオIDからチャンネル名と動画タイトルを取得する
-    """
-    if 'youtu' in video_id:
-        m = re.search(r'(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})', video_id)
-        if m:
-            video_id = m.group(1)
-            
-    try:
-        # YouTube Data APIを使用せずにOEmbed APIを利用
-        oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-        with urllib.request.urlopen(oembed_url) as response:
-            data = json.loads(response.read().decode())
-            title = data.get('title', 'Unknown Title')
-            author = data.get('author_name', 'Unknown Channel')
-            return {
-                'title': title,
-                'channel': author,
-                'video_id': video_id
-            }
-    except Exception as e:
-        print(f"YouTubeの情報取得に失敗しました: {e}")
-        return {
-            'title': 'Unknown Title',
-            'channel': 'Unknown Channel',
-            'video_id': video_id
-        }
 
+import instrumentation
+# 変換に使うモジュール (conversion_tasks, worker_process, disk_cache など) は起動を速くするため使うときに読み込む
+from youtube_helpers import (
+    OEMBED_TIMEOUT, get_youtube_info, prefetch_youtube_info, youtube_filename
+)
 
-def get_youtube_info(video_id):
-    """
-    YouTubeのビデオIDからチャンネル名と動画タイトルを取得する
-    """
-    if 'youtu' in video_id:
-        m = re.search(r'(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})', video_id)
-        if m:
-            video_id = m.group(1)
-            
-    try:
-        # YouTube Data APIを使用せずにOEmbed APIを利用
-        oembed_url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-        with urllib.request.urlopen(oembed_url) as response:
-            data = json.loads(response.read().decode())
-            title = data.get('title', 'Unknown Title')
-            author = data.get('author_name', 'Unknown Channel')
-            return {
-                'title': title,
-                'channel': author,
-                'video_id': video_id
-            }
-    except Exception as e:
-        print(f"YouTubeの情報取得に失敗しました: {e}")
-        return {
-            'title': 'Unknown Title',
-            'channel': 'Unknown Channel',
-            'video_id': video_id
-        }
+# 環境変数 MARKITDOWN_TRACE / MARKITDOWN_PROFILE_DIR で変換の計測を有効にする
+PROFILE_DIR = instrumentation.configure_from_env()
 
-# Override the default get_transcript method with our robust version
-YouTubeTranscriptApi.get_transcript = fetch_transcript
+# 変換キューで同時に変換する数のデフォルト
+DEFAULT_QUEUE_CONCURRENCY = max(1, min(4, os.cpu_count() or 1))
+# 変換用の子プロセス1つあたりのメモリの上限 (MB) のデフォルト
+DEFAULT_WORKER_MEMORY_LIMIT_MB = 4096
 
-# markitdownのインポートを試みる (エラーハンドリングを追加)
-try:
-    from markitdown import MarkItDown
-except ImportError:
+# markitdownがインストールされているか確認する (ここではインポートせずに存在だけを確認)
+if importlib.util.find_spec("markitdown") is None:
     def show_import_error():
         app = QApplication([])
         msg_box = QMessageBox()
@@ -131,7 +68,7 @@ QWidget {
 QMainWindow, QDialog {
     background-color: #2E2E2E;
 }
-QLineEdit, QTextEdit {
+QLineEdit, QTextEdit, QPlainTextEdit {
     background-color: #3C3C3C;
     border: 1px solid #555555;
     border-radius: 4px;
@@ -232,156 +169,259 @@ QGroupBox::title {
 }
 """
 
+def traced_conversion(conversion_id, source):
+    """1件分の変換全体を計測する (変換ごとのIDを付け、MARKITDOWN_PROFILE_DIR があればcProfileも取る)"""
+    stack = ExitStack()
+    stack.enter_context(instrumentation.context(conversion_id=conversion_id, source=source))
+    stack.enter_context(instrumentation.span('conversion'))
+    stack.enter_context(instrumentation.profile(PROFILE_DIR, source))
+    return stack
+
+
+def run_conversion(conversion_id, file_path, enable_plugins, network=None, transcript_language=None,
+                   cache=None, timeout=None, cancel_event=None):
+    """
+    ファイルまたはURLを変換用の子プロセスで変換する (ConversionWorker と変換キューのジョブから呼ばれる)
+
+    子プロセスで変換するため、取り消しや制限時間を過ぎた場合は変換の途中でもすぐに止められる。
+
+    Args:
+        network (http_client.NetworkConfig, optional): この変換のネットワーク設定 (子プロセスにそのまま渡す)
+        cache (ConversionCache, optional): 変換結果のキャッシュ (Noneの場合はキャッシュしない)
+        timeout (float, optional): 制限時間 (秒)。Noneの場合は制限しない
+        cancel_event (threading.Event, optional): セットされたら変換を取り消す
+
+    Returns:
+        str: Markdownテキスト
+
+    Raises:
+        worker_process.ConversionCancelled: 取り消された場合
+        worker_process.ConversionTimeout: 制限時間を過ぎた場合
+    """
+    from conversion_tasks import convert_in_worker, default_worker_pool
+
+    args = (conversion_id, file_path, enable_plugins, network, transcript_language,
+            cache.cache_dir if cache is not None else None)
+    return default_worker_pool().run(convert_in_worker, args, timeout, cancel_event)
+
+
+def apply_worker_memory_limit(memory_limit):
+    """
+    変換用の子プロセスのメモリの上限を設定する (変更した場合は子プロセスを入れ替える)
+
+    Args:
+        memory_limit (int): 上限 (MB)。0以下、または上限を設定できない環境では制限しない
+    """
+    import worker_process
+    from conversion_tasks import default_worker_pool
+
+    if memory_limit <= 0 or not worker_process.memory_limit_supported():
+        memory_limit = None
+    default_worker_pool().set_memory_limit(memory_limit)
+
+
+def close_worker_pool():
+    """変換用の子プロセスを終了する (変換のモジュールをまだ読み込んでいない場合は何もしない)"""
+    conversion_tasks = sys.modules.get('conversion_tasks')
+    if conversion_tasks is not None:
+        conversion_tasks.default_worker_pool().close()
+
+
+def format_conversion_error(e):
+    """エラーダイアログに表示する詳細なエラー情報を作る"""
+    import traceback
+    error_traceback = traceback.format_exc()
+    # 子プロセスで発生したエラーは子プロセスでのトレースバックも表示する
+    worker_traceback = getattr(e, 'worker_traceback', None)
+    if worker_traceback:
+        error_traceback = f"{worker_traceback}\n--- 変換プロセスの呼び出し元 ---\n{error_traceback}"
+    error_message = f"{str(e)}\n\n--- 詳細エラー情報 ---\n{error_traceback}"
+    print(f"\n[ERROR] 変換エラー: {error_message}", file=sys.stderr)
+    return error_message
+
+
+def save_markdown(output_dir, filename, original_source, markdown_content):
+    """
+    元ファイルパスのコメントを付けて変換結果を保存する (変換キュー用)
+
+    同名のファイルが既にある場合は上書きせず、ファイル名に連番を付ける。
+
+    Returns:
+        str: 保存したファイルのパス
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stem, ext = os.path.splitext(filename)
+    number = 1
+    while True:
+        path = os.path.join(output_dir, filename if number == 1 else f"{stem}_{number}{ext}")
+        try:
+            # 同時に実行中のジョブと同じ名前にならないように排他的に作成する
+            f = open(path, 'x', encoding='utf-8')
+        except FileExistsError:
+            number += 1
+            continue
+        with instrumentation.span('write', target=path), f:
+            f.write(f"<!-- Original Source: {original_source} -->\n\n")
+            f.write(markdown_content)
+        return path
+
+
 class ConversionWorker(QThread):
     """ファイル変換をバックグラウンドで実行するワーカースレッド"""
     # 元ファイルパスもシグナルで渡すように変更
     conversion_complete = Signal(str, str) # markdown_content, original_file_path
     conversion_error = Signal(str)
 
-    def __init__(self, file_path, enable_plugins, proxy_settings=None, transcript_language=None):
+    def __init__(self, file_path, enable_plugins, network=None, transcript_language=None, cache=None,
+                 timeout=None):
         super().__init__()
         self.file_path = file_path
         self.enable_plugins = enable_plugins
-        self.proxy_settings = proxy_settings
+        self.network = network # http_client.NetworkConfig (Noneの場合は環境変数のプロキシ設定に従う)
         self.transcript_language = transcript_language
+        self.cache = cache # ConversionCache (Noneの場合はキャッシュしない)
+        self.timeout = timeout # 変換の制限時間 (秒、Noneの場合は制限しない)
+        self.conversion_id = instrumentation.new_conversion_id() # 計測イベントを関連付けるID
         self._is_running = True
+        self._cancel_event = threading.Event()
+
+    def run(self):
+        import worker_process
+
+        with traced_conversion(self.conversion_id, self.file_path):
+            # ファイル名に使うYouTubeの動画情報を変換と並行して取得しておく
+            # (UIスレッドではキャッシュだけを参照する)
+            info_thread = prefetch_youtube_info(self.file_path, network=self.network)
+            try:
+                markdown_content = run_conversion(self.conversion_id, self.file_path, self.enable_plugins,
+                                                  self.network, self.transcript_language, self.cache,
+                                                  self.timeout, self._cancel_event)
+                if info_thread is not None:
+                    info_thread.join(OEMBED_TIMEOUT)
+                if self._is_running:
+                    # 元ファイルパスを渡す
+                    self.conversion_complete.emit(markdown_content, self.file_path)
+            except worker_process.ConversionCancelled:
+                pass
+            except Exception as e:
+                if self._is_running:
+                    self.conversion_error.emit(format_conversion_error(e))
+
+    def stop(self):
+        """変換を取り消す (変換用の子プロセスを終了させるので、すぐにスレッドが終わる)"""
+        self._is_running = False
+        self._cancel_event.set()
+
+
+class QueueJobSignals(QObject):
+    """QueueJobの進捗を通知するシグナル (QRunnableはシグナルを持てないため別に用意する)"""
+    started = Signal(int) # job_id
+    completed = Signal(int, str, float) # job_id, 保存したファイルのパス, 所要時間 (秒)
+    failed = Signal(int, str, float) # job_id, エラー情報, 所要時間 (秒)
+
+
+class QueueJob(QRunnable):
+    """変換キューの1件分のジョブ。変換して自動生成したファイル名で保存する"""
+
+    def __init__(self, job_id, file_path, enable_plugins, network, transcript_language, cache,
+                 output_dir, filename_for, timeout=None):
+        """
+        Args:
+            job_id (int): キュー内のジョブID
+            network (http_client.NetworkConfig): この変換のネットワーク設定 (Noneの場合は環境変数に従う)
+            output_dir (str): 保存先フォルダ
+            filename_for (callable): 元ファイルパスから保存するファイル名を作る関数
+            timeout (float, optional): 変換の制限時間 (秒)。Noneの場合は制限しない
+        """
+        super().__init__()
+        self.job_id = job_id
+        self.file_path = file_path
+        self.enable_plugins = enable_plugins
+        self.network = network
+        self.transcript_language = transcript_language
+        self.cache = cache
+        self.output_dir = output_dir
+        self.filename_for = filename_for
+        self.timeout = timeout
+        self.conversion_id = instrumentation.new_conversion_id()
+        self.cancelled = False
+        self._cancel_event = threading.Event()
+        self.signals = QueueJobSignals()
+        # 状態の表示と取り消しのためにアプリ側で参照を保持するので、実行後に自動削除させない
+        self.setAutoDelete(False)
+
+    def run(self):
+        import worker_process
+
+        if self.cancelled:
+            return
+        self.signals.started.emit(self.job_id)
+        start = time.perf_counter()
+        with traced_conversion(self.conversion_id, self.file_path):
+            info_thread = prefetch_youtube_info(self.file_path, network=self.network)
+            try:
+                markdown_content = run_conversion(self.conversion_id, self.file_path, self.enable_plugins,
+                                                  self.network, self.transcript_language, self.cache,
+                                                  self.timeout, self._cancel_event)
+                if info_thread is not None:
+                    info_thread.join(OEMBED_TIMEOUT)
+                output_path = save_markdown(self.output_dir, self.filename_for(self.file_path),
+                                            self.file_path, markdown_content)
+            except worker_process.ConversionCancelled:
+                return
+            except Exception as e:
+                self.signals.failed.emit(self.job_id, format_conversion_error(e), time.perf_counter() - start)
+                return
+        self.signals.completed.emit(self.job_id, output_path, time.perf_counter() - start)
+
+    def cancel(self):
+        """ジョブを取り消す (実行中の場合は変換用の子プロセスを終了させる)"""
+        self.cancelled = True
+        self._cancel_event.set()
+
+
+class YouTubeBulkWorker(QThread):
+    """YouTubeのプレイリスト・チャンネルを動画ごとに保存するワーカースレッド (youtube_bulk)"""
+    video_finished = Signal(str, bool, str, float) # 動画のURL, 成功したか, 保存したファイルのパスまたはエラー, 所要時間 (秒)
+    progress = Signal(int, int) # 完了数, 対象数
+    bulk_finished = Signal(int, int) # 処理した件数, 保存済みのため飛ばした件数
+    bulk_error = Signal(str)
+
+    def __init__(self, sources, output_dir, network, transcript_language, concurrency):
+        super().__init__()
+        self.sources = sources
+        self.output_dir = output_dir
+        self.network = network
+        self.transcript_language = transcript_language
+        self.concurrency = concurrency
+        self._stop_event = threading.Event()
 
     def run(self):
+        import youtube_bulk
+
+        network = self.network
+        bucket = youtube_bulk.TokenBucket(youtube_bulk.DEFAULT_RATE)
         try:
-            # プロキシ設定を環境変数に設定
-            self._setup_proxy()
-            
-            # markitdownに渡すオプションを準備
-            options = {
-                'enable_plugins': self.enable_plugins
-            }
-            # YouTube文字起こしを有効にするためのオプション
-            options['youtube'] = {
-                'include_transcript': True,
-                'transcript_languages': [self.transcript_language or 'ja']
-            }
-            
-            # プロキシ設定があれば、requests_kwargsを設定
-            if self.proxy_settings and self.proxy_settings.get('use_proxy', False):
-                proxy_host = self.proxy_settings.get('proxy_host', '')
-                proxy_port = self.proxy_settings.get('proxy_port', '')
-                
-                if proxy_host and proxy_port:
-                    proxy_url = f"http://{proxy_host}:{proxy_port}"
-                    
-                    # 認証情報の追加
-                    proxy_user = self.proxy_settings.get('proxy_user', '')
-                    proxy_pass = self.proxy_settings.get('proxy_pass', '')
-                    if proxy_user and proxy_pass:
-                        proxy_url = f"http://{proxy_user}:{proxy_pass}@{proxy_host}:{proxy_port}"
-                    
-                    # requestsライブラリの引数として渡すプロキシ設定
-                    requests_kwargs = {
-                        'proxies': {
-                            'http': proxy_url,
-                            'https': proxy_url
-                        }
-                    }
-                    
-                    # SSL検証スキップの設定
-                    if self.proxy_settings.get('skip_ssl_verify', False):
-                        requests_kwargs['verify'] = False
-                        # SSL警告を無効化
-                        import urllib3
-                        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-                    
-                    options['requests_kwargs'] = requests_kwargs
-            
-            # デバッグ情報を追加
-            print(f"\n[DEBUG] 変換オプション: {options}")
-            print(f"[DEBUG] 変換対象: {self.file_path}")
-            
-            # オプション付きでMarkItDownを初期化
-            md = MarkItDown(**options)
-            print("[DEBUG] MarkItDownインスタンス生成成功")
-            
-            # SSL検証をスキップする場合、内部セッションに直接設定
-            if self.proxy_settings and self.proxy_settings.get('use_proxy', False) and self.proxy_settings.get('skip_ssl_verify', False):
-                # 内部のrequestsセッションに直接アクセス
-                if hasattr(md, '_requests_session'):
-                    print("[DEBUG] requestsセッションに直接アクセスしてSSL検証を無効化")
-                    md._requests_session.verify = False
-                    
-                    # プロキシ設定も直接適用
-                    proxy_host = self.proxy_settings.get('proxy_host', '')
-                    proxy_port = self.proxy_settings.get('proxy_port', '')
-                    if proxy_host and proxy_port:
-                        proxy_url = f"http://{proxy_host}:{proxy_port}"
-                        
-                        # 認証情報の追加
-                        proxy_user = self.proxy_settings.get('proxy_user', '')
-                        proxy_pass = self.proxy_settings.get('proxy_pass', '')
-                        if proxy_user and proxy_pass:
-                            proxy_url = f"http://{proxy_user}:{proxy_pass}@{proxy_host}:{proxy_port}"
-                        
-                        md._requests_session.proxies = {
-                            'http': proxy_url,
-                            'https': proxy_url
-                        }
-                        print(f"[DEBUG] プロキシ設定を直接適用: {proxy_url}")
-            
-            result = md.convert(self.file_path)
-            print("[DEBUG] 変換処理成功")
-            
-            if self._is_running:
-                # 元ファイルパスを渡す
-                self.conversion_complete.emit(result.text_content, self.file_path)
+            video_ids = youtube_bulk.collect_video_ids(self.sources, network, bucket)
         except Exception as e:
-            if self._is_running:
-                # 詳細なエラー情報を取得
-                import traceback
-                error_traceback = traceback.format_exc()
-                error_message = f"{str(e)}\n\n--- 詳細エラー情報 ---\n{error_traceback}"
-                print(f"\n[ERROR] 変換エラー: {error_message}")
-                self.conversion_error.emit(error_message)
-        finally:
-            # 環境変数を元に戻す
-            self._cleanup_proxy()
-
-    def _setup_proxy(self):
-        """プロキシ設定を環境変数に設定"""
-        if self.proxy_settings and self.proxy_settings.get('use_proxy', False):
-            proxy_host = self.proxy_settings.get('proxy_host', '')
-            proxy_port = self.proxy_settings.get('proxy_port', '')
-            
-            if proxy_host and proxy_port:
-                proxy_url = f"http://{proxy_host}:{proxy_port}"
-                # 環境変数に設定
-                os.environ['HTTP_PROXY'] = proxy_url
-                os.environ['HTTPS_PROXY'] = proxy_url
-                
-                # プロキシ認証情報がある場合
-                proxy_user = self.proxy_settings.get('proxy_user', '')
-                proxy_pass = self.proxy_settings.get('proxy_pass', '')
-                if proxy_user and proxy_pass:
-                    auth_proxy_url = f"http://{proxy_user}:{proxy_pass}@{proxy_host}:{proxy_port}"
-                    os.environ['HTTP_PROXY'] = auth_proxy_url
-                    os.environ['HTTPS_PROXY'] = auth_proxy_url
-                
-                # SSL証明書の検証をスキップする場合
-                if self.proxy_settings.get('skip_ssl_verify', False):
-                    # SSL証明書の検証をスキップする環境変数を設定
-                    os.environ['PYTHONHTTPSVERIFY'] = '0'
-                    # requestsライブラリの警告を無効化
-                    import urllib3
-                    urllib3.disable_warnings()
-
-    def _cleanup_proxy(self):
-        """環境変数からプロキシ設定を削除"""
-        if 'HTTP_PROXY' in os.environ:
-            del os.environ['HTTP_PROXY']
-        if 'HTTPS_PROXY' in os.environ:
-            del os.environ['HTTPS_PROXY']
-        if 'PYTHONHTTPSVERIFY' in os.environ:
-            del os.environ['PYTHONHTTPSVERIFY']
+            self.bulk_error.emit(format_conversion_error(e))
+            return
+
+        def report(result, done, total):
+            detail = result['output'] if result['success'] else result['error']
+            self.video_finished.emit(result['source'], result['success'], detail, result['elapsed'])
+            self.progress.emit(done, total)
+
+        # 設定の言語の文字起こしがなければ英語、自動生成の順に探す
+        languages = [self.transcript_language or 'ja', 'en']
+        results, skipped = youtube_bulk.ingest(video_ids, self.output_dir, languages, network,
+                                               self.concurrency, progress=report, stop_event=self._stop_event)
+        self.bulk_finished.emit(len(results), skipped)
 
     def stop(self):
-        self._is_running = False
+        """未着手の動画を処理せずに終える (処理中の動画は保存まで行う)"""
+        self._stop_event.set()
+
 
 class SettingsDialog(QDialog):
     """設定ダイアログ"""
@@ -411,6 +451,36 @@ class SettingsDialog(QDialog):
         # デフォルトプラグイン有効状態
         self.default_plugins_checkbox = QCheckBox("デフォルトでプラグインを有効にする")
         general_layout.addRow("", self.default_plugins_checkbox) # ラベルなしで行を追加
+
+        # 変換結果のキャッシュ
+        self.use_cache_checkbox = QCheckBox("変換結果をキャッシュする (同じ内容のファイルは再変換しない)")
+        general_layout.addRow("", self.use_cache_checkbox)
+
+        # 変換キューの同時実行数
+        self.queue_concurrency_spin = QSpinBox()
+        self.queue_concurrency_spin.setRange(1, max(16, os.cpu_count() or 1))
+        general_layout.addRow("変換キューの同時実行数:", self.queue_concurrency_spin)
+        self.conversion_timeout_spin = QSpinBox()
+        self.conversion_timeout_spin.setRange(0, 24 * 60 * 60)
+        self.conversion_timeout_spin.setSuffix(" 秒")
+        self.conversion_timeout_spin.setSpecialValueText("制限なし")
+        self.conversion_timeout_spin.setToolTip("1ファイルの変換にかかる時間の上限。超えた場合は変換を中止して失敗とします")
+        general_layout.addRow("変換の制限時間:", self.conversion_timeout_spin)
+        self.memory_limit_spin = QSpinBox()
+        self.memory_limit_spin.setRange(0, 1024 * 1024)
+        self.memory_limit_spin.setSingleStep(512)
+        self.memory_limit_spin.setSuffix(" MB")
+        self.memory_limit_spin.setSpecialValueText("制限なし")
+        self.memory_limit_spin.setToolTip("変換用の子プロセス1つが使えるメモリの上限。超えた場合はそのファイルの変換を失敗とします")
+        general_layout.addRow("変換のメモリ上限:", self.memory_limit_spin)
+        import worker_process
+        if not worker_process.memory_limit_supported():
+            # 上限を設定できない環境では項目を無効にし、理由を表示する
+            self.memory_limit_spin.setEnabled(False)
+            memory_limit_warning = QLabel("この環境では変換のメモリ上限を設定できません (子プロセスの入れ替えのみ行います)")
+            memory_limit_warning.setWordWrap(True)
+            memory_limit_warning.setStyleSheet("color: #E0A040;")
+            general_layout.addRow("", memory_limit_warning)
         
         layout.addWidget(general_group)
         
@@ -478,6 +548,12 @@ class SettingsDialog(QDialog):
         # 一般設定
         self.default_output_dir_edit.setText(self.settings.value("defaultOutputDir", ""))
         self.default_plugins_checkbox.setChecked(self.settings.value("defaultPluginsEnabled", False, type=bool))
+        self.use_cache_checkbox.setChecked(self.settings.value("useConversionCache", True, type=bool))
+        self.queue_concurrency_spin.setValue(
+            self.settings.value("queueConcurrency", DEFAULT_QUEUE_CONCURRENCY, type=int))
+        self.conversion_timeout_spin.setValue(self.settings.value("conversionTimeout", 0, type=int))
+        self.memory_limit_spin.setValue(
+            self.settings.value("workerMemoryLimit", DEFAULT_WORKER_MEMORY_LIMIT_MB, type=int))
         
         # プロキシ設定
         self.use_proxy_checkbox.setChecked(self.settings.value("useProxy", False, type=bool))
@@ -518,6 +594,10 @@ class SettingsDialog(QDialog):
         # 一般設定
         self.settings.setValue("defaultOutputDir", self.default_output_dir_edit.text())
         self.settings.setValue("defaultPluginsEnabled", self.default_plugins_checkbox.isChecked())
+        self.settings.setValue("useConversionCache", self.use_cache_checkbox.isChecked())
+        self.settings.setValue("queueConcurrency", self.queue_concurrency_spin.value())
+        self.settings.setValue("conversionTimeout", self.conversion_timeout_spin.value())
+        self.settings.setValue("workerMemoryLimit", self.memory_limit_spin.value())
         
         # プロキシ設定
         self.settings.setValue("useProxy", self.use_proxy_checkbox.isChecked())
@@ -540,6 +620,10 @@ class MarkItDownApp(QMainWindow):
         
         # ファイル変換ワーカー
         self.worker = None
+        # 重い依存関係の読み込みはウィンドウが表示されてから行う
+        self._startup_done = False
+        # 変換結果のキャッシュ (ワーカー間で共有する。最初の変換で開く)
+        self.conversion_cache = None
 
         self.settings = QSettings("MyCompany", "MarkItDownApp") # アプリケーション設定
 
@@ -548,6 +632,12 @@ class MarkItDownApp(QMainWindow):
         self.layout = QVBoxLayout(self.central_widget)
 
         self.worker = None
+        self.bulk_worker = None # YouTubeの一括変換
+
+        # 変換キュー (複数のファイル・URLを設定した数まで同時に変換する)
+        self.queue_pool = QThreadPool(self)
+        self.queue_jobs = {} # job_id -> ジョブの状態 (job, source, state, output, error, 表の行のアイテム)
+        self._next_job_id = 1
 
         self._init_menu() # メニューバー初期化
         self._init_ui()
@@ -628,14 +718,57 @@ class MarkItDownApp(QMainWindow):
         self.convert_button.clicked.connect(self._start_conversion)
         options_layout.addWidget(self.convert_button)
 
+        # --- 変換キューセクション ---
+        queue_group = QGroupBox("変換キュー (自動生成したファイル名で保存先フォルダに保存)")
+        queue_layout = QVBoxLayout(queue_group)
+        self.queue_table = QTableWidget(0, 4)
+        self.queue_table.setHorizontalHeaderLabels(["ファイル / URL", "状態", "時間", "保存先"])
+        self.queue_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.queue_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
+        self.queue_table.verticalHeader().setVisible(False)
+        self.queue_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.queue_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.queue_table.setMaximumHeight(180)
+        # ダブルクリックで保存したファイルのプレビュー (失敗した項目はエラー情報) を表示
+        self.queue_table.cellDoubleClicked.connect(self._show_queue_item)
+        queue_layout.addWidget(self.queue_table)
+
+        queue_buttons_layout = QHBoxLayout()
+        add_files_button = QPushButton("ファイルを追加...")
+        add_files_button.clicked.connect(self._add_files_to_queue)
+        queue_buttons_layout.addWidget(add_files_button)
+        add_input_button = QPushButton("入力欄の項目を追加")
+        add_input_button.clicked.connect(self._add_input_to_queue)
+        queue_buttons_layout.addWidget(add_input_button)
+        cancel_pending_button = QPushButton("未完了の項目を取り消し")
+        cancel_pending_button.clicked.connect(self._cancel_pending_jobs)
+        queue_buttons_layout.addWidget(cancel_pending_button)
+        self.youtube_bulk_button = QPushButton("YouTube一括変換...")
+        self.youtube_bulk_button.setToolTip("プレイリスト・チャンネルの動画を1本ずつMarkdownにして保存先フォルダに保存します")
+        self.youtube_bulk_button.clicked.connect(self._toggle_youtube_bulk)
+        queue_buttons_layout.addWidget(self.youtube_bulk_button)
+        clear_finished_button = QPushButton("終了した項目をクリア")
+        clear_finished_button.clicked.connect(self._clear_finished_jobs)
+        queue_buttons_layout.addWidget(clear_finished_button)
+        queue_buttons_layout.addStretch()
+        self.queue_status_label = QLabel()
+        queue_buttons_layout.addWidget(self.queue_status_label)
+        queue_layout.addLayout(queue_buttons_layout)
+        self.layout.addWidget(queue_group)
+
         # --- プレビューセクション ---
         preview_label = QLabel("Markdown プレビュー:")
         self.layout.addWidget(preview_label)
-        self.preview_text = QTextEdit()
-        self.preview_text.setReadOnly(True)
+        # 大きな変換結果でも固まらないように、表示する部分だけを少しずつ読み込む
+        from markdown_preview import ChunkedPreview
+        self.preview_text = ChunkedPreview()
         self.preview_text.setFont(QFont("Courier New", 10))
         self.preview_text.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.layout.addWidget(self.preview_text)
+        self.preview_status_label = QLabel()
+        self.preview_status_label.setVisible(False)
+        self.preview_text.status_changed.connect(self._on_preview_status_changed)
+        self.layout.addWidget(self.preview_status_label)
 
         # --- ステータスバー ---
         self.setStatusBar(QStatusBar(self))
@@ -648,6 +781,15 @@ class MarkItDownApp(QMainWindow):
         # デフォルトのプラグイン状態を設定
         default_plugins_enabled = self.settings.value("defaultPluginsEnabled", False, type=bool)
         self.plugins_checkbox.setChecked(default_plugins_enabled)
+
+        # 変換キューの同時実行数
+        self.queue_pool.setMaxThreadCount(
+            max(1, self.settings.value("queueConcurrency", DEFAULT_QUEUE_CONCURRENCY, type=int)))
+        
+        # 変換用の子プロセスのメモリの上限 (起動時はウィンドウの表示後に _finish_startup で反映する)
+        self.worker_memory_limit = self.settings.value("workerMemoryLimit", DEFAULT_WORKER_MEMORY_LIMIT_MB, type=int)
+        if self._startup_done:
+            apply_worker_memory_limit(self.worker_memory_limit)
         
         # デフォルト出力ディレクトリが設定されていれば出力パスに反映
         default_output_dir = self.settings.value("defaultOutputDir", "")
@@ -660,6 +802,44 @@ class MarkItDownApp(QMainWindow):
         self.save_output_checkbox.setChecked(False) # 常に最初はオフ
         self._toggle_output_controls() # チェックボックスの状態に合わせて更新
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._startup_done:
+            self._startup_done = True
+            # ウィンドウの描画が終わってから重い依存関係を読み込む
+            QTimer.singleShot(0, self._finish_startup)
+
+    def _finish_startup(self):
+        """変換用の子プロセスをバックグラウンドで起動し、markitdown などを読み込ませておく"""
+        threading.Thread(target=self._start_worker_pool, args=(self.worker_memory_limit,),
+                         name="markitdown-startup", daemon=True).start()
+
+    def _start_worker_pool(self, memory_limit):
+        """変換に使うモジュールを読み込み、設定したメモリの上限で子プロセスを起動する (バックグラウンドで呼ばれる)"""
+        from conversion_tasks import default_worker_pool
+
+        apply_worker_memory_limit(memory_limit)
+        default_worker_pool().prestart()
+
+    def _conversion_cache(self):
+        """設定でキャッシュを使う場合は変換結果のキャッシュ (最初に呼ばれたときに開く)、使わない場合はNone"""
+        if not self.settings.value("useConversionCache", True, type=bool):
+            return None
+        if self.conversion_cache is None:
+            from disk_cache import ConversionCache, default_cache_dir
+            self.conversion_cache = ConversionCache(default_cache_dir('conversions'))
+        return self.conversion_cache
+
+    def _conversion_timeout(self):
+        """設定された変換の制限時間 (秒)。制限しない場合はNone"""
+        timeout = self.settings.value("conversionTimeout", 0, type=int)
+        return timeout if timeout > 0 else None
+
+    def _network_config(self):
+        """現在のプロキシ設定から変換に使うネットワーク設定を作る"""
+        from conversion_tasks import build_network_config
+        return build_network_config(self._get_proxy_settings())
+
     def _get_proxy_settings(self):
         """現在のプロキシ設定を辞書として取得"""
         use_proxy = self.settings.value("useProxy", False, type=bool)
@@ -746,6 +926,12 @@ class MarkItDownApp(QMainWindow):
             self.settings.setValue("defaultOutputDir", dir_path)
 
     def _start_conversion(self):
+        if self.worker and self.worker.isRunning():
+            # 変換中はボタンで変換を取り消す
+            self.worker.stop()
+            self.statusBar().showMessage("変換を取り消しました")
+            return
+
         input_path = self.file_path_edit.text()
         if not input_path:
             QMessageBox.warning(self, "エラー", "変換するファイルまたはURLを入力してください。")
@@ -754,12 +940,7 @@ class MarkItDownApp(QMainWindow):
         # ファイルの存在チェックは削除 (URLの場合に失敗するため)
         # markitdownライブラリ側でエラーハンドリングされることを期待
 
-        if self.worker and self.worker.isRunning():
-            QMessageBox.warning(self, "情報", "現在、別の変換処理が実行中です。")
-            return
-
-        self.convert_button.setEnabled(False)
-        self.convert_button.setText("変換中...")
+        self.convert_button.setText("変換を中止")
 
         # URLかファイルかを判断してステータスメッセージを変更
         is_url = input_path.startswith(('http://', 'https://'))
@@ -773,12 +954,14 @@ class MarkItDownApp(QMainWindow):
         enable_plugins = self.plugins_checkbox.isChecked()
         include_transcript = self.settings.value("includeTranscript", False, type=bool)
 
-        # プロキシ設定を取得
-        proxy_settings = self._get_proxy_settings()
+        # プロキシ設定を取得 (この変換だけに使うネットワーク設定にする)
+        network = self._network_config()
 
         # include_transcript を渡す必要があるため、enable_pluginsがTrueの時に有効化
         transcript_language = self.language_dropdown.currentData()
-        self.worker = ConversionWorker(input_path, enable_plugins, proxy_settings, transcript_language)
+        cache = self._conversion_cache()
+        self.worker = ConversionWorker(input_path, enable_plugins, network, transcript_language, cache,
+                                       self._conversion_timeout())
         self.worker.include_transcript = include_transcript
 
         # シグナルの接続
@@ -791,6 +974,7 @@ class MarkItDownApp(QMainWindow):
         """
         元のファイルパスを基に自動的にファイル名を生成する
         YouTubeの場合：日付_チャンネル名_動画タイトル.md
+        (動画情報を取得できなかった場合：日付_youtube_動画ID.md)
         その他のファイル：日付_元ファイル名.md
         """
         today = datetime.datetime.now().strftime("%Y-%m-%d")
@@ -801,13 +985,10 @@ class MarkItDownApp(QMainWindow):
             video_id_match = re.search(r'(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})', original_source)
             if video_id_match:
                 video_id = video_id_match.group(1)
-                video_info = get_youtube_info(video_id)
-
-                # ファイル名に使えない文字を置換
-                channel = re.sub(r'[\\/:*?"<>|]', '_', video_info['channel'])
-                title = re.sub(r'[\\/:*?"<>|]', '_', video_info['title'])
-
-                return f"{today}_{channel}_{title}.md"
+                # 動画情報はワーカーが変換中に取得済みのため、ここではキャッシュだけを参照する
+                # (UIスレッドでネットワークを待たない)
+                video_info = get_youtube_info(video_id, cached_only=True)
+                return youtube_filename(video_id, video_info, today)
 
         # それ以外のファイルの場合
         base_name = os.path.basename(original_source)
@@ -838,50 +1019,22 @@ class MarkItDownApp(QMainWindow):
         return None
 
     def _on_conversion_complete(self, markdown_content, original_source):
-        # 元ファイルパスを追加 (Markdownコメント形式)
-        file_path_comment = f"<!-- Original Source: {original_source} -->\n\n"
-        full_markdown = file_path_comment + markdown_content
+        conversion_id = getattr(self.sender(), 'conversion_id', None)
+        with instrumentation.context(conversion_id=conversion_id, source=original_source):
+            self._show_and_save(markdown_content, original_source)
+
+    def _show_and_save(self, markdown_content, original_source):
+        with instrumentation.span('postprocess', chars=len(markdown_content)):
+            # 元ファイルパスを追加 (Markdownコメント形式)
+            # 大きな変換結果をコピーしないように、コメントと本文は連結せずに扱う
+            file_path_comment = f"<!-- Original Source: {original_source} -->\n\n"
 
-        self.preview_text.setPlainText(full_markdown) # プレビューも更新
+            self.preview_text.set_texts(file_path_comment, markdown_content) # プレビューも更新
         self.statusBar().showMessage("変換完了")
 
         if self.save_output_checkbox.isChecked():
             try:
-                # 出力ディレクトリを決定
-                # まず設定からデフォルトディレクトリを取得
-                default_dir = self.settings.value("defaultOutputDir", "")
-                
-                # 出力パスが指定されているかチェック
-                output_path = self.output_path_edit.text().strip()
-                
-                if output_path:
-                    # 出力パスが指定されている場合はそのディレクトリを使用
-                    try:
-                        output_dir = os.path.dirname(output_path)
-                        # ディレクトリが空（ファイル名のみ指定）の場合はデフォルトディレクトリを使用
-                        if not output_dir:
-                            if default_dir and os.path.isdir(default_dir):
-                                output_dir = default_dir
-                            else:
-                                output_dir = os.getcwd()
-                    except:
-                        # エラーが発生した場合はデフォルトディレクトリを使用
-                        if default_dir and os.path.isdir(default_dir):
-                            output_dir = default_dir
-                        else:
-                            # デフォルトディレクトリが設定されていない場合はデスクトップを使用
-                            output_dir = os.path.join(os.path.expanduser("~"), "Desktop")
-                else:
-                    # 出力パスが指定されていない場合はデフォルトディレクトリを使用
-                    if default_dir and os.path.isdir(default_dir):
-                        output_dir = default_dir
-                    else:
-                        # デフォルトディレクトリが設定されていない場合はデスクトップを使用
-                        output_dir = os.path.join(os.path.expanduser("~"), "Desktop")
-
-                # ディレクトリが存在しない場合は作成
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
+                output_dir = self._resolve_output_dir()
 
                 # ファイル名を自動生成
                 suggested_filename = self._generate_filename(original_source)
@@ -891,8 +1044,10 @@ class MarkItDownApp(QMainWindow):
 
                 if confirmed_path:
                     # 保存する内容もフルパスコメント付きにする
-                    with open(confirmed_path, 'w', encoding='utf-8') as f:
-                        f.write(full_markdown)
+                    with instrumentation.span('write', target=confirmed_path), \
+                            open(confirmed_path, 'w', encoding='utf-8') as f:
+                        f.write(file_path_comment)
+                        f.write(markdown_content)
                     self.statusBar().showMessage(f"変換完了: 結果を {os.path.basename(confirmed_path)} に保存しました")
                     # 保存先を更新
                     self.output_path_edit.setText(confirmed_path)
@@ -905,6 +1060,39 @@ class MarkItDownApp(QMainWindow):
         else:
             self.statusBar().showMessage("変換完了 (プレビューのみ)")
 
+    def _resolve_output_dir(self):
+        """保存先フォルダを決定し、存在しない場合は作成する"""
+        # まず設定からデフォルトディレクトリを取得
+        default_dir = self.settings.value("defaultOutputDir", "")
+        
+        # 出力パスが指定されているかチェック
+        output_path = self.output_path_edit.text().strip()
+        
+        if output_path and os.path.isdir(output_path):
+            # 保存先フォルダが選択されている場合
+            output_dir = output_path
+        elif output_path:
+            # 出力パスが指定されている場合はそのディレクトリを使用
+            output_dir = os.path.dirname(output_path)
+            # ディレクトリが空（ファイル名のみ指定）の場合はデフォルトディレクトリを使用
+            if not output_dir:
+                if default_dir and os.path.isdir(default_dir):
+                    output_dir = default_dir
+                else:
+                    output_dir = os.getcwd()
+        else:
+            # 出力パスが指定されていない場合はデフォルトディレクトリを使用
+            if default_dir and os.path.isdir(default_dir):
+                output_dir = default_dir
+            else:
+                # デフォルトディレクトリが設定されていない場合はデスクトップを使用
+                output_dir = os.path.join(os.path.expanduser("~"), "Desktop")
+
+        # ディレクトリが存在しない場合は作成
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        return output_dir
+
     def _on_conversion_error(self, error_message):
         # 詳細なエラー情報を表示するダイアログ
         error_dialog = QDialog(self)
@@ -950,35 +1138,248 @@ class MarkItDownApp(QMainWindow):
         self.convert_button.setText("変換開始")
         self.worker = None
 
+    def _add_files_to_queue(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "変換するファイルを選択")
+        if file_paths:
+            self._enqueue(file_paths)
+
+    def _add_input_to_queue(self):
+        input_path = self.file_path_edit.text().strip()
+        if not input_path:
+            QMessageBox.warning(self, "エラー", "変換するファイルまたはURLを入力してください。")
+            return
+        self._enqueue([input_path])
+        self.file_path_edit.clear()
+
+    def _enqueue(self, sources):
+        """ファイル・URLを変換キューに追加する (現在の設定で変換し、保存先フォルダに自動保存する)"""
+        try:
+            output_dir = self._resolve_output_dir()
+        except OSError as e:
+            QMessageBox.critical(self, "保存エラー", f"保存先フォルダを作成できません: {e}")
+            return
+
+        enable_plugins = self.plugins_checkbox.isChecked()
+        network = self._network_config()
+        transcript_language = self.language_dropdown.currentData()
+        cache = self._conversion_cache()
+
+        for source in sources:
+            job_id = self._next_job_id
+            self._next_job_id += 1
+            job = QueueJob(job_id, source, enable_plugins, network, transcript_language, cache,
+                           output_dir, self._generate_filename, self._conversion_timeout())
+            job.signals.started.connect(self._on_queue_job_started)
+            job.signals.completed.connect(self._on_queue_job_completed)
+            job.signals.failed.connect(self._on_queue_job_failed)
+
+            row = self.queue_table.rowCount()
+            self.queue_table.insertRow(row)
+            items = [QTableWidgetItem(source), QTableWidgetItem("待機中"), QTableWidgetItem(""), QTableWidgetItem("")]
+            items[0].setToolTip(source)
+            for column, item in enumerate(items):
+                self.queue_table.setItem(row, column, item)
+
+            self.queue_jobs[job_id] = {
+                'job': job,
+                'source': source,
+                'state': 'pending',
+                'output': None,
+                'error': None,
+                'items': items,
+            }
+            self.queue_pool.start(job)
+        self._update_queue_status()
+
+    def _toggle_youtube_bulk(self):
+        """YouTubeの一括変換を開始する (実行中の場合は中止する)"""
+        if self.bulk_worker is not None:
+            self.bulk_worker.stop()
+            self.youtube_bulk_button.setEnabled(False)
+            self.statusBar().showMessage("YouTube一括変換: 処理中の動画の保存を待っています...")
+            return
+
+        source, ok = QInputDialog.getText(
+            self, "YouTube一括変換",
+            "プレイリスト・チャンネルのURL、または動画のURL/IDを1行ずつ書いたファイルのパス:",
+            text=self.file_path_edit.text().strip())
+        source = source.strip()
+        if not ok or not source:
+            return
+        try:
+            output_dir = self._resolve_output_dir()
+        except OSError as e:
+            QMessageBox.critical(self, "保存エラー", f"保存先フォルダを作成できません: {e}")
+            return
+
+        self.bulk_worker = YouTubeBulkWorker(
+            [source], output_dir, self._network_config(),
+            self.language_dropdown.currentData(), self.queue_pool.maxThreadCount())
+        self.bulk_worker.video_finished.connect(self._on_bulk_video_finished)
+        self.bulk_worker.progress.connect(
+            lambda done, total: self.statusBar().showMessage(f"YouTube一括変換: {done} / {total} 件"))
+        self.bulk_worker.bulk_finished.connect(self._on_bulk_finished)
+        self.bulk_worker.bulk_error.connect(self._on_conversion_error)
+        self.bulk_worker.finished.connect(self._on_bulk_worker_finished)
+        self.youtube_bulk_button.setText("一括変換を中止")
+        self.statusBar().showMessage("YouTube一括変換: 動画の一覧を取得しています...")
+        self.bulk_worker.start()
+
+    def _on_bulk_video_finished(self, source, success, detail, elapsed):
+        """一括変換で処理した動画を変換キューの表に追加する"""
+        job_id = self._next_job_id
+        self._next_job_id += 1
+        row = self.queue_table.rowCount()
+        self.queue_table.insertRow(row)
+        items = [QTableWidgetItem(source), QTableWidgetItem(""), QTableWidgetItem(""), QTableWidgetItem("")]
+        items[0].setToolTip(source)
+        for column, item in enumerate(items):
+            self.queue_table.setItem(row, column, item)
+        self.queue_jobs[job_id] = {
+            'job': None,
+            'source': source,
+            'state': 'running',
+            'output': None,
+            'error': None,
+            'items': items,
+        }
+        if success:
+            self._on_queue_job_completed(job_id, detail, elapsed)
+        else:
+            self._on_queue_job_failed(job_id, detail, elapsed)
+
+    def _on_bulk_finished(self, processed, skipped):
+        message = f"YouTube一括変換: {processed} 件を処理しました"
+        if skipped:
+            message += f" (保存済みの {skipped} 件を除く)"
+        self.statusBar().showMessage(message)
+
+    def _on_bulk_worker_finished(self):
+        self.bulk_worker = None
+        self.youtube_bulk_button.setText("YouTube一括変換...")
+        self.youtube_bulk_button.setEnabled(True)
+
+    def _set_queue_state(self, job_id, state, label, elapsed=None):
+        entry = self.queue_jobs.get(job_id)
+        if entry is None:
+            return None
+        entry['state'] = state
+        entry['items'][1].setText(label)
+        if elapsed is not None:
+            entry['items'][2].setText(f"{elapsed:.1f} 秒")
+        self._update_queue_status()
+        return entry
+
+    def _on_queue_job_started(self, job_id):
+        self._set_queue_state(job_id, 'running', "変換中")
+
+    def _on_queue_job_completed(self, job_id, output_path, elapsed):
+        entry = self._set_queue_state(job_id, 'done', "完了", elapsed)
+        if entry is not None:
+            entry['output'] = output_path
+            entry['items'][3].setText(output_path)
+            entry['items'][3].setToolTip(output_path)
+
+    def _on_queue_job_failed(self, job_id, error_message, elapsed):
+        entry = self._set_queue_state(job_id, 'failed', "失敗", elapsed)
+        if entry is not None:
+            entry['error'] = error_message
+            entry['items'][1].setToolTip(error_message.splitlines()[0] if error_message else "")
+
+    def _cancel_pending_jobs(self):
+        """待機中と変換中のジョブを取り消す (変換中のジョブは変換用の子プロセスを終了させる)"""
+        for job_id, entry in self.queue_jobs.items():
+            if entry['state'] in ('pending', 'running') and entry['job'] is not None:
+                entry['job'].cancel()
+                self._set_queue_state(job_id, 'cancelled', "取り消し")
+
+    def _clear_finished_jobs(self):
+        """完了・失敗・取り消しの項目を表から削除する"""
+        for job_id in [k for k, e in self.queue_jobs.items() if e['state'] in ('done', 'failed', 'cancelled')]:
+            entry = self.queue_jobs.pop(job_id)
+            self.queue_table.removeRow(self.queue_table.row(entry['items'][0]))
+        self._update_queue_status()
+
+    def _update_queue_status(self):
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0, 'cancelled': 0}
+        for entry in self.queue_jobs.values():
+            counts[entry['state']] += 1
+        self.queue_status_label.setText(
+            f"待機 {counts['pending']} / 変換中 {counts['running']} / 完了 {counts['done']} / 失敗 {counts['failed']}"
+        )
+        if counts['pending'] or counts['running']:
+            self.statusBar().showMessage(f"変換キュー: 残り {counts['pending'] + counts['running']} 件")
+
+    def _show_queue_item(self, row, column):
+        """キューの項目をダブルクリックしたときに保存したファイルまたはエラー情報を表示する"""
+        entry = next((e for e in self.queue_jobs.values() if self.queue_table.row(e['items'][0]) == row), None)
+        if entry is None:
+            return
+        if entry['state'] == 'failed':
+            self._on_conversion_error(entry['error'])
+        elif entry['state'] == 'done':
+            try:
+                self.preview_text.load_file(entry['output'])
+            except OSError as e:
+                QMessageBox.warning(self, "エラー", f"ファイルを開けません: {e}")
+
+    def _on_preview_status_changed(self, message):
+        self.preview_status_label.setText(message)
+        self.preview_status_label.setVisible(bool(message))
+
+    def _has_active_jobs(self):
+        return any(e['state'] in ('pending', 'running') for e in self.queue_jobs.values())
+
     def dragEnterEvent(self, event):
         mime_data = event.mimeData()
-        if mime_data.hasUrls() and len(mime_data.urls()) == 1:
-            url = mime_data.urls()[0]
-            if url.isLocalFile():
-                event.acceptProposedAction()
+        if mime_data.hasUrls() and self._dropped_sources(mime_data):
+            event.acceptProposedAction()
 
     def dropEvent(self, event):
-        mime_data = event.mimeData()
-        if mime_data.hasUrls():
-            url = mime_data.urls()[0]
+        sources = self._dropped_sources(event.mimeData())
+        if not sources:
+            return
+        if len(sources) == 1:
+            # 1件の場合は従来どおり入力欄に設定する
+            self._set_input_file(sources[0])
+        else:
+            # 複数の場合は変換キューに追加する
+            self._enqueue(sources)
+        event.acceptProposedAction()
+
+    def _dropped_sources(self, mime_data):
+        """ドロップされたローカルファイルとhttp(s)のURL"""
+        sources = []
+        for url in mime_data.urls():
             if url.isLocalFile():
-                file_path = url.toLocalFile()
-                self._set_input_file(file_path)
-                event.acceptProposedAction()
+                sources.append(url.toLocalFile())
+            elif url.scheme() in ('http', 'https'):
+                sources.append(url.toString())
+        return sources
 
     def closeEvent(self, event):
-        if self.worker and self.worker.isRunning():
+        if (self.worker and self.worker.isRunning()) or self._has_active_jobs() or self.bulk_worker is not None:
             reply = QMessageBox.question(self, '確認',
                                            "変換処理が実行中です。中断しますか？",
                                            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                                            QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
-                self.worker.stop()
-                self.worker.wait()
+                if self.worker:
+                    self.worker.stop()
+                    self.worker.wait()
+                if self.bulk_worker is not None:
+                    self.bulk_worker.stop()
+                    self.bulk_worker.wait()
+                # ジョブを取り消し (変換中のものは子プロセスを終了させる)、スレッドの終了を待つ
+                self._cancel_pending_jobs()
+                self.queue_pool.clear()
+                self.queue_pool.waitForDone()
+                close_worker_pool()
                 event.accept()
             else:
                 event.ignore()
         else:
+            close_worker_pool()
             event.accept()
 
 
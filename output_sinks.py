@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+バッチ変換の出力先 (シンク)
+
+デフォルトでは入力ごとに .md ファイルを書く (ワーカーが直接書き込むため、このモジュールは使わない)。
+ファイル数が多い場合やネットワーク上のストレージでは、ファイルごとの作成 (ディレクトリの作成、open、write) が
+遅く、inodeも消費するため、変換結果を1つのファイルにまとめて書き込むシンクを選べる。
+
+- jsonl: 1行1文書のJSON Lines
+- sqlite: 1行1文書のSQLiteデータベース (まとめてトランザクションで挿入する)
+- tar / zip: 文書ごとに .md のメンバーを持つアーカイブ
+
+変換結果は親プロセスが受け取ってシンクに書き込む。書き込みはバッファしてまとめて行う。
+jsonl、tar、zip は一時ファイルに書いてから閉じるときに名前を付ける
+(中断した場合も、それまでに書き込んだ文書は残る)。
+"""
+
+import io
+import os
+import abc
+import json
+import time
+import datetime
+
+# デフォルトのシンク (入力ごとに .md ファイル)
+DEFAULT_SINK = 'files'
+SINKS = ('files', 'jsonl', 'sqlite', 'tar', 'zip')
+# 書き込みバッファのサイズ
+WRITE_BUFFER_BYTES = 1024 * 1024
+# SQLiteで1つのトランザクションにまとめる文書の数
+SQLITE_BATCH_ROWS = 500
+
+
+def document_record(name, source, text, elapsed=None, duplicate_of=None):
+    """
+    シンクに書き込む1文書分のレコードを作る
+
+    Args:
+        name (str): シンク内の文書の名前 (出力ツリー上の相対パス、"/" 区切り)
+        source (str): 入力ファイルのパス
+        text (str): 変換したMarkdown
+        elapsed (float, optional): 変換にかかった時間 (秒)
+        duplicate_of (str, optional): 内容が同じで変換を省略した場合の、変換した入力のパス
+    """
+    try:
+        stat = os.stat(source)
+        size, mtime = stat.st_size, stat.st_mtime
+    except OSError:
+        size, mtime = None, None
+    return {
+        'name': name,
+        'source': source,
+        'size': size,
+        'mtime': mtime,
+        'chars': len(text),
+        'elapsed_ms': round(elapsed * 1000, 1) if elapsed is not None else None,
+        'converted_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'duplicate_of': duplicate_of,
+        'text': text,
+    }
+
+
+class OutputSink(abc.ABC):
+    """
+    シンクの基底クラス (with文で使い、抜けるときに閉じる)
+
+    サブクラスは _write(record) と _close() を実装する。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, record):
+        """1文書を書き込む (document_record() で作ったレコード)"""
+        self._write(record)
+        self.count += 1
+
+    def close(self):
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @abc.abstractmethod
+    def _write(self, record):
+        """1文書を書き込む (バッファしてよい)"""
+
+    @abc.abstractmethod
+    def _close(self):
+        """残りを書き込んで閉じる (2回以上呼ばれても何もしない)"""
+
+
+class _TempFileSink(OutputSink):
+    """一時ファイル (path + '.tmp') に書き込み、閉じるときに path に置き換えるシンク"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.tmp_path = path + '.tmp'
+        self._file = open(self.tmp_path, 'wb', buffering=WRITE_BUFFER_BYTES)
+
+    def _close(self):
+        if self._file is None:
+            return
+        self._finish()
+        self._file.close()
+        self._file = None
+        os.replace(self.tmp_path, self.path)
+
+    def _finish(self):
+        """ファイルを閉じる前の処理 (アーカイブの終端の書き込みなど)"""
+
+
+class JsonlSink(_TempFileSink):
+    """1行1文書のJSON Lines"""
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        self._file.write(b'\n')
+
+
+class TarSink(_TempFileSink):
+    """文書ごとに .md のメンバーを持つtarアーカイブ (.tar.gz / .tgz の場合はgzipで圧縮する)"""
+
+    def __init__(self, path):
+        import tarfile
+        super().__init__(path)
+        compressed = path.lower().endswith(('.tar.gz', '.tgz'))
+        self._tar = tarfile.open(fileobj=self._file, mode='w:gz' if compressed else 'w',
+                                 format=tarfile.PAX_FORMAT)
+
+    def _write(self, record):
+        import tarfile
+        data = record['text'].encode('utf-8')
+        info = tarfile.TarInfo(record['name'])
+        info.size = len(data)
+        info.mtime = time.time()
+        info.mode = 0o644
+        self._tar.addfile(info, io.BytesIO(data))
+
+    def _finish(self):
+        self._tar.close()
+
+
+class ZipSink(_TempFileSink):
+    """文書ごとに .md のメンバーを持つZIPアーカイブ (Deflateで圧縮する)"""
+
+    def __init__(self, path):
+        import zipfile
+        super().__init__(path)
+        self._zip = zipfile.ZipFile(self._file, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def _write(self, record):
+        import zipfile
+        info = zipfile.ZipInfo(record['name'], time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(info, record['text'].encode('utf-8'))
+
+    def _finish(self):
+        self._zip.close()
+
+
+class SqliteSink(OutputSink):
+    """
+    1行1文書のSQLiteデータベース (テーブル documents、name が主キー)
+
+    既存のデータベースには追記し、同じ名前の文書は置き換える。
+    SQLITE_BATCH_ROWS 件ごとに1つのトランザクションでまとめて挿入する。
+    """
+
+    COLUMNS = ('name', 'source', 'size', 'mtime', 'chars', 'elapsed_ms', 'converted_at', 'duplicate_of', 'text')
+
+    def __init__(self, path):
+        import sqlite3
+        super().__init__(path)
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS documents ('
+            'name TEXT PRIMARY KEY, source TEXT, size INTEGER, mtime REAL, chars INTEGER, '
+            'elapsed_ms REAL, converted_at TEXT, duplicate_of TEXT, text TEXT)')
+        self._db.commit()
+        self._pending = []
+
+    def _write(self, record):
+        self._pending.append(tuple(record[column] for column in self.COLUMNS))
+        if len(self._pending) >= SQLITE_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO documents ({', '.join(self.COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(self.COLUMNS))})", self._pending)
+        self._pending = []
+
+    def _close(self):
+        if self._db is None:
+            return
+        self._flush()
+        self._db.close()
+        self._db = None
+
+
+_SINK_CLASSES = {
+    'jsonl': JsonlSink,
+    'sqlite': SqliteSink,
+    'tar': TarSink,
+    'zip': ZipSink,
+}
+
+
+def open_sink(kind, path):
+    """
+    シンクを開く
+
+    Args:
+        kind (str): シンクの種類 ('jsonl', 'sqlite', 'tar', 'zip')
+        path (str): 書き込むファイルのパス
+
+    Raises:
+        ValueError: 種類が正しくない場合 ('files' はワーカーが直接書き込むため開かない)
+    """
+    if kind not in _SINK_CLASSES:
+        raise ValueError(f"シンクの種類は {', '.join(_SINK_CLASSES)} のいずれかです: {kind}")
+    return _SINK_CLASSES[kind](path)
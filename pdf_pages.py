@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大きなPDFのページ単位の並列変換
+
+PDFをページの範囲に分け、範囲ごとに別のプロセスでテキストを取り出してページ順に結合する。
+MarkItDown (0.1.x) のPDFの変換は pdfminer.high_level.extract_text の結果をそのまま返すため、
+同じ関数をページを指定して呼び、範囲の結果をつなげると1回で変換した場合と同じテキストになる。
+--pages で必要なページだけを取り出すこともできる。
+"""
+
+import os
+import re
+
+# 1つのタスクで変換するページ数の目安 (少なすぎるとプロセス間のやりとりが増え、多すぎると偏る)
+MIN_PAGES_PER_TASK = 4
+# プロセスごとに割り当てるタスク数 (ページによって変換の時間が違うため、細かく分けて偏りを減らす)
+TASKS_PER_JOB = 4
+
+
+def is_pdf(file_path):
+    """拡張子がPDFかどうか"""
+    return os.path.splitext(file_path)[1].lower() == '.pdf'
+
+
+def page_count(file_path):
+    """
+    PDFのページ数 (ページツリーの Count を読むだけで、ページの内容は解析しない)
+    """
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdftypes import resolve1
+
+    with open(file_path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        pages = resolve1(document.catalog.get('Pages'))
+        count = resolve1(pages.get('Count')) if isinstance(pages, dict) else None
+        if isinstance(count, int):
+            return count
+        # Count が壊れている場合はページを数える
+        from pdfminer.pdfpage import PDFPage
+        return sum(1 for _ in PDFPage.create_pages(document))
+
+
+def parse_page_spec(spec, count):
+    """
+    ページの指定 ("1-10,15,20-") を0始まりのページ番号のリストにする (重複は除き、昇順)
+
+    Args:
+        spec (str): 1始まりのページ番号と範囲をカンマで区切った文字列 ("-5" は1〜5、"20-" は20〜最後)
+        count (int): PDFのページ数
+
+    Raises:
+        ValueError: 指定が正しくない場合、またはページが範囲外の場合
+    """
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        m = re.fullmatch(r'(\d*)\s*-\s*(\d*)|(\d+)', part)
+        if not m or part == '-':
+            raise ValueError(f"ページの指定が正しくありません: {part or spec}")
+        if m.group(3):
+            first = last = int(m.group(3))
+        else:
+            first = int(m.group(1)) if m.group(1) else 1
+            last = int(m.group(2)) if m.group(2) else count
+        if first < 1 or last < first or last > count:
+            raise ValueError(f"ページの指定が範囲外です: {part} (全 {count} ページ)")
+        pages.update(range(first - 1, last))
+    return sorted(pages)
+
+
+def split_tasks(pages, jobs):
+    """
+    ページ番号のリストを並列に変換するタスク (ページ番号のリスト) に分ける (ページ順を保つ)
+    """
+    size = max(MIN_PAGES_PER_TASK, -(-len(pages) // max(1, jobs * TASKS_PER_JOB)))
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def extract_pages(file_path, page_numbers):
+    """
+    指定したページのテキストを取り出す (プロセスプールから呼ばれるためモジュールレベルに置く)
+
+    Args:
+        page_numbers (list[int]): 0始まりのページ番号
+    """
+    import pdfminer.high_level
+    return pdfminer.high_level.extract_text(file_path, page_numbers=page_numbers)
+
+
+def convert_pdf(file_path, pages=None, jobs=1):
+    """
+    PDFをページの範囲ごとに並列に変換し、ページ順に結合したテキストを返す
+
+    Args:
+        file_path (str): PDFファイルのパス
+        pages (str, optional): 変換するページの指定 (parse_page_spec)。Noneの場合はすべてのページ
+        jobs (int, optional): 並列に実行するプロセス数
+
+    Returns:
+        str: テキスト (MarkItDownのPDFの変換結果と同じ形式)
+
+    Raises:
+        ValueError: ページの指定が正しくない場合
+    """
+    count = page_count(file_path)
+    page_numbers = parse_page_spec(pages, count) if pages else list(range(count))
+    tasks = split_tasks(page_numbers, jobs)
+    if jobs <= 1 or len(tasks) <= 1:
+        return ''.join(extract_pages(file_path, task) for task in tasks)
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as executor:
+        # map は投入した順に結果を返すので、そのままつなげるとページ順になる
+        return ''.join(executor.map(extract_pages, [file_path] * len(tasks), tasks))
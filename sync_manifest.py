@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+同期モードのマニフェスト
+
+出力ディレクトリに変換済みファイルの一覧 (入力パス、サイズ、更新時刻、内容のハッシュ、
+変換オプション、出力パス) を保存し、次回の同期で変更のないファイルを
+stat呼び出しだけで判定できるようにする。
+"""
+
+import os
+import json
+
+from disk_cache import hash_file
+
+MANIFEST_NAME = '.markitdown-manifest.json'
+MANIFEST_VERSION = 1
+
+
+class SyncManifest:
+    """出力ツリーの横に置く変換済みファイルのマニフェスト"""
+
+    def __init__(self, output_dir, options):
+        """
+        Args:
+            output_dir (str): 出力ディレクトリ
+            options (dict): 変換結果に影響するオプション (異なる場合はすべて再変換する)
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.options = options
+        # 入力ファイルの絶対パス -> エントリ
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != MANIFEST_VERSION:
+            return
+        self.entries = data.get('files', {})
+
+    def save(self):
+        """マニフェストを書き込む (途中で中断しても壊れないように一時ファイル経由で置き換える)"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        data = {'version': MANIFEST_VERSION, 'files': self.entries}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _relative_output(self, output_path):
+        return os.path.relpath(output_path, self.output_dir).replace(os.sep, '/')
+
+    def check(self, source, output_path):
+        """
+        入力ファイルを再変換する必要があるか判定する
+
+        サイズと更新時刻が一致すればstatだけでスキップし、
+        一致しない場合は内容のハッシュを比較する (touchされただけのファイルは再変換しない)。
+
+        Returns:
+            tuple[bool, str | None]: (変換が必要か, 計算した内容のハッシュ。計算していなければNone)
+        """
+        key = os.path.abspath(source)
+        entry = self.entries.get(key)
+        st = os.stat(source)
+        if entry is not None and entry.get('output') != self._relative_output(output_path):
+            # 出力パスが変わった場合 (同名ファイルの追加・削除など) は古い出力を削除する
+            self._remove_output(entry['output'])
+            return True, None
+        if (entry is None
+                or entry.get('options') != self.options
+                or not os.path.exists(output_path)):
+            return True, None
+
+        if entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return False, None
+
+        digest = hash_file(source)
+        if digest != entry['sha256']:
+            return True, digest
+
+        # 内容は同じなので更新時刻だけを記録し直す
+        entry['size'] = st.st_size
+        entry['mtime_ns'] = st.st_mtime_ns
+        return False, digest
+
+    def record(self, source, output_path, digest=None):
+        """変換に成功したファイルをマニフェストに記録する"""
+        st = os.stat(source)
+        self.entries[os.path.abspath(source)] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest or hash_file(source),
+            'options': self.options,
+            'output': self._relative_output(output_path),
+        }
+
+    def forget(self, source):
+        """変換に失敗したファイルをマニフェストから外す (次回の同期で再変換される)"""
+        self.entries.pop(os.path.abspath(source), None)
+
+    def remove_stale(self, current_sources):
+        """
+        入力が削除されたエントリの出力ファイルを削除する
+
+        Args:
+            current_sources (iterable[str]): 現在の入力ファイルのパス
+
+        Returns:
+            list[str]: 削除した出力ファイルのパス
+        """
+        current = {os.path.abspath(source) for source in current_sources}
+        removed = []
+        for key in [k for k in self.entries if k not in current]:
+            entry = self.entries.pop(key)
+            output_path = self._remove_output(entry['output'])
+            if output_path:
+                removed.append(output_path)
+        return removed
+
+    def _remove_output(self, relative_output):
+        """出力ファイルを削除する。削除できた場合はそのパスを返す"""
+        output_path = os.path.join(self.output_dir, *relative_output.split('/'))
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            return None
+        self._remove_empty_dirs(os.path.dirname(output_path))
+        return output_path
+
+    def _remove_empty_dirs(self, dir_path):
+        """出力ディレクトリの中で空になったディレクトリを削除する"""
+        root = os.path.abspath(self.output_dir)
+        dir_path = os.path.abspath(dir_path)
+        while dir_path != root and dir_path.startswith(root + os.sep):
+            try:
+                os.rmdir(dir_path)
+            except OSError:
+                break
+            dir_path = os.path.dirname(dir_path)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+大きな表 (XLSX, CSV, TSV) のストリーミング変換
+
+シート全体を読み込んでからMarkdownの表を1つの文字列として組み立てるのではなく、
+1行ずつ読んでMarkdownの表の行を生成し、そのまま出力に書き込む。
+行数が増えてもメモリの使用量はほぼ一定になる。
+XLSXは openpyxl の読み取り専用モードで読み、シートごとに別のプロセスで並列に変換することもできる。
+出力の形式は MarkItDown のXLSXの変換 (シートごとに "## シート名" と表) に合わせている。
+"""
+
+import os
+import csv
+import random
+import shutil
+import tempfile
+
+XLSX_EXTENSIONS = ('.xlsx', '.xlsm')
+CSV_EXTENSIONS = ('.csv', '.tsv')
+# CSVの区切り文字と文字コードを判定するために読み込むサイズ
+SNIFF_BYTES = 64 * 1024
+# CSVの文字コードの候補 (UTF-8として読めなければ日本語のExcelが書き出すShift_JISとみなす)
+CSV_ENCODINGS = ('utf-8-sig', 'cp932')
+# 出力にまとめて書き込む行数
+WRITE_BATCH_ROWS = 256
+
+
+def can_stream(file_path):
+    """ストリーミングで変換できる形式かどうか"""
+    return os.path.splitext(file_path)[1].lower() in XLSX_EXTENSIONS + CSV_EXTENSIONS
+
+
+def _cell(value):
+    """セルの値をMarkdownの表のセルの文字列にする"""
+    if value is None:
+        return ''
+    text = str(value)
+    return text.replace('|', '\\|').replace('\r\n', ' ').replace('\n', ' ').strip()
+
+
+def _limit_rows(rows, max_rows=None, sample=None, seed=0):
+    """
+    行を max_rows 行まで (先頭から) に、または sample 行 (全体から無作為に選び、元の順序) に絞る
+
+    Yields:
+        list: 行。行を省略した場合は最後に None
+    """
+    if sample is not None:
+        # リザーバーサンプリング (保持するのは sample 行だけ)
+        rng = random.Random(seed)
+        reservoir = []
+        total = 0
+        for row in rows:
+            if len(reservoir) < sample:
+                reservoir.append((total, row))
+            else:
+                j = rng.randrange(total + 1)
+                if j < sample:
+                    reservoir[j] = (total, row)
+            total += 1
+        reservoir.sort(key=lambda item: item[0])
+        yield from (row for _, row in reservoir)
+        if total > sample:
+            yield None
+        return
+    for i, row in enumerate(rows):
+        if max_rows is not None and i >= max_rows:
+            yield None
+            return
+        yield row
+
+
+def _row_width(row):
+    """行の最後の空でないセルまでの列数"""
+    for i in range(len(row) - 1, -1, -1):
+        if row[i] not in (None, ''):
+            return i + 1
+    return 0
+
+
+def table_width(rows, max_rows=None, sample=None):
+    """
+    表の列数 (見出しと出力するデータ行のうち、最後の空でないセルまでの最大の列数)
+
+    見出しのない列のデータを落とさないように、表を出力する前に一度読んで数える。
+    max_rows を指定した場合は出力する先頭の行だけを読む (sample の場合は全体から選ぶため全行を読む)。
+    """
+    limit = None if max_rows is None or sample is not None else max_rows + 1
+    width = 0
+    for i, row in enumerate(rows):
+        if limit is not None and i >= limit:
+            break
+        width = max(width, _row_width(row))
+    return width
+
+
+def _header_cell(value, index):
+    """見出しのセルの文字列 (空の場合はpandasと同じく "Unnamed: 列番号")"""
+    text = _cell(value)
+    return text if text else f"Unnamed: {index}"
+
+
+def iter_table(rows, max_rows=None, sample=None, width=None):
+    """
+    行 (1行目は見出し) をMarkdownの表の行に変換する
+
+    Args:
+        rows (iterable[list]): セルの値のリスト
+        max_rows (int, optional): 出力するデータ行の上限 (先頭から)
+        sample (int, optional): 全体から無作為に選んで出力するデータ行の数
+        width (int, optional): 表の列数 (table_width() で数えたもの)。
+            指定しない場合は見出しの列数とし、それより長い行も空でないセルは切り捨てない
+
+    Yields:
+        str: 表の1行 (改行なし)
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    header = list(header)
+    # 見出しの末尾の空のセルは、データのない列なら列に含めない
+    width = max(1, width or 0, _row_width(header))
+    header += [None] * (width - len(header))
+    yield '| ' + ' | '.join(_header_cell(value, i) for i, value in enumerate(header[:width])) + ' |'
+    yield '| ' + ' | '.join(['---'] * width) + ' |'
+    for row in _limit_rows(rows, max_rows, sample):
+        if row is None:
+            yield '| ' + ' | '.join(['...'] * width) + ' |'
+            return
+        row = list(row)
+        cells = [_cell(value) for value in row[:max(width, _row_width(row))]]
+        yield '| ' + ' | '.join(cells + [''] * (width - len(cells))) + ' |'
+
+
+def _open_csv(file_path):
+    """CSVの文字コードと区切り文字を判定して csv.reader を返す (ファイルは呼び出し元で閉じる)"""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+    # 読み込んだ範囲の最後で文字が途切れている場合があるため、末尾の数バイトは判定に使わない
+    probe = head if len(head) < SNIFF_BYTES else head[:-4]
+    encoding = CSV_ENCODINGS[-1]
+    for candidate in CSV_ENCODINGS:
+        try:
+            probe.decode(candidate)
+        except UnicodeDecodeError:
+            continue
+        encoding = candidate
+        break
+    sample = probe.decode(encoding, errors='ignore')
+    if len(head) == SNIFF_BYTES and '\n' in sample:
+        sample = sample[:sample.rindex('\n')]
+    default = '\t' if file_path.lower().endswith('.tsv') else ','
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+    except csv.Error:
+        delimiter = default
+    f = open(file_path, 'r', encoding=encoding, errors='replace', newline='')
+    return f, csv.reader(f, delimiter=delimiter)
+
+
+def iter_csv_markdown(file_path, max_rows=None, sample=None):
+    """CSV/TSVを1行ずつ読んでMarkdownの表の行を生成する"""
+    f, reader = _open_csv(file_path)
+    with f:
+        width = table_width(reader, max_rows, sample)
+    f, reader = _open_csv(file_path)
+    with f:
+        yield from iter_table(reader, max_rows, sample, width)
+
+
+def sheet_names(file_path):
+    """XLSXのシート名 (ブックの順)"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_markdown(file_path, sheet, max_rows=None, sample=None):
+    """XLSXの1シートを1行ずつ読んで "## シート名" と表の行を生成する"""
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield f"## {sheet}"
+        width = table_width(workbook[sheet].iter_rows(values_only=True), max_rows, sample)
+        yield from iter_table(workbook[sheet].iter_rows(values_only=True), max_rows, sample, width)
+    finally:
+        workbook.close()
+
+
+def _write_lines(f, lines):
+    """行をまとめて書き込む (1行ずつ write を呼ばない)"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH_ROWS:
+            f.write('\n'.join(batch) + '\n')
+            batch = []
+    if batch:
+        f.write('\n'.join(batch) + '\n')
+
+
+def _write_sheet_part(file_path, sheet, part_path, max_rows, sample):
+    """1シートを一時ファイルに変換する (プロセスプールから呼ばれるためモジュールレベルに置く)"""
+    with open(part_path, 'w', encoding='utf-8') as f:
+        _write_lines(f, iter_sheet_markdown(file_path, sheet, max_rows, sample))
+    return part_path
+
+
+def write_markdown(file_path, f, max_rows=None, sample=None, jobs=1):
+    """
+    表のファイルをMarkdownに変換して f に少しずつ書き込む
+
+    Args:
+        file_path (str): XLSX, CSV, TSV のパス
+        f: 書き込み先のテキストファイル
+        max_rows (int, optional): シートごとに出力するデータ行の上限 (先頭から)
+        sample (int, optional): シートごとに全体から無作為に選んで出力するデータ行の数
+        jobs (int, optional): XLSXのシートを並列に変換するプロセス数
+    """
+    if not file_path.lower().endswith(XLSX_EXTENSIONS):
+        _write_lines(f, iter_csv_markdown(file_path, max_rows, sample))
+        return
+
+    sheets = sheet_names(file_path)
+    if jobs <= 1 or len(sheets) <= 1:
+        for i, sheet in enumerate(sheets):
+            if i:
+                f.write('\n')
+            _write_lines(f, iter_sheet_markdown(file_path, sheet, max_rows, sample))
+        return
+
+    # シートごとに別のプロセスで一時ファイルに書き、シートの順につなげる
+    from concurrent.futures import ProcessPoolExecutor
+    with tempfile.TemporaryDirectory(prefix='markitdown-sheets-') as tmp_dir:
+        parts = [os.path.join(tmp_dir, f"{i}.md") for i in range(len(sheets))]
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sheets))) as executor:
+            done = executor.map(_write_sheet_part, [file_path] * len(sheets), sheets, parts,
+                                [max_rows] * len(sheets), [sample] * len(sheets))
+            for i, part_path in enumerate(done):
+                if i:
+                    f.write('\n')
+                with open(part_path, 'r', encoding='utf-8') as part:
+                    shutil.copyfileobj(part, f)
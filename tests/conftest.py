@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+"""
+テストの共通設定
+
+モジュールはリポジトリの直下に置いてあるため、インポートできるようにパスに追加する。
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""変換結果のキャッシュのキー (CLIとGUI) のテスト"""
+
+import os
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+
+import conversion_tasks
+import converter_registry
+import convert_to_markdown as ctm
+import format_sniffer
+from disk_cache import ConversionCache
+
+HTML = b'<html><body><p>hi</p></body></html>'
+
+
+class _NameConverter:
+    """MarkItDownの代わり (変換したファイル名を結果にする)"""
+
+    def convert(self, source, **kwargs):
+        return SimpleNamespace(text_content=f"converted {os.path.basename(source)}")
+
+
+@pytest.fixture
+def fake_converter(monkeypatch):
+    @contextlib.contextmanager
+    def acquire_converter(options):
+        yield _NameConverter()
+    monkeypatch.setattr(converter_registry, 'acquire_converter', acquire_converter)
+    monkeypatch.setattr(format_sniffer, 'stream_info', lambda decision, filename=None: None)
+    monkeypatch.setattr(conversion_tasks, 'install_transcript_patch', lambda: None)
+
+
+@pytest.fixture
+def same_bytes(tmp_path):
+    paths = []
+    for name in ('a.txt', 'a.html'):
+        path = tmp_path / name
+        path.write_bytes(HTML)
+        paths.append(str(path))
+    return paths
+
+
+def test_key_depends_on_extension():
+    """同じ内容でも拡張子が違えば別のキーにし、同じ形式の別名の拡張子は同じキーにする"""
+    cache = ConversionCache('unused')
+    keys = {name: cache.key_for_source('digest', name, {'enable_plugins': False})
+            for name in ('a.txt', 'a.html', 'b.HTM')}
+    assert keys['a.txt'] != keys['a.html']
+    assert keys['a.html'] == keys['b.HTM']
+
+
+def test_cli_cache_separates_extensions(tmp_path, same_bytes, fake_converter):
+    """CLIのキャッシュは同じ内容の .txt と .html の変換結果を取り違えない"""
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    txt, html = same_bytes
+    assert ctm._convert_to_text(txt, cache=cache) == ('converted a.txt', False)
+    assert ctm._convert_to_text(html, cache=cache) == ('converted a.html', False)
+    assert ctm._convert_to_text(html, cache=cache) == ('converted a.html', True)
+
+
+def test_gui_cache_separates_extensions(tmp_path, same_bytes, fake_converter):
+    """GUIのキャッシュも同じ内容の .txt と .html の変換結果を取り違えない"""
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    txt, html = same_bytes
+    assert conversion_tasks.convert_source(txt, False, cache=cache) == 'converted a.txt'
+    assert conversion_tasks.convert_source(html, False, cache=cache) == 'converted a.html'
+    assert cache.stats['hits'] == 0
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""常駐変換サーバー (conversion_server) のテスト"""
+
+import os
+import sys
+import stat
+import json
+import socket
+import threading
+import http.client
+
+import pytest
+
+import conversion_server
+from conversion_server import ConversionClient, ConversionServer
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """テスト用のサーバー (変換はファイルの内容を大文字にするだけ)"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path / 'cache'))
+
+    def convert_path(file_path, enable_plugins):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return f.read().upper()
+
+    def convert_bytes(data, filename, enable_plugins):
+        return data.decode('utf-8').upper()
+
+    address = f"127.0.0.1:{_free_port()}"
+    app = ConversionServer(address, convert_path, convert_bytes, workers=1, queue_size=1, quiet=True)
+    thread = threading.Thread(target=app._httpd.serve_forever, daemon=True)
+    thread.start()
+    yield app
+    app._httpd.shutdown()
+    app.close()
+
+
+def _post(address, body, headers):
+    host, port = conversion_server.parse_address(address)[1]
+    conn = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        conn.request('POST', '/convert', body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def test_client_round_trip(server, tmp_path):
+    """クライアントはトークンファイルを読んでサーバーで変換する"""
+    source = tmp_path / 'a.txt'
+    source.write_text('hello', encoding='utf-8')
+    client = ConversionClient(server.address, connect_timeout=5)
+    assert client.health()['status'] == 'ok'
+    assert client.convert_path(str(source)) == 'HELLO'
+    assert client.convert_bytes(b'bytes', 'b.txt') == 'BYTES'
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='POSIXのパーミッションを確認する')
+def test_token_file_is_private(server):
+    """トークンファイルは本人だけが読める"""
+    mode = stat.S_IMODE(os.stat(conversion_server.token_path(server.address)).st_mode)
+    assert mode == 0o600
+
+
+def test_request_without_token_is_rejected(server, tmp_path):
+    """トークンのないリクエストは403で拒否する"""
+    source = tmp_path / 'secret.txt'
+    source.write_text('secret', encoding='utf-8')
+    body = json.dumps({'path': str(source)}).encode('utf-8')
+    status, data = _post(server.address, body, {'Content-Type': 'application/json'})
+    assert status == 403
+    assert b'SECRET' not in data
+    status, _ = _post(server.address, body, {'Content-Type': 'application/json',
+                                             conversion_server.TOKEN_HEADER: 'wrong'})
+    assert status == 403
+
+
+def test_non_regular_files_are_rejected(server, tmp_path):
+    """通常のファイル以外 (ディレクトリ、相対パス) は変換しない"""
+    client = ConversionClient(server.address, connect_timeout=5)
+    with pytest.raises(RuntimeError, match='not a regular file'):
+        client.convert_path(str(tmp_path))
+    token = conversion_server.read_token(server.address)
+    body = json.dumps({'path': 'a.txt'}).encode('utf-8')
+    status, _ = _post(server.address, body, {'Content-Type': 'application/json',
+                                             conversion_server.TOKEN_HEADER: token})
+    assert status == 400
+
+
+def test_client_without_token_falls_back(server):
+    """トークンファイルがなければサーバーを使わない (呼び出し元でその場で変換する)"""
+    os.remove(conversion_server.token_path(server.address))
+    client = ConversionClient(server.address, connect_timeout=5)
+    assert client.health() is None
+    assert client.convert_bytes(b'x', 'x.txt') is None
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX') or sys.platform == 'win32', reason='Unixドメインソケット')
+def test_unix_socket_is_private(tmp_path, monkeypatch):
+    """Unixドメインソケットは本人だけが接続できるパーミッションで作る"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    socket_path = str(tmp_path / 'md.sock')
+    app = ConversionServer(f"unix:{socket_path}", None, None, workers=1, quiet=True)
+    try:
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    finally:
+        app.close()
+    assert not os.path.exists(socket_path)
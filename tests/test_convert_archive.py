@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""ZIPアーカイブの変換 (convert_archive) のテスト"""
+
+import zipfile
+
+import pytest
+
+import convert_to_markdown as ctm
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / 'docs.zip'
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('a.csv', 'name,age\nalice,30\n')
+        z.writestr('b.csv', 'name,age\nbob,40\n')
+    return str(path)
+
+
+def test_combined_output_is_replaced_on_failure(archive, tmp_path, monkeypatch):
+    """結合モードで途中で失敗した場合は一時ファイルを残さず、既存の出力も書き換えない"""
+    output = tmp_path / 'out' / 'docs.md'
+    output.parent.mkdir()
+    output.write_text('previous', encoding='utf-8')
+
+    def failing_results(zip_path, names, options, jobs=1):
+        yield {'source': names[0], 'text': 'partial', 'error': None, 'success': True}
+        raise OSError('disk full')
+    monkeypatch.setattr(ctm, '_iter_archive_results', failing_results)
+
+    with pytest.raises(OSError, match='disk full'):
+        ctm.convert_archive(archive, str(output), ctm.batch_options())
+    assert output.read_text(encoding='utf-8') == 'previous'
+    assert not (tmp_path / 'out' / 'docs.md.tmp').exists()
+
+
+def test_combined_output(archive, tmp_path, monkeypatch):
+    """結合モードではメンバーを格納順に1つのMarkdownに書き込む"""
+    def results(zip_path, names, options, jobs=1):
+        for name in names:
+            yield {'source': name, 'text': f"text of {name}", 'error': None, 'success': True}
+    monkeypatch.setattr(ctm, '_iter_archive_results', results)
+
+    output = tmp_path / 'docs.md'
+    converted = ctm.convert_archive(archive, str(output), ctm.batch_options())
+    text = output.read_text(encoding='utf-8')
+    assert [r['source'] for r in converted] == ['a.csv', 'b.csv']
+    assert text.index('text of a.csv') < text.index('text of b.csv')
+    assert not (tmp_path / 'docs.md.tmp').exists()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""単一ファイルの変換 (convert_file) のテスト"""
+
+import pytest
+
+import convert_to_markdown as ctm
+
+
+class _RecordingClient:
+    """常駐変換サーバーのクライアントの代わり (呼ばれたことを記録する)"""
+
+    def __init__(self):
+        self.calls = []
+
+    def convert_path(self, file_path, enable_plugins=False):
+        self.calls.append(file_path)
+        return 'from server'
+
+    def convert_bytes(self, data, filename='', enable_plugins=False):
+        self.calls.append(filename)
+        return 'from server'
+
+
+class _RecordingPool:
+    """子プロセスのプールの代わり (渡された制限時間を記録する)"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def run(self, func, args, timeout=None):
+        self.timeouts.append(timeout)
+        return 'from worker'
+
+
+def test_timeout_and_memory_limit_bypass_server(tmp_path, monkeypatch):
+    """制限時間・メモリの上限を指定した場合はサーバーを使わずに子プロセスで変換する"""
+    source = tmp_path / 'a.txt'
+    source.write_text('hello', encoding='utf-8')
+    pool = _RecordingPool()
+    monkeypatch.setattr(ctm, '_worker_pool', lambda options=None, max_idle=1: pool)
+
+    for timeout, memory_limit in ((5, None), (None, 512)):
+        client = _RecordingClient()
+        output = tmp_path / 'a.md'
+        assert ctm.convert_file(str(source), str(output), client=client, timeout=timeout,
+                                memory_limit=memory_limit)
+        assert client.calls == []
+        assert output.read_text(encoding='utf-8') == 'from worker'
+    assert pool.timeouts == [5, None]
+
+
+def test_server_is_used_without_limits(tmp_path):
+    """制限を指定しない場合はサーバーが動いていればサーバーで変換する"""
+    source = tmp_path / 'a.txt'
+    source.write_text('hello', encoding='utf-8')
+    client = _RecordingClient()
+    output = tmp_path / 'a.md'
+    assert ctm.convert_file(str(source), str(output), client=client)
+    assert client.calls == [str(source)]
+    assert output.read_text(encoding='utf-8') == 'from server'
+
+
+def test_worker_pool_receives_caller_options(tmp_path, monkeypatch):
+    """子プロセスのプールは呼び出し元のオプション (プラグイン、計測など) で初期化する"""
+    source = tmp_path / 'a.txt'
+    source.write_text('hello', encoding='utf-8')
+    received = []
+
+    def worker_pool(options=None, max_idle=1):
+        received.append(options)
+        return _RecordingPool()
+    monkeypatch.setattr(ctm, '_worker_pool', worker_pool)
+
+    options = ctm.batch_options(True, trace=str(tmp_path / 'trace.jsonl'), timeout=5)
+    assert ctm.convert_file(str(source), str(tmp_path / 'a.md'), True, timeout=5, options=options)
+    assert received == [options]
+
+    # オプションを渡さない場合も引数のプラグインの指定を引き継ぐ
+    assert ctm.convert_file(str(source), str(tmp_path / 'b.md'), True, memory_limit=256)
+    assert received[1]['enable_plugins'] is True
+    assert received[1]['memory_limit'] == 256
+
+
+def test_worker_pool_is_recreated_after_close(tmp_path):
+    """閉じたプールは使い回さず、次の変換では新しいプールを作る"""
+    pytest.importorskip('markitdown')
+    source = tmp_path / 'a.txt'
+    source.write_text('hello', encoding='utf-8')
+    try:
+        assert ctm.convert_file(str(source), str(tmp_path / 'a.md'), timeout=60)
+        first = ctm._pool
+        ctm._close_worker_pool()
+        assert ctm._pool is None
+        assert ctm.convert_file(str(source), str(tmp_path / 'b.md'), timeout=60)
+        assert ctm._pool is not first
+        assert (tmp_path / 'b.md').read_text(encoding='utf-8').strip() == \
+            (tmp_path / 'a.md').read_text(encoding='utf-8').strip()
+    finally:
+        ctm._close_worker_pool()
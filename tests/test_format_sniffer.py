@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""ファイルの形式の判定 (format_sniffer) のテスト"""
+
+import struct
+
+import pytest
+
+import format_sniffer
+
+UTF16_MARKDOWN = '﻿# title\nhello'.encode('utf-16-le')
+UTF16_HTML = '﻿<html><body><p>hi</p></body></html>'.encode('utf-16-le')
+
+
+def _bmp_header():
+    """2x2ピクセル・24ビットのBMPのファイルヘッダーと情報ヘッダー"""
+    pixels = b'\x00' * 16
+    info = struct.pack('<IiiHHIIiiII', 40, 2, 2, 1, 24, 0, len(pixels), 2835, 2835, 0, 0)
+    return b'BM' + struct.pack('<IHHI', 14 + len(info) + len(pixels), 0, 0, 14 + len(info)) + info + pixels
+
+
+@pytest.mark.parametrize('filename, data, expected', [
+    ('u16.md', UTF16_MARKDOWN, '.md'),
+    ('u16.html', UTF16_HTML, '.html'),
+    ('u16', UTF16_HTML, '.html'),
+    ('u32.txt', '﻿hello'.encode('utf-32-le'), '.txt'),
+    ('u16be.txt', '﻿hello'.encode('utf-16-be'), '.txt'),
+    ('id3.md', b'ID3 notes\nhello', '.md'),
+    ('notes.txt', b'BMI table\n', '.txt'),
+    ('notes', b'BMI table\n', '.txt'),
+])
+def test_text_is_not_taken_for_weak_magic(filename, data, expected):
+    """BOMのあるテキストや、短いマジックバイトで始まるテキストをテキストと判定する"""
+    assert format_sniffer.sniff_bytes(data, filename)['format'] == expected
+
+
+@pytest.mark.parametrize('data, expected', [
+    (_bmp_header(), '.bmp'),
+    (b'ID3\x04\x00\x00\x00\x00\x00\x0a' + b'\x00' * 10, '.mp3'),
+    (b'\xff\xfb\x90\x64' + b'\x00' * 60, '.mp3'),
+])
+def test_weak_magic_with_full_header(data, expected):
+    """ヘッダーが揃っているBMP・MP3は拡張子がなくても判定する"""
+    decision = format_sniffer.sniff_bytes(data)
+    assert (decision['format'], decision['method']) == (expected, 'magic')
+
+
+def test_weak_magic_does_not_override_text_extension():
+    """拡張子がテキストの形式の場合は短いマジックバイトで判定しない"""
+    assert format_sniffer.sniff_bytes(_bmp_header(), 'image.txt')['format'] != '.bmp'
+
+
+@pytest.mark.parametrize('filename, data', [
+    ('u16.md', UTF16_MARKDOWN),
+    ('u16.html', UTF16_HTML),
+    ('id3.md', b'ID3 notes\nhello'),
+    ('notes.txt', b'BMI table\n'),
+])
+def test_convert_text_with_weak_magic(tmp_path, filename, data):
+    """判定の結果を渡しても、MarkItDownだけで変換した場合と同じ内容になる"""
+    markitdown = pytest.importorskip('markitdown')
+    import convert_to_markdown as ctm
+    path = tmp_path / filename
+    path.write_bytes(data)
+    text, _ = ctm._convert_to_text(str(path))
+    assert text == markitdown.MarkItDown().convert(str(path)).text_content
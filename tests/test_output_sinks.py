@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+"""バッチ変換の出力先 (output_sinks) のテスト"""
+
+import json
+import sqlite3
+import tarfile
+import zipfile
+
+import pytest
+
+import output_sinks
+
+
+def _records(source):
+    return [output_sinks.document_record(f"{name}.md", str(source), f"# {name}\n本文", elapsed=0.01)
+            for name in ('a', 'sub/b')]
+
+
+def _read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return {record['name']: record['text'] for record in map(json.loads, f)}
+
+
+def _read_sqlite(path):
+    db = sqlite3.connect(path)
+    try:
+        return dict(db.execute('SELECT name, text FROM documents'))
+    finally:
+        db.close()
+
+
+def _read_tar(path):
+    with tarfile.open(path) as tar:
+        return {member.name: tar.extractfile(member).read().decode('utf-8') for member in tar.getmembers()}
+
+
+def _read_zip(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name).decode('utf-8') for name in archive.namelist()}
+
+
+SINKS = [
+    ('jsonl', 'out.jsonl', _read_jsonl),
+    ('sqlite', 'out.sqlite', _read_sqlite),
+    ('tar', 'out.tar', _read_tar),
+    ('tar', 'out.tar.gz', _read_tar),
+    ('zip', 'out.zip', _read_zip),
+]
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'input.txt'
+    path.write_text('input', encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('kind, filename, read', SINKS)
+def test_round_trip(tmp_path, source, kind, filename, read):
+    """書き込んだ文書を読み戻せる"""
+    path = str(tmp_path / 'out' / filename)
+    with output_sinks.open_sink(kind, path) as sink:
+        for record in _records(source):
+            sink.write(record)
+    assert sink.count == 2
+    assert read(path) == {'a.md': '# a\n本文', 'sub/b.md': '# sub/b\n本文'}
+    assert not (tmp_path / 'out' / (filename + '.tmp')).exists()
+
+
+@pytest.mark.parametrize('kind, filename, read', SINKS)
+def test_close_after_exception(tmp_path, source, kind, filename, read):
+    """途中で例外が起きても、それまでに書き込んだ文書を閉じて残す"""
+    path = str(tmp_path / filename)
+    with pytest.raises(RuntimeError):
+        with output_sinks.open_sink(kind, path) as sink:
+            sink.write(_records(source)[0])
+            raise RuntimeError('interrupted')
+    assert read(path) == {'a.md': '# a\n本文'}
+    assert not (tmp_path / (filename + '.tmp')).exists()
+
+
+def test_sink_must_implement_write_and_close(tmp_path):
+    """_write / _close を実装しないシンクは作れない"""
+    class Incomplete(output_sinks.OutputSink):
+        def _write(self, record):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete(str(tmp_path / 'out'))
+
+
+def test_unknown_sink(tmp_path):
+    """'files' やその他の種類は開かない"""
+    with pytest.raises(ValueError):
+        output_sinks.open_sink('files', str(tmp_path / 'out'))
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""同期モード (sync_batch) のテスト"""
+
+import os
+
+import convert_to_markdown as ctm
+
+
+def _sync(input_dir, output_dir, **options):
+    files = ctm.collect_input_files([input_dir])
+    plan = ctm.plan_output_paths(files, output_dir)
+    return ctm.sync_batch(plan, ctm.batch_options(**options), output_dir)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    """変更のないファイルは2回目の同期で変換しない"""
+    input_dir = tmp_path / 'in'
+    input_dir.mkdir()
+    (input_dir / 'a.csv').write_text('name,age\nalice,30\nbob,40\n', encoding='utf-8')
+    output_dir = str(tmp_path / 'out')
+
+    results, skipped, _ = _sync(str(input_dir), output_dir)
+    assert [r['success'] for r in results] == [True]
+    assert skipped == 0
+
+    results, skipped, _ = _sync(str(input_dir), output_dir)
+    assert results == []
+    assert skipped == 1
+
+
+def test_output_options_change_reconverts(tmp_path):
+    """出力に影響するオプション (--max-rows) を変えた場合は再変換する"""
+    input_dir = tmp_path / 'in'
+    input_dir.mkdir()
+    (input_dir / 'a.csv').write_text('name,age\nalice,30\nbob,40\n', encoding='utf-8')
+    output_dir = str(tmp_path / 'out')
+    output_path = os.path.join(output_dir, 'a.md')
+
+    _sync(str(input_dir), output_dir)
+    assert 'bob' in _read(output_path)
+
+    results, skipped, _ = _sync(str(input_dir), output_dir, tables=ctm.table_options(max_rows=1))
+    assert len(results) == 1 and skipped == 0
+    assert 'bob' not in _read(output_path)
+
+    # 同じオプションならスキップする
+    results, skipped, _ = _sync(str(input_dir), output_dir, tables=ctm.table_options(max_rows=1))
+    assert results == [] and skipped == 1
+
+
+def test_unset_options_do_not_change_cache_key():
+    """指定していないオプションはキャッシュのキーに含めない (既存のキャッシュを使い続ける)"""
+    assert ctm._output_options(False) == {'enable_plugins': False}
+    assert ctm._output_options(False, None, ctm.table_options(), None) == {'enable_plugins': False}
+    assert ctm._output_options(True, '1-3') == {'enable_plugins': True, 'pages': '1-3'}
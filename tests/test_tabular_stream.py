@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""表のストリーミング変換 (tabular_stream) のテスト"""
+
+import io
+
+import pytest
+
+import tabular_stream
+
+
+def _csv_markdown(tmp_path, content, **kwargs):
+    path = tmp_path / 'table.csv'
+    path.write_text(content, encoding='utf-8')
+    f = io.StringIO()
+    tabular_stream.write_markdown(str(path), f, **kwargs)
+    return f.getvalue().splitlines()
+
+
+def test_headerless_columns_are_kept(tmp_path):
+    """見出しのない列のデータを落とさず、見出しを "Unnamed: 列番号" にする"""
+    lines = _csv_markdown(tmp_path, 'name,age,,\nalice,30,extra1,extra2\n')
+    assert lines == [
+        '| name | age | Unnamed: 2 | Unnamed: 3 |',
+        '| --- | --- | --- | --- |',
+        '| alice | 30 | extra1 | extra2 |',
+    ]
+
+
+def test_empty_trailing_columns_are_dropped(tmp_path):
+    """データのない末尾の列は含めない"""
+    lines = _csv_markdown(tmp_path, 'name,age,,\nalice,30,,\nbob,,,\n')
+    assert lines == [
+        '| name | age |',
+        '| --- | --- |',
+        '| alice | 30 |',
+        '| bob |  |',
+    ]
+
+
+def test_width_with_max_rows(tmp_path):
+    """max_rows の場合は出力する行だけで列数を数える"""
+    lines = _csv_markdown(tmp_path, 'a,b\n1,2\n3,4,5\n', max_rows=1)
+    assert lines == ['| a | b |', '| --- | --- |', '| 1 | 2 |', '| ... | ... |']
+
+
+def test_rows_wider_than_width_are_not_truncated():
+    """列数を指定しない場合も、見出しより長い行の空でないセルは切り捨てない"""
+    lines = list(tabular_stream.iter_table([['a'], ['1', '2']]))
+    assert lines[-1] == '| 1 | 2 |'
+
+
+def test_xlsx_headerless_columns(tmp_path):
+    """XLSXでも見出しのない列のデータを出力する"""
+    openpyxl = pytest.importorskip('openpyxl')
+    path = tmp_path / 'book.xlsx'
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Sheet1'
+    sheet.append(['name', 'age'])
+    sheet.append(['alice', 30, 'extra'])
+    workbook.save(path)
+    f = io.StringIO()
+    tabular_stream.write_markdown(str(path), f)
+    assert f.getvalue().splitlines() == [
+        '## Sheet1',
+        '| name | age | Unnamed: 2 |',
+        '| --- | --- | --- |',
+        '| alice | 30 | extra |',
+    ]
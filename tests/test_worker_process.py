@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""変換用の子プロセス (worker_process) のテスト"""
+
+import pytest
+
+import worker_process
+
+
+def _allocate(mb):
+    """mb MBのメモリを確保して大きさを返す (子プロセスで実行する)"""
+    return len(bytearray(mb * 1024 * 1024))
+
+
+def test_current_rss():
+    """常駐メモリを取得できる (Windowsではワーキングセット)"""
+    rss = worker_process.current_rss()
+    assert rss is not None and rss > 0
+
+
+@pytest.mark.skipif(not worker_process.memory_limit_supported(), reason='メモリの上限を設定できない環境')
+def test_memory_limit_is_enforced():
+    """上限を超えるメモリを確保した変換は MemoryLimitExceeded になり、子プロセスは入れ替える"""
+    pool = worker_process.WorkerPool(max_idle=1, memory_limit_mb=512)
+    try:
+        assert pool.run(_allocate, (16,), timeout=60) == 16 * 1024 * 1024
+        with pytest.raises(worker_process.MemoryLimitExceeded):
+            pool.run(_allocate, (2048,), timeout=60)
+        # 次の変換は新しい子プロセスで行う
+        assert pool.run(_allocate, (16,), timeout=60) == 16 * 1024 * 1024
+    finally:
+        pool.close()
+
+
+def test_unsupported_memory_limit_warns(monkeypatch, capsys):
+    """上限を設定できない場合は警告を表示して制限せずに続ける"""
+    def unsupported(limit):
+        raise OSError('not supported')
+    monkeypatch.setattr(worker_process.sys, 'platform', 'win32')
+    monkeypatch.setattr(worker_process, '_apply_job_memory_limit', unsupported)
+    assert worker_process._apply_memory_limit(256) is False
+    assert '警告' in capsys.readouterr().err
+    assert worker_process._apply_memory_limit(None) is False
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""YouTubeの一括変換 (youtube_bulk) のテスト (ローカルのスタブサーバーを使い、ネットワークは使わない)"""
+
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('youtube_transcript_api')
+
+import youtube_bulk
+import youtube_helpers
+
+VIDEO_IDS = ['vid00000001', 'vid00000002', 'nosubs00003']
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """プレイリストのページとoEmbed APIだけを返すYouTubeのスタブ"""
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def _send(self, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.requests.append(url.path)
+        if url.path == '/playlist':
+            ids = ','.join(f'"videoId":"{video_id}"' for video_id in VIDEO_IDS + VIDEO_IDS)
+            self._send(f"var ytInitialData = {{{ids}}};", 'text/html')
+        elif url.path == '/oembed':
+            video_id = parse_qs(url.query)['url'][0][-11:]
+            self._send(json.dumps({'title': f"Title {video_id}", 'author_name': 'Stub Channel'}),
+                       'application/json')
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TranscriptsDisabled(Exception):
+    """文字起こしが無効な動画 (youtube_transcript_api の例外と同じ名前)"""
+
+
+class _StubTranscript:
+    is_generated = False
+
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+    def fetch(self):
+        return [{'text': f"hello {self.video_id}", 'start': 0.0, 'duration': 1.0},
+                {'text': 'bye', 'start': 1.0, 'duration': 1.0}]
+
+
+class _StubTranscriptList:
+    def __init__(self, video_id):
+        self.video_id = video_id
+
+    def find_transcript(self, languages):
+        return _StubTranscript(self.video_id)
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    """スタブサーバーを起動し、キャッシュをテスト用のディレクトリにする"""
+    _StubHandler.requests = []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(youtube_helpers.BASE_URL_ENV, f"http://127.0.0.1:{httpd.server_address[1]}")
+    monkeypatch.setattr(youtube_helpers, '_default_cache', youtube_helpers.YouTubeInfoCache(str(tmp_path / 'info')))
+    monkeypatch.setattr(youtube_helpers, '_default_transcript_cache',
+                        youtube_helpers.TranscriptCache(str(tmp_path / 'transcripts')))
+    transcript_requests = []
+
+    def list_transcripts(api, video_id, session):
+        transcript_requests.append(video_id)
+        if video_id.startswith('nosubs'):
+            raise TranscriptsDisabled('Subtitles are disabled for this video')
+        return _StubTranscriptList(video_id)
+    monkeypatch.setattr(youtube_helpers, '_list_transcripts', list_transcripts)
+    yield _StubHandler.requests, transcript_requests
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_ingest_playlist_from_stub(stub, tmp_path):
+    """プレイリストの動画ごとに動画情報と文字起こしのMarkdownを保存し、再実行では飛ばす"""
+    http_requests, transcript_requests = stub
+    output_dir = str(tmp_path / 'out')
+    video_ids = youtube_bulk.collect_video_ids(['https://www.youtube.com/playlist?list=PLstub'])
+    assert video_ids == VIDEO_IDS
+
+    results, skipped = youtube_bulk.ingest(video_ids, output_dir, concurrency=2, rate=0)
+    assert skipped == 0
+    assert [r['success'] for r in results] == [True, True, True]
+    assert sorted(transcript_requests) == sorted(VIDEO_IDS)
+
+    with open(results[0]['output'], 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert os.path.basename(results[0]['output']).endswith('_Stub Channel_Title vid00000001.md')
+    assert '## Title vid00000001' in text
+    assert '### Transcript\nhello vid00000001 bye' in text
+    with open(results[2]['output'], 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert '### Transcript' not in text
+    assert '<!-- Transcript unavailable: Subtitles are disabled' in text
+
+    results, skipped = youtube_bulk.ingest(video_ids, output_dir, rate=0)
+    assert results == [] and skipped == 3
+
+
+def test_cached_videos_do_not_use_rate_limit(stub, tmp_path):
+    """キャッシュにある動画情報と文字起こしは問い合わせず、リクエストの頻度の制限も使わない"""
+    http_requests, transcript_requests = stub
+    youtube_bulk.ingest(['vid00000001'], str(tmp_path / 'first'), rate=0)
+    assert http_requests.count('/oembed') == 1 and transcript_requests == ['vid00000001']
+
+    acquired = []
+
+    class CountingBucket(youtube_bulk.TokenBucket):
+        def acquire(self):
+            acquired.append(1)
+    bucket = CountingBucket(0)
+    state = youtube_bulk.BulkState(str(tmp_path))
+    result = youtube_bulk._ingest_one('vid00000001', str(tmp_path), ['ja', 'en'], None, bucket, state, '2026-01-01')
+    assert result['success']
+    assert acquired == []
+    assert http_requests.count('/oembed') == 1 and transcript_requests == ['vid00000001']
+
+
+def test_transcript_errors_are_retried(stub, tmp_path, monkeypatch):
+    """通信エラーで文字起こしを取得できなかった動画は失敗とし、再実行で取得し直す"""
+    http_requests, transcript_requests = stub
+
+    def offline(api, video_id, session):
+        transcript_requests.append(video_id)
+        raise ConnectionError('network is unreachable')
+    monkeypatch.setattr(youtube_helpers, '_list_transcripts', offline)
+    output_dir = str(tmp_path / 'out')
+    results, _ = youtube_bulk.ingest(['vid00000001'], output_dir, rate=0)
+    assert not results[0]['success']
+    assert 'network is unreachable' in results[0]['error']
+    assert [name for name in os.listdir(output_dir) if name.endswith('.md')] == []
+
+    monkeypatch.setattr(youtube_helpers, '_list_transcripts',
+                        lambda api, video_id, session: _StubTranscriptList(video_id))
+    results, skipped = youtube_bulk.ingest(['vid00000001'], output_dir, rate=0)
+    assert skipped == 0 and results[0]['success']
+    assert os.path.basename(results[0]['output']).endswith('_Stub Channel_Title vid00000001.md')
+
+
+def test_info_failure_is_not_printed(tmp_path, monkeypatch, capsys):
+    """動画情報の取得の失敗は標準出力に書かず、計測のイベントとして記録して再問い合わせを控える"""
+    import instrumentation
+    attempts = []
+
+    def failing_oembed(video_id, timeout, session):
+        attempts.append(video_id)
+        raise ConnectionError('network is unreachable')
+    monkeypatch.setattr(youtube_helpers, '_fetch_oembed', failing_oembed)
+    events = []
+    instrumentation.add_hook(events.append)
+    try:
+        cache = youtube_helpers.YouTubeInfoCache(str(tmp_path / 'info'))
+        assert youtube_helpers.get_youtube_info('vid00000001', cache=cache) is None
+        assert youtube_helpers.get_youtube_info('vid00000001', cache=cache) is None
+    finally:
+        instrumentation.remove_hook(events.append)
+    assert capsys.readouterr().out == ''
+    assert attempts == ['vid00000001']
+    failures = [event for event in events if event['event'] == 'youtube_info_failed']
+    assert [event['video_id'] for event in failures] == ['vid00000001']
+    assert 'network is unreachable' in failures[0]['error']
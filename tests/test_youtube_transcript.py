@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""YouTubeの文字起こしの取得の差し替え (install_transcript_patch) のテスト (ネットワークは使わない)"""
+
+import io
+
+import pytest
+
+pytest.importorskip('youtube_transcript_api')
+pytest.importorskip('markitdown.converters')
+
+import youtube_helpers
+import conversion_tasks
+
+VIDEO_ID = 'abcdefghijk'
+PAGE = b'<html><head><title>Stub video</title></head><body></body></html>'
+
+
+class TranscriptsDisabled(Exception):
+    """文字起こしが無効な動画 (youtube_transcript_api の例外と同じ名前)"""
+
+
+class _StubTranscript:
+    is_generated = False
+
+    def fetch(self):
+        return [{'text': 'こんにちは', 'start': 0.0, 'duration': 1.0},
+                {'text': '世界', 'start': 1.0, 'duration': 1.0}]
+
+
+class _StubTranscriptList:
+    def find_transcript(self, languages):
+        return _StubTranscript()
+
+
+@pytest.fixture
+def patched(tmp_path, monkeypatch):
+    """文字起こしの取得を差し替え、一覧の取得をスタブにする (呼ばれた動画IDを記録する)"""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    # テストの後で元に戻す
+    monkeypatch.setattr(YouTubeTranscriptApi, 'fetch', YouTubeTranscriptApi.fetch)
+    monkeypatch.setattr(YouTubeTranscriptApi, 'get_transcript', YouTubeTranscriptApi.get_transcript, raising=False)
+    monkeypatch.setattr(conversion_tasks, '_transcript_patched', False)
+    monkeypatch.setattr(youtube_helpers, '_default_transcript_cache',
+                        youtube_helpers.TranscriptCache(str(tmp_path / 'transcripts')))
+    calls = []
+
+    def list_transcripts(api, video_id, session):
+        calls.append(video_id)
+        if video_id == 'disabled000':
+            raise TranscriptsDisabled('Subtitles are disabled for this video')
+        return _StubTranscriptList()
+    monkeypatch.setattr(youtube_helpers, '_list_transcripts', list_transcripts)
+    conversion_tasks.install_transcript_patch()
+    return calls
+
+
+def _convert(video_id):
+    from markitdown import MarkItDown, StreamInfo
+    info = StreamInfo(url=f"https://www.youtube.com/watch?v={video_id}", extension='.html', mimetype='text/html')
+    return MarkItDown().convert_stream(io.BytesIO(PAGE), stream_info=info,
+                                       youtube_transcript_languages=['ja']).text_content
+
+
+def test_markitdown_uses_cached_transcript(patched):
+    """MarkItDownのYouTube変換は差し替えた fetch を通り、2回目はキャッシュから返す"""
+    first = _convert(VIDEO_ID)
+    assert '### Transcript\nこんにちは 世界' in first
+    second = _convert(VIDEO_ID)
+    assert second == first
+    assert patched == [VIDEO_ID]
+
+
+def test_unavailable_transcript_is_cached(patched):
+    """文字起こしがない動画は文字起こしなしで変換し、再試行せずに「なし」をキャッシュする"""
+    text = _convert('disabled000')
+    assert '## Stub video' in text
+    assert '### Transcript' not in text
+    _convert('disabled000')
+    assert patched == ['disabled000']
@@ -0,0 +1,513 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+変換を子プロセスで実行し、タイムアウトや取り消しで確実に止められるようにする
+
+md.convert() は途中で止める手段がないため、スレッドで実行すると取り消しても
+変換が終わるまで待つしかない。WorkerProcess は変換を子プロセスで1件ずつ実行し、
+タイムアウトや取り消しの場合は子プロセスごと終了させてすぐに制御を返す。
+子プロセスは変換が終わっても残しておき、次の変換に使い回す
+(MarkItDownの読み込みと生成を毎回やり直さないため)。
+
+巨大なファイルや壊れたファイルでメモリを使い果たしても呼び出し元のプロセスを巻き込まないように、
+子プロセスごとにメモリの上限を設定できる (POSIXではアドレス空間の上限 RLIMIT_AS、
+WindowsではJob Objectのプロセスのコミットメモリの上限)。上限を超えた変換や子プロセスの異常終了は
+そのファイルだけの失敗として扱う。WorkerPool は一定の件数を変換した子プロセスや
+メモリの使用量が増えた子プロセスを終了させ、新しい子プロセスに入れ替える (メモリの断片化を解消するため)。
+"""
+
+import os
+import sys
+import time
+import threading
+import traceback
+import multiprocessing
+from types import SimpleNamespace
+
+# 子プロセスの状態を確認する間隔 (秒)
+POLL_INTERVAL = 0.05
+# 子プロセスの終了を待つ時間 (秒、過ぎたら強制終了する)
+STOP_TIMEOUT = 2.0
+# 子プロセスを入れ替えるまでに変換する件数
+MAX_TASKS_PER_WORKER = 100
+# 子プロセスを入れ替える常駐メモリの増加量 (MB、起動直後からの増加)
+MAX_RSS_GROWTH_MB = 512
+
+# Windows API (Job Object と psapi) の定数
+_JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS = 9
+_JOB_OBJECT_LIMIT_PROCESS_MEMORY = 0x00000100
+
+
+class ConversionTimeout(Exception):
+    """変換が制限時間内に終わらなかった"""
+
+
+class ConversionCancelled(Exception):
+    """変換が取り消された"""
+
+
+class WorkerCrashed(Exception):
+    """変換中に子プロセスが異常終了した (メモリ不足やネイティブコードのクラッシュなど)"""
+
+
+class MemoryLimitExceeded(WorkerCrashed):
+    """変換が子プロセスのメモリの上限を超えた"""
+
+
+_win32 = None
+# Job Objectのハンドル (閉じると上限が外れるため、プロセスが終わるまで保持する)
+_job = None
+
+
+def _win32_api():
+    """Windows API の関数と構造体 (ctypesで定義し、プロセスで1回だけ作る)"""
+    global _win32
+    if _win32 is not None:
+        return _win32
+    import ctypes
+    from ctypes import wintypes
+
+    class IO_COUNTERS(ctypes.Structure):
+        _fields_ = [(name, ctypes.c_ulonglong) for name in (
+            'ReadOperationCount', 'WriteOperationCount', 'OtherOperationCount',
+            'ReadTransferCount', 'WriteTransferCount', 'OtherTransferCount')]
+
+    class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ('PerProcessUserTimeLimit', ctypes.c_int64),
+            ('PerJobUserTimeLimit', ctypes.c_int64),
+            ('LimitFlags', wintypes.DWORD),
+            ('MinimumWorkingSetSize', ctypes.c_size_t),
+            ('MaximumWorkingSetSize', ctypes.c_size_t),
+            ('ActiveProcessLimit', wintypes.DWORD),
+            ('Affinity', ctypes.c_size_t),
+            ('PriorityClass', wintypes.DWORD),
+            ('SchedulingClass', wintypes.DWORD),
+        ]
+
+    class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+        _fields_ = [
+            ('BasicLimitInformation', JOBOBJECT_BASIC_LIMIT_INFORMATION),
+            ('IoInfo', IO_COUNTERS),
+            ('ProcessMemoryLimit', ctypes.c_size_t),
+            ('JobMemoryLimit', ctypes.c_size_t),
+            ('PeakProcessMemoryUsed', ctypes.c_size_t),
+            ('PeakJobMemoryUsed', ctypes.c_size_t),
+        ]
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    kernel32.GetCurrentProcess.argtypes = ()
+    kernel32.CreateJobObjectW.restype = wintypes.HANDLE
+    kernel32.CreateJobObjectW.argtypes = (ctypes.c_void_p, wintypes.LPCWSTR)
+    kernel32.SetInformationJobObject.restype = wintypes.BOOL
+    kernel32.SetInformationJobObject.argtypes = (wintypes.HANDLE, ctypes.c_int, ctypes.c_void_p, wintypes.DWORD)
+    kernel32.AssignProcessToJobObject.restype = wintypes.BOOL
+    kernel32.AssignProcessToJobObject.argtypes = (wintypes.HANDLE, wintypes.HANDLE)
+    # psapi の GetProcessMemoryInfo (Windows 7以降は kernel32 に K32 の名前で入っている)
+    kernel32.K32GetProcessMemoryInfo.restype = wintypes.BOOL
+    kernel32.K32GetProcessMemoryInfo.argtypes = (wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+                                                 wintypes.DWORD)
+
+    _win32 = SimpleNamespace(ctypes=ctypes, kernel32=kernel32,
+                             JOBOBJECT_EXTENDED_LIMIT_INFORMATION=JOBOBJECT_EXTENDED_LIMIT_INFORMATION,
+                             PROCESS_MEMORY_COUNTERS=PROCESS_MEMORY_COUNTERS)
+    return _win32
+
+
+def memory_limit_supported():
+    """子プロセスのメモリの上限を設定できる環境か (POSIXの resource、WindowsのJob Object)"""
+    if sys.platform == 'win32':
+        try:
+            _win32_api()
+        except (ImportError, OSError, AttributeError):
+            return False
+        return True
+    try:
+        import resource
+    except ImportError:
+        return False
+    return hasattr(resource, 'RLIMIT_AS')
+
+
+def _apply_job_memory_limit(limit):
+    """
+    Windowsでこのプロセスを新しいJob Objectに入れ、プロセスのコミットメモリの上限を設定する
+    (上限を超えるメモリの確保は失敗し、PythonではMemoryErrorになる)
+    """
+    global _job
+    api = _win32_api()
+    ctypes, kernel32 = api.ctypes, api.kernel32
+    job = kernel32.CreateJobObjectW(None, None)
+    if not job:
+        raise ctypes.WinError(ctypes.get_last_error())
+    info = api.JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+    info.BasicLimitInformation.LimitFlags = _JOB_OBJECT_LIMIT_PROCESS_MEMORY
+    info.ProcessMemoryLimit = limit
+    if not kernel32.SetInformationJobObject(job, _JOB_OBJECT_EXTENDED_LIMIT_INFORMATION_CLASS,
+                                            ctypes.byref(info), ctypes.sizeof(info)):
+        raise ctypes.WinError(ctypes.get_last_error())
+    # Windows 8以降は既にJob Objectに入っているプロセス (ターミナルやIDEから起動した場合など) も入れられる
+    if not kernel32.AssignProcessToJobObject(job, kernel32.GetCurrentProcess()):
+        raise ctypes.WinError(ctypes.get_last_error())
+    _job = job
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """
+    このプロセスのメモリの上限を設定する
+    (POSIXではアドレス空間の上限、WindowsではJob Objectのコミットメモリの上限)
+
+    Returns:
+        bool: 上限を設定したかどうか (設定できない環境では警告を表示して制限せずに続ける)
+    """
+    if not memory_limit_mb:
+        return False
+    limit = memory_limit_mb * 1024 * 1024
+    try:
+        if sys.platform == 'win32':
+            _apply_job_memory_limit(limit)
+            return True
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        return True
+    except (ImportError, OSError, ValueError, AttributeError) as e:
+        print(f"警告: 変換プロセスのメモリの上限を設定できません: {e}", file=sys.stderr)
+        return False
+
+
+def _windows_rss():
+    """Windowsでのこのプロセスのワーキングセット (バイト)。取得できない場合はNone"""
+    try:
+        api = _win32_api()
+    except (ImportError, OSError, AttributeError):
+        return None
+    counters = api.PROCESS_MEMORY_COUNTERS()
+    counters.cb = api.ctypes.sizeof(counters)
+    if not api.kernel32.K32GetProcessMemoryInfo(api.kernel32.GetCurrentProcess(), api.ctypes.byref(counters),
+                                                counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def current_rss():
+    """
+    このプロセスの常駐メモリ (バイト)。取得できない場合はNone
+    (Windowsではワーキングセットのサイズ。Linux以外のPOSIXでは現在の値ではなく最大値になる)
+    """
+    if sys.platform == 'win32':
+        return _windows_rss()
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOSはバイト、それ以外はKB
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _serve(conn, initializer, initargs, memory_limit_mb=None):
+    """
+    子プロセスのメインループ。(関数, 引数) を受け取って実行し、結果と常駐メモリを返す
+    """
+    _apply_memory_limit(memory_limit_mb)
+    if initializer is not None:
+        initializer(*initargs)
+    # 起動と初期化の時間を制限時間に含めないように、準備ができたことを知らせる
+    conn.send(('ready', current_rss()))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        func, args = request
+        try:
+            response = ('ok', func(*args), current_rss())
+        except MemoryError:
+            # メモリが足りない状態では処理を続けられないため、知らせてから終了する
+            conn.send(('memory', traceback.format_exc()))
+            return
+        except Exception as e:
+            detail = traceback.format_exc()
+            try:
+                conn.send(('error', e, detail, current_rss()))
+                continue
+            except Exception:
+                # 例外をpickleできない場合は型名とメッセージだけを返す
+                response = ('error', RuntimeError(f"{type(e).__name__}: {e}"), detail, current_rss())
+        conn.send(response)
+
+
+class WorkerProcess:
+    """
+    変換を1件ずつ実行する子プロセス
+
+    call() は呼び出したスレッドで結果を待つ。別のスレッドから kill() を呼ぶか、
+    cancel_event をセットすると子プロセスを終了させ、call() は ConversionCancelled を送出する。
+    子プロセスは必要になったときに起動し、終了させた後の call() では新しく起動する。
+    """
+
+    def __init__(self, initializer=None, initargs=(), context='spawn', memory_limit_mb=None):
+        """
+        Args:
+            initializer (callable, optional): 子プロセスの起動時に呼ぶ関数 (pickleできること)
+            initargs (tuple, optional): initializer の引数
+            context (str, optional): multiprocessing の開始方式
+                (GUIのスレッドを複製しないように、デフォルトはどのOSでも spawn)
+            memory_limit_mb (int, optional): 子プロセスのアドレス空間の上限 (MB)。Noneの場合は制限しない
+        """
+        self.initializer = initializer
+        self.initargs = initargs
+        self.memory_limit_mb = memory_limit_mb
+        self._context = multiprocessing.get_context(context)
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self._killed = False
+        # 今の子プロセスで変換した件数と、起動直後・直近の変換後の常駐メモリ (バイト)
+        self.calls = 0
+        self.baseline_rss = None
+        self.rss = None
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def rss_growth_mb(self):
+        """起動直後からの常駐メモリの増加量 (MB)。わからない場合は0"""
+        if self.baseline_rss is None or self.rss is None:
+            return 0
+        return (self.rss - self.baseline_rss) / (1024 * 1024)
+
+    def start(self):
+        """子プロセスを起動する (call() も必要に応じて起動する)"""
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_serve,
+                                        args=(child_conn, self.initializer, self.initargs, self.memory_limit_mb),
+                                        name="markitdown-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._process = process
+            self._conn = parent_conn
+            self._killed = False
+            self.calls = 0
+            self.baseline_rss = self.rss = None
+
+    def call(self, func, args=(), timeout=None, cancel_event=None):
+        """
+        子プロセスで func(*args) を実行して結果を返す
+
+        Args:
+            func (callable): 実行する関数 (モジュールの最上位で定義され、pickleできること)
+            args (tuple, optional): 引数 (pickleできること)
+            timeout (float, optional): 制限時間 (秒)。Noneの場合は制限しない
+            cancel_event (threading.Event, optional): セットされたら変換を取り消す
+
+        Raises:
+            ConversionTimeout: 制限時間を過ぎた場合 (子プロセスは終了させる)
+            ConversionCancelled: 取り消された場合 (子プロセスは終了させる)
+            MemoryLimitExceeded: メモリの上限を超えた場合 (子プロセスは終了する)
+            WorkerCrashed: 子プロセスが異常終了した場合
+            Exception: func が送出した例外 (worker_traceback 属性に子プロセスでのトレースバック)
+        """
+        if not self.alive:
+            self.start()
+        process, conn = self._process, self._conn
+        conn.send((func, args))
+
+        started = time.monotonic()
+        while True:
+            try:
+                ready = conn.poll(POLL_INTERVAL)
+            except (OSError, EOFError):
+                ready = False
+            if ready:
+                try:
+                    response = conn.recv()
+                except (OSError, EOFError):
+                    response = None
+                if response is not None and response[0] == 'ready':
+                    self.baseline_rss = self.rss = response[1]
+                    started = time.monotonic()
+                    continue
+                if response is not None:
+                    break
+            if self._killed or (cancel_event is not None and cancel_event.is_set()):
+                self.kill()
+                raise ConversionCancelled("変換を取り消しました")
+            if not process.is_alive():
+                exitcode = process.exitcode
+                self._discard()
+                if self.memory_limit_mb:
+                    # ネイティブコードはメモリを確保できないとMemoryErrorではなく異常終了することがある
+                    raise WorkerCrashed(f"変換プロセスが異常終了しました (終了コード {exitcode}、"
+                                        f"メモリの上限 {self.memory_limit_mb} MB を超えた可能性があります)")
+                raise WorkerCrashed(f"変換プロセスが異常終了しました (終了コード {exitcode})")
+            if timeout is not None and time.monotonic() - started >= timeout:
+                self.kill()
+                raise ConversionTimeout(f"変換が {timeout:g} 秒以内に終わりませんでした")
+
+        if response[0] == 'memory':
+            process.join(STOP_TIMEOUT)
+            self._discard()
+            error = MemoryLimitExceeded(f"変換がメモリの上限 ({self.memory_limit_mb} MB) を超えました"
+                                        if self.memory_limit_mb else "変換中にメモリが不足しました")
+            error.worker_traceback = response[1]
+            raise error
+        self.calls += 1
+        self.rss = response[-1]
+        if response[0] == 'ok':
+            return response[1]
+        _, error, detail, _ = response
+        error.worker_traceback = detail
+        raise error
+
+    def kill(self):
+        """実行中の変換を止めて子プロセスを終了させる (どのスレッドから呼んでもよい)"""
+        with self._lock:
+            process = self._process
+            self._killed = True
+        if process is not None and process.is_alive():
+            process.kill()
+            process.join(STOP_TIMEOUT)
+        self._discard()
+
+    def _discard(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._process = None
+            self._conn = None
+
+    def close(self):
+        """子プロセスを終了させる (実行中の変換がない場合に呼ぶ)"""
+        with self._lock:
+            process, conn = self._process, self._conn
+        if process is not None and process.is_alive():
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                process.kill()
+                process.join(STOP_TIMEOUT)
+        self._discard()
+
+
+class WorkerPool:
+    """
+    WorkerProcess を使い回すプール
+
+    空いている子プロセスがあればそれを使い、なければ新しく起動する。
+    タイムアウト・取り消し・異常終了した子プロセスは使い回さない。
+    max_tasks 件を変換した子プロセスと、常駐メモリが起動直後から max_rss_growth_mb 以上増えた
+    子プロセスは終了させ、次の変換では新しい子プロセスを起動する。
+    """
+
+    def __init__(self, initializer=None, initargs=(), max_idle=4, memory_limit_mb=None,
+                 max_tasks=MAX_TASKS_PER_WORKER, max_rss_growth_mb=MAX_RSS_GROWTH_MB):
+        """
+        Args:
+            max_idle (int, optional): 待機させておく子プロセスの最大数
+            memory_limit_mb (int, optional): 子プロセスのアドレス空間の上限 (MB)。Noneの場合は制限しない
+            max_tasks (int, optional): 子プロセスを入れ替えるまでに変換する件数 (Noneの場合は入れ替えない)
+            max_rss_growth_mb (float, optional): 子プロセスを入れ替える常駐メモリの増加量 (MB、Noneの場合は見ない)
+        """
+        self.initializer = initializer
+        self.initargs = initargs
+        self.max_idle = max_idle
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks = max_tasks
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _new_worker(self):
+        return WorkerProcess(self.initializer, self.initargs, memory_limit_mb=self.memory_limit_mb)
+
+    def _reusable(self, worker):
+        """変換を終えた子プロセスを次の変換に使い回すかどうか"""
+        if not worker.alive or worker.memory_limit_mb != self.memory_limit_mb:
+            return False
+        if self.max_tasks is not None and worker.calls >= self.max_tasks:
+            return False
+        if self.max_rss_growth_mb is not None and worker.rss_growth_mb >= self.max_rss_growth_mb:
+            return False
+        return True
+
+    def set_memory_limit(self, memory_limit_mb):
+        """
+        子プロセスのメモリの上限を変更する
+        (待機中の子プロセスは終了させ、実行中の子プロセスは変換が終わってから入れ替える)
+        """
+        with self._lock:
+            if memory_limit_mb == self.memory_limit_mb:
+                return
+            self.memory_limit_mb = memory_limit_mb
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+    def run(self, func, args=(), timeout=None, cancel_event=None):
+        """
+        空いている子プロセスで func(*args) を実行する (例外は WorkerProcess.call と同じ)
+        """
+        with self._lock:
+            worker = self._idle.pop() if self._idle else None
+        if worker is None:
+            worker = self._new_worker()
+        try:
+            return worker.call(func, args, timeout, cancel_event)
+        finally:
+            if worker.alive:
+                with self._lock:
+                    if len(self._idle) < self.max_idle and self._reusable(worker):
+                        self._idle.append(worker)
+                        worker = None
+                if worker is not None:
+                    worker.close()
+
+    def prestart(self):
+        """子プロセスを1つ起動して待機させておく (最初の変換で起動と初期化を待たないため)"""
+        with self._lock:
+            if self._idle:
+                return
+        worker = self._new_worker()
+        worker.start()
+        with self._lock:
+            self._idle.append(worker)
+
+    def close(self):
+        """待機中の子プロセスをすべて終了させる"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+YouTubeのプレイリスト・チャンネルの一括変換
+
+プレイリストやチャンネルのURL、または動画のURL/IDを1行ずつ書いたファイルから動画を集め、
+動画情報と文字起こしを並列に取得して動画ごとに1つのMarkdownを保存する。
+同時に処理する動画の数 (concurrency) とリクエストの頻度 (トークンバケット) を制限する。
+動画情報と文字起こしはキャッシュ付きの youtube_helpers で取得し (キャッシュにあれば通信しない)、
+MarkItDownのYouTube変換と同じ構成のMarkdownにする。
+
+完了した動画は出力ディレクトリの状態ファイルに記録し、中断した後に同じコマンドを実行すると
+未完了の動画だけを処理する。保存は一時ファイルに書いてから名前を付けるため、
+中断しても書きかけのMarkdownは残らない。
+
+YouTubeのURLのベースは環境変数 MARKITDOWN_YOUTUBE_BASE_URL で変更でき、
+ローカルのスタブサーバーを使ってネットワークなしで試せる。
+"""
+
+import os
+import re
+import json
+import time
+import datetime
+import threading
+
+import http_client
+import instrumentation
+from youtube_helpers import (VIDEO_ID_PATTERN, default_transcript_cache, fetch_transcript, get_youtube_info,
+                             watch_url, youtube_base_url, youtube_filename)
+
+# 同時に処理する動画の数
+DEFAULT_CONCURRENCY = 4
+# 1秒あたりのリクエスト数の上限
+DEFAULT_RATE = 2.0
+# 文字起こしの言語の優先順位 (見つからなければ自動生成の文字起こしを探す)
+DEFAULT_TRANSCRIPT_LANGUAGES = ('ja', 'en')
+# 完了した動画を記録する状態ファイル (出力ディレクトリに作る)
+STATE_FILENAME = '.youtube-bulk-state.json'
+
+_VIDEO_ID = re.compile(r'^[a-zA-Z0-9_-]{11}$')
+# プレイリスト・チャンネルのページに埋め込まれた動画ID
+_PAGE_VIDEO_ID = re.compile(r'"videoId"\s*:\s*"([a-zA-Z0-9_-]{11})"')
+_PLAYLIST_ID = re.compile(r'[?&]list=([a-zA-Z0-9_-]+)')
+_CHANNEL_PATH = re.compile(r'/(@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)')
+
+
+class TokenBucket:
+    """
+    トークンバケットによるリクエスト頻度の制限 (スレッドセーフ)
+
+    1秒あたり rate 個のトークンが貯まり (最大 capacity 個)、リクエストごとに1個使う。
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1個使う (足りなければ貯まるまで待つ)"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class BulkState:
+    """完了した動画 (動画ID -> 保存したファイル名) を記録する状態ファイル"""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, STATE_FILENAME)
+        self._lock = threading.Lock()
+        self.done = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.done = json.load(f).get('done', {})
+        except (OSError, ValueError, AttributeError):
+            # 状態ファイルがない、または壊れている場合は最初から処理する
+            self.done = {}
+
+    def is_done(self, video_id):
+        with self._lock:
+            return video_id in self.done
+
+    def mark_done(self, video_id, filename):
+        with self._lock:
+            self.done[video_id] = filename
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'done': self.done}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def _page_url(source):
+    """
+    プレイリスト・チャンネルのURLなら動画一覧のページのURLを返す。それ以外はNone
+    """
+    if not re.match(r'https?://', source):
+        return None
+    m = _PLAYLIST_ID.search(source)
+    if m and ('/playlist' in source or not VIDEO_ID_PATTERN.search(source)):
+        return f"{youtube_base_url()}/playlist?list={m.group(1)}"
+    m = _CHANNEL_PATH.search(source)
+    if m:
+        return f"{youtube_base_url()}/{m.group(1)}/videos"
+    return None
+
+
+def _scrape_video_ids(page_url, session, bucket):
+    """
+    プレイリスト・チャンネルのページから動画IDを出現順に取り出す
+    (ページに含まれる分のみ。プレイリストは最初の約100件、チャンネルは最新の約30件)
+    """
+    bucket.acquire()
+    response = session.get(page_url)
+    response.raise_for_status()
+    return list(dict.fromkeys(_PAGE_VIDEO_ID.findall(response.text)))
+
+
+def collect_video_ids(sources, network=None, bucket=None):
+    """
+    入力 (プレイリスト・チャンネルのURL、動画のURL/ID、それらを1行ずつ書いたファイル) から
+    動画IDを集める (重複は除き、出現順)
+
+    Args:
+        sources (list[str]): 入力
+        network (http_client.NetworkConfig, optional): ネットワーク設定
+        bucket (TokenBucket, optional): ページの取得に使うリクエスト頻度の制限
+
+    Returns:
+        list[str]: 動画ID
+
+    Raises:
+        ValueError: 動画IDを取り出せない入力がある場合
+    """
+    session = http_client.get_session(network)
+    bucket = bucket or TokenBucket(0)
+    video_ids = []
+    for source in sources:
+        source = source.strip()
+        if os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+            # 空行と # で始まる行は無視する
+            video_ids.extend(collect_video_ids(
+                [line for line in lines if line and not line.startswith('#')], network, bucket))
+            continue
+        page_url = _page_url(source)
+        if page_url:
+            video_ids.extend(_scrape_video_ids(page_url, session, bucket))
+            continue
+        m = VIDEO_ID_PATTERN.search(source)
+        if m:
+            video_ids.append(m.group(1))
+        elif _VIDEO_ID.match(source):
+            video_ids.append(source)
+        else:
+            raise ValueError(f"YouTubeの動画、プレイリスト、チャンネルではありません: {source}")
+    return list(dict.fromkeys(video_ids))
+
+
+def _save(output_dir, video_id, filename, source, markdown_content):
+    """
+    一時ファイルに書いてから、既存のファイルと重ならない名前を付ける (同名の場合は連番を付ける)
+
+    Returns:
+        str: 保存したファイル名
+    """
+    part_path = os.path.join(output_dir, f".{video_id}.part")
+    with instrumentation.span('write', target=part_path):
+        with open(part_path, 'w', encoding='utf-8') as f:
+            f.write(f"<!-- Original Source: {source} -->\n\n")
+            f.write(markdown_content)
+    stem, ext = os.path.splitext(filename)
+    number = 1
+    try:
+        while True:
+            name = filename if number == 1 else f"{stem}_{number}{ext}"
+            try:
+                # 同名のファイルがあれば失敗するので、同時に保存する動画と上書きし合わない
+                os.link(part_path, os.path.join(output_dir, name))
+                return name
+            except FileExistsError:
+                number += 1
+    finally:
+        os.remove(part_path)
+
+
+def _fetch_info(video_id, network, bucket):
+    """動画情報を取得する (キャッシュになければリクエストの頻度を制限して問い合わせる)"""
+    info = get_youtube_info(video_id, cached_only=True)
+    if info is None:
+        bucket.acquire()
+        info = get_youtube_info(video_id, network=network)
+    return info
+
+
+def _fetch_transcript(video_id, languages, network, bucket):
+    """
+    文字起こしを取得する (キャッシュになければリクエストの頻度を制限して問い合わせる)
+
+    Returns:
+        list[dict] | str: セグメントのリスト。動画に文字起こしがない場合はMarkdownのコメント
+
+    Raises:
+        RuntimeError: 通信エラーなどで取得できなかった場合 (完了として記録せず、再実行で取得し直す)
+    """
+    cache = default_transcript_cache()
+    if cache.lookup(video_id, languages) is None:
+        # 文字起こしの一覧と本文で2回通信する
+        bucket.acquire()
+        bucket.acquire()
+    transcript = fetch_transcript(video_id, languages, cache=cache, network=network)
+    if isinstance(transcript, str) and cache.lookup(video_id, languages) is None:
+        raise RuntimeError(f"文字起こしを取得できません: {transcript}")
+    return transcript
+
+
+def video_markdown(video_id, info, transcript):
+    """
+    動画のMarkdownを作る (MarkItDownのYouTube変換と同じ見出しの構成)
+
+    Args:
+        video_id (str): 動画ID
+        info (dict | None): get_youtube_info() で取得した動画情報
+        transcript (list[dict] | str): fetch_transcript() の結果
+    """
+    text = "# YouTube\n"
+    if info is not None:
+        text += f"\n## {info['title']}\n"
+        text += f"\n### Video Metadata\n- **Channel:** {info['channel']}\n- **Video ID:** {video_id}\n\n"
+    if isinstance(transcript, str):
+        # 文字起こしがない場合は理由をコメントとして残す
+        text += f"\n{transcript}\n"
+    elif transcript:
+        text += f"\n### Transcript\n{' '.join(segment['text'] for segment in transcript)}\n"
+    return text
+
+
+def _ingest_one(video_id, output_dir, languages, network, bucket, state, date):
+    start = time.perf_counter()
+    source = watch_url(video_id)
+    output = None
+    try:
+        with instrumentation.context(conversion_id=instrumentation.new_conversion_id(), source=source), \
+                instrumentation.span('conversion'):
+            with instrumentation.span('info'):
+                info = _fetch_info(video_id, network, bucket)
+            with instrumentation.span('transcript'):
+                transcript = _fetch_transcript(video_id, languages, network, bucket)
+            output = _save(output_dir, video_id, youtube_filename(video_id, info, date), source,
+                           video_markdown(video_id, info, transcript))
+            state.mark_done(video_id, output)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'source': source,
+        'output': output and os.path.join(output_dir, output),
+        'success': error is None,
+        'error': error,
+        'elapsed': time.perf_counter() - start,
+        'cache_hit': None,
+    }
+
+
+def ingest(video_ids, output_dir, languages=None, network=None, concurrency=DEFAULT_CONCURRENCY,
+           rate=DEFAULT_RATE, progress=None, stop_event=None):
+    """
+    動画ごとにMarkdownを保存する (状態ファイルに完了済みと記録された動画は飛ばす)
+
+    Args:
+        video_ids (list[str]): collect_video_ids() で集めた動画ID
+        output_dir (str): 保存先ディレクトリ
+        languages (list[str], optional): 文字起こしの言語の優先順位。省略時は DEFAULT_TRANSCRIPT_LANGUAGES
+        network (http_client.NetworkConfig, optional): ネットワーク設定
+        concurrency (int, optional): 同時に処理する動画の数
+        rate (float, optional): 1秒あたりのリクエスト数の上限 (0以下の場合は制限しない)
+        progress (callable, optional): 1件終わるごとに progress(result, 完了数, 対象数) を呼ぶ
+        stop_event (threading.Event, optional): セットされたら未着手の動画を処理せずに終える
+
+    Returns:
+        tuple[list[dict], int]: (処理した動画ごとの結果 (入力順), 完了済みで飛ばした件数)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    os.makedirs(output_dir, exist_ok=True)
+    state = BulkState(output_dir)
+    pending = [video_id for video_id in video_ids if not state.is_done(video_id)]
+    skipped = len(video_ids) - len(pending)
+    bucket = TokenBucket(rate)
+    date = datetime.date.today().strftime("%Y-%m-%d")
+    languages = list(languages or DEFAULT_TRANSCRIPT_LANGUAGES)
+
+    def run(video_id):
+        if stop_event is not None and stop_event.is_set():
+            return None
+        return _ingest_one(video_id, output_dir, languages, network, bucket, state, date)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='youtube-bulk') as executor:
+        futures = {executor.submit(run, video_id): video_id for video_id in pending}
+        for future in as_completed(futures):
+            result = future.result()
+            if result is None:
+                continue
+            results.append(result)
+            if progress is not None:
+                progress(result, len(results), len(pending))
+
+    order = {watch_url(video_id): i for i, video_id in enumerate(pending)}
+    results.sort(key=lambda r: order[r['source']])
+    return results, skipped
@@ -0,0 +1,359 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+YouTube動画の情報 (タイトル、チャンネル名) と文字起こしの取得とキャッシュ
+
+通信は共有のHTTPセッション (http_client) で行う。oEmbed APIへの問い合わせはタイムアウト付きで行い、結果はメモリとディスクにキャッシュする
+(有効期限付き)。GUIでは変換と並行してワーカースレッドで先に取得しておき、
+UIスレッドではキャッシュだけを参照するため、ネットワークが遅くてもウィンドウが固まらない。
+
+文字起こしは (動画ID, 言語, 手動/自動生成) ごとにディスクにキャッシュし、
+文字起こしのない動画も一定期間は問い合わせ直さない。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import datetime
+import threading
+
+import http_client
+import instrumentation
+from disk_cache import DiskCache, default_cache_dir
+
+VIDEO_ID_PATTERN = re.compile(r'(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})')
+# oEmbed APIのタイムアウト (秒)
+OEMBED_TIMEOUT = 5.0
+# 取得した情報の有効期限 (秒)
+INFO_TTL = 7 * 24 * 60 * 60
+# 取得に失敗した動画を再び問い合わせるまでの時間 (秒、メモリ上のみ)
+FAILURE_TTL = 5 * 60
+INFO_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# YouTubeのURLのベース (テストではローカルのスタブサーバーを指定できる)
+BASE_URL_ENV = 'MARKITDOWN_YOUTUBE_BASE_URL'
+DEFAULT_BASE_URL = 'https://www.youtube.com'
+
+
+def youtube_base_url():
+    """YouTubeのURLのベース (環境変数 MARKITDOWN_YOUTUBE_BASE_URL で変更できる)"""
+    return (os.environ.get(BASE_URL_ENV) or DEFAULT_BASE_URL).rstrip('/')
+
+
+def watch_url(video_id):
+    """動画ページのURL"""
+    return f"{youtube_base_url()}/watch?v={video_id}"
+
+
+def extract_video_id(value):
+    """
+    YouTubeのURLから動画IDを取り出す (URLでなければそのまま返す)
+    """
+    if 'youtu' in value:
+        m = VIDEO_ID_PATTERN.search(value)
+        if m:
+            return m.group(1)
+    return value
+
+
+class YouTubeInfoCache:
+    """動画IDをキーにした動画情報のキャッシュ (メモリ + ディスク、有効期限付き)"""
+
+    def __init__(self, cache_dir=None, ttl=INFO_TTL, max_bytes=INFO_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self._disk = DiskCache(cache_dir or default_cache_dir('youtube-info'), max_bytes, suffix='.json')
+        self._memory = {}
+        # 動画ID -> 取得に失敗した時刻
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def get(self, video_id):
+        """
+        キャッシュされている動画情報を返す。ない場合や期限切れの場合はNone
+        """
+        with self._lock:
+            info = self._memory.get(video_id)
+        if info is None:
+            text = self._disk.get(video_id)
+            if text is None:
+                return None
+            try:
+                info = json.loads(text)
+            except ValueError:
+                return None
+        if time.time() - info.get('fetched_at', 0) > self.ttl:
+            return None
+        with self._lock:
+            self._memory[video_id] = info
+        return info
+
+    def put(self, video_id, info):
+        info = dict(info, fetched_at=time.time())
+        with self._lock:
+            self._memory[video_id] = info
+            self._failures.pop(video_id, None)
+        try:
+            self._disk.put(video_id, json.dumps(info, ensure_ascii=False))
+        except OSError:
+            # ディスクに書けなくてもメモリ上のキャッシュは使える
+            pass
+
+    def record_failure(self, video_id):
+        with self._lock:
+            self._failures[video_id] = time.time()
+
+    def recently_failed(self, video_id):
+        with self._lock:
+            failed_at = self._failures.get(video_id)
+        return failed_at is not None and time.time() - failed_at < FAILURE_TTL
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_info_cache():
+    """プロセスで共有する動画情報のキャッシュ"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = YouTubeInfoCache()
+        return _default_cache
+
+
+def _session_for(network):
+    """ネットワーク設定に対応する共有のセッション (省略時はこのスレッドの設定)"""
+    if network is None:
+        return http_client.active_session()
+    return http_client.get_session(network)
+
+
+def _fetch_oembed(video_id, timeout, session):
+    # YouTube Data APIを使用せずにOEmbed APIを利用
+    response = session.get(
+        f"{youtube_base_url()}/oembed",
+        params={'url': f"{DEFAULT_BASE_URL}/watch?v={video_id}", 'format': 'json'},
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    data = response.json()
+    return {
+        'title': data.get('title', 'Unknown Title'),
+        'channel': data.get('author_name', 'Unknown Channel'),
+        'video_id': video_id,
+    }
+
+
+def get_youtube_info(video_id, timeout=OEMBED_TIMEOUT, cached_only=False, cache=None, network=None):
+    """
+    YouTubeのビデオIDからチャンネル名と動画タイトルを取得する
+
+    Args:
+        video_id (str): 動画IDまたはYouTubeのURL
+        timeout (float, optional): oEmbed APIのタイムアウト (秒)
+        cached_only (bool, optional): Trueの場合はキャッシュだけを参照する (UIスレッドから呼ぶ場合)
+        cache (YouTubeInfoCache, optional): 使用するキャッシュ。省略時はプロセスで共有するキャッシュ
+        network (http_client.NetworkConfig, optional): ネットワーク設定。省略時はこのスレッドの設定
+
+    Returns:
+        dict | None: {'title', 'channel', 'video_id'}。取得できなかった場合はNone
+    """
+    video_id = extract_video_id(video_id)
+    cache = cache or default_info_cache()
+    info = cache.get(video_id)
+    if info is not None or cached_only or cache.recently_failed(video_id):
+        return info
+    try:
+        info = _fetch_oembed(video_id, timeout, _session_for(network))
+    except Exception as e:
+        # 先読みのスレッドからも呼ばれるため標準出力には書かず、計測のイベントとして記録する
+        # (失敗はキャッシュに記録され、FAILURE_TTL の間は問い合わせない)
+        instrumentation.emit('youtube_info_failed', video_id=video_id, error=f"{type(e).__name__}: {e}")
+        cache.record_failure(video_id)
+        return None
+    cache.put(video_id, info)
+    return info
+
+
+def youtube_filename(video_id, info, date=None):
+    """
+    動画の保存用のファイル名を作る
+
+    Returns:
+        str: 日付_チャンネル名_動画タイトル.md (動画情報がない場合は 日付_youtube_動画ID.md)
+    """
+    date = date or datetime.date.today().strftime("%Y-%m-%d")
+    if info is None:
+        return f"{date}_youtube_{video_id}.md"
+    # ファイル名に使えない文字を置換
+    channel = re.sub(r'[\\/:*?"<>|]', '_', info['channel'])
+    title = re.sub(r'[\\/:*?"<>|]', '_', info['title'])
+    return f"{date}_{channel}_{title}.md"
+
+
+def prefetch_youtube_info(source, timeout=OEMBED_TIMEOUT, network=None):
+    """
+    YouTubeのURLであれば動画情報をバックグラウンドで取得してキャッシュしておく
+
+    Args:
+        network (http_client.NetworkConfig, optional): ネットワーク設定
+
+    Returns:
+        threading.Thread | None: 取得中のスレッド (YouTubeのURLでなければNone)
+    """
+    if 'youtu' not in source or not VIDEO_ID_PATTERN.search(source):
+        return None
+    thread = threading.Thread(target=get_youtube_info, args=(source, timeout),
+                              kwargs={'network': network}, name="youtube-info", daemon=True)
+    thread.start()
+    return thread
+
+
+# 文字起こしのキャッシュの有効期限 (秒)
+TRANSCRIPT_TTL = 30 * 24 * 60 * 60
+# 「文字起こしがない」という結果の有効期限 (秒)
+TRANSCRIPT_NEGATIVE_TTL = 24 * 60 * 60
+TRANSCRIPT_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# 動画に文字起こしがないことを示す youtube_transcript_api の例外 (通信エラーなどはキャッシュしない)
+_UNAVAILABLE_ERRORS = ('TranscriptsDisabled', 'NoTranscriptFound', 'NoTranscriptAvailable', 'VideoUnavailable')
+
+
+class TranscriptCache:
+    """
+    (動画ID, 言語の優先順位, 手動/自動生成) をキーにした文字起こしのディスクキャッシュ
+
+    文字起こしがない動画は短い有効期限で「なし」として記録し、毎回問い合わせないようにする。
+    """
+
+    def __init__(self, cache_dir=None, ttl=TRANSCRIPT_TTL, negative_ttl=TRANSCRIPT_NEGATIVE_TTL,
+                 max_bytes=TRANSCRIPT_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._disk = DiskCache(cache_dir or default_cache_dir('transcripts'), max_bytes, suffix='.json')
+
+    @property
+    def stats(self):
+        return self._disk.stats
+
+    def _key(self, video_id, languages, kind):
+        raw = json.dumps([video_id, list(languages or []), kind])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _get(self, video_id, languages, kind, ttl):
+        text = self._disk.get(self._key(video_id, languages, kind))
+        if text is None:
+            return None
+        try:
+            entry = json.loads(text)
+        except ValueError:
+            return None
+        if time.time() - entry.get('fetched_at', 0) > ttl:
+            return None
+        return entry
+
+    def _put(self, video_id, languages, kind, entry):
+        entry = dict(entry, fetched_at=time.time())
+        try:
+            self._disk.put(self._key(video_id, languages, kind), json.dumps(entry, ensure_ascii=False))
+        except OSError:
+            pass
+
+    def lookup(self, video_id, languages):
+        """
+        キャッシュされた文字起こしを探す (手動 -> 自動生成 -> なし の順)
+
+        Returns:
+            tuple[str, object] | None: ('manual' または 'generated', セグメントのリスト)、
+                ('unavailable', エラーメッセージ)、キャッシュされていなければNone
+        """
+        for kind in ('manual', 'generated'):
+            entry = self._get(video_id, languages, kind, self.ttl)
+            if entry is not None:
+                return kind, entry['segments']
+        entry = self._get(video_id, languages, 'unavailable', self.negative_ttl)
+        if entry is not None:
+            return 'unavailable', entry['error']
+        return None
+
+    def store(self, video_id, languages, kind, segments):
+        self._put(video_id, languages, kind, {'segments': segments})
+
+    def store_unavailable(self, video_id, languages, error):
+        self._put(video_id, languages, 'unavailable', {'error': error})
+
+
+_default_transcript_cache = None
+
+
+def default_transcript_cache():
+    """プロセスで共有する文字起こしのキャッシュ"""
+    global _default_transcript_cache
+    with _default_cache_lock:
+        if _default_transcript_cache is None:
+            _default_transcript_cache = TranscriptCache()
+        return _default_transcript_cache
+
+
+def _raw_segments(fetched):
+    """fetch() の結果をJSONに保存できるセグメントのリスト ({'text', 'start', 'duration'}) にする"""
+    if hasattr(fetched, 'to_raw_data'):
+        return fetched.to_raw_data()
+    return [dict(segment) for segment in fetched]
+
+
+def _list_transcripts(api, video_id, session):
+    """共有のセッションで文字起こしの一覧を取得する"""
+    try:
+        # youtube_transcript_api 1.x: HTTPクライアントを渡してインスタンスを作る
+        client = api(http_client=session)
+    except TypeError:
+        # 0.x: クラスメソッドで、プロキシだけを渡せる
+        return api.list_transcripts(video_id, proxies=session.proxies or None)
+    return client.list(video_id)
+
+
+def fetch_transcript(video_id, languages, api=None, cache=None, network=None):
+    """
+    YouTubeの文字起こしを取得する (YouTubeTranscriptApi.get_transcript の代わりに使う)
+
+    指定した言語の文字起こしを探し、見つからなければ自動生成の文字起こしを探す。
+    結果はキャッシュし、文字起こしがない動画は「なし」として一定期間キャッシュする。
+
+    Args:
+        video_id (str): 動画IDまたはYouTubeのURL
+        languages (list[str]): 優先する言語のリスト
+        api (optional): YouTubeTranscriptApi (テストではスタブを渡せる)
+        cache (TranscriptCache, optional): 使用するキャッシュ。省略時はプロセスで共有するキャッシュ
+        network (http_client.NetworkConfig, optional): ネットワーク設定。省略時はこのスレッドの設定
+
+    Returns:
+        list[dict] | str: セグメントのリスト。取得できなかった場合はMarkdownのコメント
+    """
+    video_id = extract_video_id(video_id)
+    cache = cache or default_transcript_cache()
+    cached = cache.lookup(video_id, languages)
+    if cached is not None:
+        kind, value = cached
+        if kind == 'unavailable':
+            return f"<!-- Transcript unavailable: {value} -->"
+        return value
+
+    if api is None:
+        from youtube_transcript_api import YouTubeTranscriptApi as api
+    try:
+        transcript_list = _list_transcripts(api, video_id, _session_for(network))
+        try:
+            transcript = transcript_list.find_transcript(languages)
+        except Exception:
+            transcript = transcript_list.find_generated_transcript(languages)
+        segments = _raw_segments(transcript.fetch())
+    except Exception as e:
+        if type(e).__name__ in _UNAVAILABLE_ERRORS:
+            cache.store_unavailable(video_id, languages, str(e))
+        return f"<!-- Transcript unavailable: {e} -->"
+
+    kind = 'generated' if getattr(transcript, 'is_generated', False) else 'manual'
+    cache.store(video_id, languages, kind, segments)
+    return segments
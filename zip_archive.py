@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ZIPアーカイブのメンバー単位の変換
+
+ZIPをディスクに展開せずにメンバーを1つずつ読み出し、メンバーごとに変換できるようにする。
+ZIPファイルはプロセスごとに1回だけ開き、ワーカープロセスはZIPのパスとメンバー名だけを受け取って
+自分でメンバーを読み出す (親プロセスからメンバーの内容を送らない)。
+"""
+
+import os
+import fnmatch
+import posixpath
+import zipfile
+
+ARCHIVE_EXTENSIONS = ('.zip',)
+# 展開後のサイズがこれを超えるメンバーは読み出さない (ZIP爆弾対策)
+MAX_MEMBER_BYTES = 512 * 1024 * 1024
+# macOSのアーカイバが追加するメタデータ
+_IGNORED_PREFIXES = ('__MACOSX/',)
+
+# プロセスごとに開いたZIPファイル (パス -> ZipFile)
+_archives = {}
+
+
+def is_archive(path):
+    """アーカイブモードで変換できるZIPファイルか"""
+    return (os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+            and os.path.isfile(path) and zipfile.is_zipfile(path))
+
+
+def _open(zip_path):
+    archive = _archives.get(zip_path)
+    if archive is None:
+        archive = zipfile.ZipFile(zip_path)
+        _archives[zip_path] = archive
+    return archive
+
+
+def close_all():
+    """開いたZIPファイルをすべて閉じる"""
+    for archive in _archives.values():
+        archive.close()
+    _archives.clear()
+
+
+def _matches_any(name, patterns):
+    return any(fnmatch.fnmatch(name, pat) or fnmatch.fnmatch(posixpath.basename(name), pat) for pat in patterns)
+
+
+def list_members(zip_path, include=None, exclude=None):
+    """
+    変換対象のメンバー名を格納順に返す (ディレクトリとメタデータは除く)
+
+    Args:
+        zip_path (str): ZIPファイルのパス
+        include (list[str], optional): 対象とするglobパターン
+        exclude (list[str], optional): 除外するglobパターン
+
+    Returns:
+        list[str]: メンバー名
+    """
+    names = []
+    for info in _open(zip_path).infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith(_IGNORED_PREFIXES):
+            continue
+        if include and not _matches_any(name, include):
+            continue
+        if exclude and _matches_any(name, exclude):
+            continue
+        names.append(name)
+    return names
+
+
+def read_member(zip_path, name):
+    """
+    メンバーの内容を読み出す
+
+    Raises:
+        ValueError: 展開後のサイズが MAX_MEMBER_BYTES を超える場合
+    """
+    archive = _open(zip_path)
+    info = archive.getinfo(name)
+    if info.file_size > MAX_MEMBER_BYTES:
+        raise ValueError(f"メンバーが大きすぎます ({info.file_size} バイト)")
+    with archive.open(info) as f:
+        return f.read()
+
+
+def safe_member_path(name):
+    """
+    メンバー名を出力ディレクトリの下に書き込める相対パスにする
+    (絶対パスや .. を含むメンバーで出力ディレクトリの外に書き込まないようにする)
+
+    Returns:
+        str: '/' 区切りの相対パス
+    """
+    parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.', '..')]
+    return '/'.join(parts) or 'member'
+
+
+def archive_header(zip_path):
+    """結合したMarkdownの先頭 (markitdownのZIP変換と同じ形式)"""
+    return f"Content from the zip file `{os.path.basename(zip_path)}`:\n\n"
+
+
+def format_member(name, text_content=None, error=None):
+    """
+    結合したMarkdownのメンバー1つ分の節を作る。変換に失敗したメンバーはエラーをコメントとして埋め込む
+    """
+    if error is not None:
+        error = ' '.join(str(error).split()).replace('-->', '->')
+        return f"## File: {name}\n\n<!-- Conversion error: {error} -->\n\n"
+    return f"## File: {name}\n\n{text_content.strip()}\n\n"